@@ -0,0 +1,3 @@
+# SPDX-FileCopyrightText: 2025-present Anil Kulkarni <akulkarni@anaconda.com>
+#
+# SPDX-License-Identifier: MIT
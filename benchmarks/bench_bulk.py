@@ -0,0 +1,49 @@
+"""
+Measure how parse_many and evaluate_many scale with the number of worker processes.
+
+Usage: python -m benchmarks.bench_bulk [--count 200000] [--max-workers N]
+"""
+
+import argparse
+import os
+import time
+
+from packaging.version import Version
+
+from benchmarks.corpus import generate_markers
+from markerpry.bulk import evaluate_many, parse_many
+from markerpry.node import Environment
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=200_000)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    markers = generate_markers(args.count)
+    environment: Environment = {"python_version": [Version("3.11")], "sys_platform": ["linux"]}
+    print(f"{args.count} markers, {len(set(markers))} distinct")
+    print(f"{'workers':>8} {'parse (s)':>10} {'speedup':>8} {'evaluate (s)':>13} {'speedup':>8}")
+
+    baseline: tuple[float, float] | None = None
+    workers = 1
+    while workers <= args.max_workers:
+        start = time.perf_counter()
+        nodes = parse_many(markers, max_workers=workers)
+        parse_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        evaluate_many(nodes, environment, max_workers=workers)
+        evaluate_time = time.perf_counter() - start
+
+        baseline = baseline or (parse_time, evaluate_time)
+        print(
+            f"{workers:>8} {parse_time:>10.3f} {baseline[0] / parse_time:>7.2f}x"
+            f" {evaluate_time:>13.3f} {baseline[1] / evaluate_time:>7.2f}x"
+        )
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Measure how long importing markerpry takes, using python -X importtime.
+
+Usage: python -m benchmarks.bench_import [--runs 10]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+
+def import_time(code: str) -> int:
+    """Return the total time in microseconds spent importing modules while running code"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, check=True
+    )
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        # Nested imports are indented, and are already included in their parent's cumulative time
+        if not module[1:].startswith(" "):
+            total += int(cumulative)
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    cases = {
+        "import markerpry": "import markerpry",
+        "build and evaluate": "import markerpry; markerpry.ExpressionNode('os_name', '==', 'nt').evaluate({})",
+        "parse": "import markerpry; markerpry.parse('os_name == \"nt\"')",
+    }
+    baseline = statistics.median(import_time("pass") for _ in range(args.runs))
+    for name, code in cases.items():
+        times = [import_time(code) - baseline for _ in range(args.runs)]
+        print(f"{name:<20} median {statistics.median(times) / 1000:.1f} ms, min {min(times) / 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
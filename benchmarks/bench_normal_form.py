@@ -0,0 +1,80 @@
+"""
+Measure CNF/DNF conversion on inputs whose normal forms grow exponentially.
+
+Usage: python -m benchmarks.bench_normal_form [--max-size 1024] [--max-clauses 1024]
+
+For each size n, the inputs are:
+
+- and_of_ors: (a1 or b1) and ... and (an or bn), whose DNF has 2 ** n terms
+- or_of_ands: (a1 and b1) or ... or (an and bn), whose CNF has 2 ** n clauses
+- absorbed: a1 and (a1 or b1) and (a1 or b2) and ..., which subsumption reduces to a1
+
+The exponential conversions stop with NormalFormTooLarge once they pass --max-clauses, so every time
+should grow polynomially with n rather than exponentially.
+"""
+
+import argparse
+import time
+from collections.abc import Callable
+
+from markerpry.node import ExpressionNode, Node, OperatorNode
+from markerpry.normal_form import (
+    NormalFormTooLarge,
+    Operator,
+    to_cnf,
+    to_dnf,
+    tseitin,
+)
+
+
+def atom(name: str) -> ExpressionNode:
+    return ExpressionNode("extra", "==", name)
+
+
+def chain(nodes: list[Node], operator: Operator) -> Node:
+    result = nodes[0]
+    for node in nodes[1:]:
+        result = OperatorNode(operator, result, node)
+    return result
+
+
+INPUTS: dict[str, Callable[[int], Node]] = {
+    "and_of_ors": lambda n: chain([chain([atom(f"a{i}"), atom(f"b{i}")], "or") for i in range(n)], "and"),
+    "or_of_ands": lambda n: chain([chain([atom(f"a{i}"), atom(f"b{i}")], "and") for i in range(n)], "or"),
+    "absorbed": lambda n: chain([atom("a1")] + [chain([atom("a1"), atom(f"b{i}")], "or") for i in range(n)], "and"),
+}
+
+
+def measure(function: Callable[[], object]) -> tuple[float, str]:
+    start = time.perf_counter()
+    try:
+        function()
+        outcome = "ok"
+    except NormalFormTooLarge:
+        outcome = "too large"
+    return time.perf_counter() - start, outcome
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-size", type=int, default=1024)
+    parser.add_argument("--max-clauses", type=int, default=1024)
+    args = parser.parse_args()
+
+    print(f"{'input':<12} {'n':>6} {'to_cnf (ms)':>20} {'to_dnf (ms)':>20} {'tseitin (ms)':>14}")
+    for name, build in INPUTS.items():
+        n = 4
+        while n <= args.max_size:
+            node = build(n)
+            cnf_time, cnf = measure(lambda: to_cnf(node, args.max_clauses))
+            dnf_time, dnf = measure(lambda: to_dnf(node, args.max_clauses))
+            tseitin_time, _ = measure(lambda: tseitin(node))
+            print(
+                f"{name:<12} {n:>6} {cnf_time * 1000:>8.2f} {cnf:>11} {dnf_time * 1000:>8.2f} {dnf:>11} "
+                f"{tseitin_time * 1000:>14.2f}"
+            )
+            n *= 2
+
+
+if __name__ == "__main__":
+    main()
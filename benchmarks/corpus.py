@@ -0,0 +1,82 @@
+"""Deterministic generation of realistic marker strings for benchmarks"""
+
+import random
+
+from packaging.version import Version
+
+from markerpry.node import Environment
+
+VERSION_KEYS = ["python_version", "python_full_version", "implementation_version"]
+STRING_KEYS = {
+    "os_name": ["posix", "nt", "java"],
+    "sys_platform": ["linux", "win32", "darwin", "cygwin", "emscripten"],
+    "platform_system": ["Linux", "Windows", "Darwin", "FreeBSD"],
+    "platform_machine": ["x86_64", "aarch64", "AMD64", "arm64", "i686", "ppc64le", "s390x"],
+    "platform_python_implementation": ["CPython", "PyPy", "Jython"],
+    "implementation_name": ["cpython", "pypy", "jython"],
+    "extra": ["test", "docs", "dev", "socks", "security"],
+}
+VERSIONS = ["2.7", "3.6", "3.7", "3.8", "3.9", "3.10", "3.11", "3.12", "3.13"]
+VERSION_COMPARATORS = ["<", "<=", ">", ">=", "==", "!="]
+
+
+def generate_atom(rng: random.Random) -> str:
+    if rng.random() < 0.4:
+        key = rng.choice(VERSION_KEYS)
+        version = rng.choice(VERSIONS)
+        if key != "python_version" and rng.random() < 0.5:
+            version = f"{version}.{rng.randint(0, 12)}"
+        return f'{key} {rng.choice(VERSION_COMPARATORS)} "{version}"'
+    key = rng.choice(list(STRING_KEYS))
+    value = rng.choice(STRING_KEYS[key])
+    if rng.random() < 0.1:
+        return f'"{value[:3]}" in {key}'
+    return f'{key} {rng.choice(["==", "!="])} "{value}"'
+
+
+def generate_marker(rng: random.Random, atoms: int) -> str:
+    if atoms == 1:
+        return generate_atom(rng)
+    left = rng.randint(1, atoms - 1)
+    left_marker = generate_marker(rng, left)
+    right_marker = generate_marker(rng, atoms - left)
+    if rng.random() < 0.6:
+        return f"({left_marker}) and ({right_marker})"
+    return f"({left_marker}) or ({right_marker})"
+
+
+def generate_markers(count: int, seed: int = 0, max_atoms: int = 6, unique: float = 0.5) -> list[str]:
+    """
+    Generate count marker strings. Real dependency sets repeat markers a lot,
+    so only about unique * count of the markers are distinct.
+    """
+    rng = random.Random(seed)
+    distinct = [generate_marker(rng, rng.randint(1, max_atoms)) for _ in range(max(1, int(count * unique)))]
+    return [distinct[i] if i < len(distinct) else rng.choice(distinct) for i in range(count)]
+
+
+# The number of markers in each corpus size
+SIZES = {"small": 1_000, "medium": 20_000, "huge": 200_000}
+
+
+def full_environment() -> dict[str, str]:
+    """A complete environment, in the format used by packaging.markers.Marker.evaluate"""
+    return {
+        "implementation_name": "cpython",
+        "implementation_version": "3.11.7",
+        "os_name": "posix",
+        "platform_machine": "x86_64",
+        "platform_release": "6.1.0",
+        "platform_system": "Linux",
+        "platform_version": "#1 SMP",
+        "python_full_version": "3.11.7",
+        "platform_python_implementation": "CPython",
+        "python_version": "3.11",
+        "sys_platform": "linux",
+        "extra": "test",
+    }
+
+
+def markerpry_environment(environment: dict[str, str]) -> Environment:
+    """Convert a packaging environment into a markerpry Environment"""
+    return {key: [Version(value) if key in VERSION_KEYS else value] for key, value in environment.items()}
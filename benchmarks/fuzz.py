@@ -0,0 +1,239 @@
+"""
+Differential fuzzing of markerpry against packaging.markers.Marker.
+
+Usage: python -m benchmarks.fuzz [--cases 1000000] [--seed 0] [--output timings.json]
+                                 [--baseline timings.json] [--threshold 1.25]
+
+Markers and environments are generated from a small PEP 508 grammar, using a seeded random number
+generator, so any failure can be reproduced from its seed and case number. Each case checks that:
+
+- parse(marker).evaluate(environment) agrees with Marker(marker).evaluate(environment)
+- evaluating with part of the environment, then the rest, gives the same result as evaluating at once
+- str() of the parsed tree parses back to an equivalent tree
+
+The generator avoids the places where markerpry intentionally differs from packaging:
+
+- markerpry normalizes "3.8" ~= python_version to python_version ~= "3.8", while packaging
+  treats the environment value as the specifier. Reversed wildcards ("3.8.*" == python_version) are
+  likewise only meaningful on the right hand side
+- Keys without Version values are compared as strings by markerpry, while packaging tries to compare
+  any value as a version first. The string values are chosen so both approaches agree
+
+The time spent in each operation is recorded. With --baseline, the run fails if any operation has
+slowed down by more than --threshold, relative to packaging. Comparing against packaging rather than
+absolute times keeps the gate meaningful across machines.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import Any
+
+from packaging.markers import Marker
+from packaging.version import Version
+
+from markerpry.node import BooleanNode, Environment, Node
+from markerpry.parser import parse
+
+VERSION_KEYS = ["python_version", "python_full_version", "implementation_version"]
+STRING_KEYS = {
+    "os_name": ["posix", "nt", "java"],
+    "sys_platform": ["linux", "win32", "darwin", "cygwin"],
+    "platform_system": ["Linux", "Windows", "Darwin"],
+    "platform_machine": ["x86_64", "aarch64", "AMD64", "arm64", "i686"],
+    "platform_release": ["5.15.0", "6.1.0", "22.6.0"],
+    "platform_version": ["#1 SMP", "Darwin Kernel Version 22.6.0"],
+    "platform_python_implementation": ["CPython", "PyPy"],
+    "implementation_name": ["cpython", "pypy"],
+}
+VERSIONS = ["2.7", "3.6", "3.7", "3.8", "3.9", "3.10", "3.11", "3.12", "3.13", "4.0"]
+VERSION_COMPARATORS = ["<", "<=", ">", ">=", "==", "!=", "~="]
+STRING_COMPARATORS = ["==", "!="]
+REVERSED = {"<": ">", "<=": ">=", ">": "<", ">=": "<=", "==": "==", "!=": "!="}
+OPERATIONS = ["parse", "evaluate", "packaging_parse", "packaging_evaluate"]
+
+
+def generate_version(rng: random.Random, key: str) -> str:
+    version = rng.choice(VERSIONS)
+    if key != "python_version" and rng.random() < 0.6:
+        version = f"{version}.{rng.randint(0, 3)}"
+    return version
+
+
+def generate_atom(rng: random.Random) -> str:
+    choice = rng.random()
+    if choice < 0.45:
+        key = rng.choice(VERSION_KEYS)
+        comparator = rng.choice(VERSION_COMPARATORS)
+        version = generate_version(rng, key)
+        if comparator == "~=" and "." not in version:
+            version = f"{version}.0"
+        if comparator in ("==", "!=") and rng.random() < 0.15:
+            return f'{key} {comparator} "{version}.*"'
+        if comparator != "~=" and rng.random() < 0.3:
+            return f'"{version}" {REVERSED[comparator]} {key}'
+        return f'{key} {comparator} "{version}"'
+    if choice < 0.55:
+        key = rng.choice(VERSION_KEYS + list(STRING_KEYS))
+        values = STRING_KEYS.get(key, VERSIONS)
+        value = rng.choice(values)
+        value = value[: rng.randint(1, len(value))]
+        comparator = rng.choice(["in", "not in"])
+        if rng.random() < 0.5:
+            return f'"{value}" {comparator} {key}'
+        return f'{key} {comparator} "{" ".join(rng.sample(values, min(3, len(values))))}"'
+    if choice < 0.65:
+        return f'extra {rng.choice(STRING_COMPARATORS)} "{rng.choice(["test", "Test_Extra", "docs"])}"'
+    key = rng.choice(list(STRING_KEYS))
+    value = rng.choice(STRING_KEYS[key])
+    if rng.random() < 0.3:
+        return f'"{value}" {rng.choice(STRING_COMPARATORS)} {key}'
+    return f'{key} {rng.choice(STRING_COMPARATORS)} "{value}"'
+
+
+def generate_marker(rng: random.Random, depth: int = 0) -> str:
+    if depth >= 4 or rng.random() < 0.35:
+        return generate_atom(rng)
+    terms = [generate_marker(rng, depth + 1) for _ in range(rng.randint(2, 4))]
+    marker = terms[0]
+    for term in terms[1:]:
+        marker = f"{marker} {rng.choice(['and', 'or'])} {term}"
+    return f"({marker})" if rng.random() < 0.5 else marker
+
+
+def generate_environment(rng: random.Random) -> dict[str, str]:
+    environment = {key: rng.choice(values) for key, values in STRING_KEYS.items()}
+    for key in VERSION_KEYS:
+        environment[key] = generate_version(rng, key)
+    environment["extra"] = rng.choice(["test", "test-extra", "docs", "other"])
+    return environment
+
+
+def markerpry_environment(environment: dict[str, str]) -> Environment:
+    return {key: [Version(value) if key in VERSION_KEYS else value] for key, value in environment.items()}
+
+
+@dataclass
+class Report:
+    cases: int = 0
+    failures: list[dict[str, Any]] = field(default_factory=list)
+    seconds: dict[str, float] = field(default_factory=lambda: dict.fromkeys(OPERATIONS, 0.0))
+
+    def timings(self) -> dict[str, Any]:
+        ns_per_case = {name: seconds / max(1, self.cases) * 1e9 for name, seconds in self.seconds.items()}
+        return {
+            "cases": self.cases,
+            "ns_per_case": ns_per_case,
+            # Relative to packaging, so that results from different machines can be compared
+            "relative": {
+                "parse": ns_per_case["parse"] / max(1.0, ns_per_case["packaging_parse"]),
+                "evaluate": ns_per_case["evaluate"] / max(1.0, ns_per_case["packaging_evaluate"]),
+            },
+        }
+
+
+def cases(seed: int, count: int) -> Iterator[tuple[int, str, dict[str, str]]]:
+    rng = random.Random(seed)
+    for case in range(count):
+        yield case, generate_marker(rng), generate_environment(rng)
+
+
+def check(marker_str: str, environment: dict[str, str], report: Report, case: int = 0) -> None:
+    """Check a single marker and environment, recording any failures and timings in report"""
+    report.cases += 1
+    seconds = report.seconds
+
+    start = time.perf_counter()
+    marker = Marker(marker_str)
+    seconds["packaging_parse"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        expected: bool | str = marker.evaluate(environment)
+    except Exception as e:
+        expected = type(e).__name__
+    seconds["packaging_evaluate"] += time.perf_counter() - start
+
+    start = time.perf_counter()
+    node = parse(marker_str)
+    seconds["parse"] += time.perf_counter() - start
+
+    env = markerpry_environment(environment)
+    start = time.perf_counter()
+    result = node.evaluate(env)
+    seconds["evaluate"] += time.perf_counter() - start
+
+    failure: dict[str, Any] = {"case": case, "marker": marker_str, "environment": environment}
+    actual = result.state if isinstance(result, BooleanNode) else str(result)
+    if actual != expected:
+        report.failures.append({**failure, "check": "packaging", "expected": expected, "actual": actual})
+        return
+
+    keys = list(env)
+    split = random.Random(marker_str).randint(0, len(keys))
+    partial: Node = node.evaluate({key: env[key] for key in keys[:split]})
+    completed = partial.evaluate({key: env[key] for key in keys[split:]})
+    if completed != result:
+        report.failures.append({**failure, "check": "partial", "expected": actual, "actual": str(completed)})
+        return
+
+    roundtrip = parse(str(node)).evaluate(env)
+    if roundtrip != result:
+        report.failures.append({**failure, "check": "roundtrip", "expected": actual, "actual": str(roundtrip)})
+
+
+def run(seed: int, count: int, max_failures: int = 20) -> Report:
+    report = Report()
+    for case, marker_str, environment in cases(seed, count):
+        check(marker_str, environment, report, case)
+        if len(report.failures) >= max_failures:
+            break
+    return report
+
+
+def regressions(timings: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Return a description of each operation that is more than threshold times slower than the baseline"""
+    messages = []
+    for name, ratio in timings["relative"].items():
+        baseline_ratio = baseline["relative"].get(name)
+        if baseline_ratio and ratio > baseline_ratio * threshold:
+            messages.append(f"{name} is {ratio / baseline_ratio:.2f}x slower than the baseline (limit {threshold}x)")
+    return messages
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the timings as JSON to this file")
+    parser.add_argument("--baseline", help="Fail if the timings are slower than the timings in this file")
+    parser.add_argument("--threshold", type=float, default=1.25)
+    args = parser.parse_args()
+
+    report = run(args.seed, args.cases)
+    timings = report.timings()
+    print(f"{report.cases} cases, {len(report.failures)} failures")
+    for name, ns in timings["ns_per_case"].items():
+        print(f"{name:<20} {ns / 1000:>10.2f} us per case")
+    for failure in report.failures:
+        print(json.dumps(failure))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(timings, f, indent=2)
+
+    failed = bool(report.failures)
+    if args.baseline:
+        with open(args.baseline) as f:
+            for message in regressions(timings, json.load(f), args.threshold):
+                print(message)
+                failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
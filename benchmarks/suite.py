@@ -0,0 +1,157 @@
+"""
+Benchmark parsing, evaluation, rendering and key lookups over a generated corpus of markers.
+
+Usage: python -m benchmarks.suite [--size small|medium|huge] [--repeat 5] [--output results.json]
+
+Everything runs offline. The corpus is generated from a fixed seed, so results from different
+runs (and commits) measure the same work and can be compared.
+"""
+
+import argparse
+import copy
+import gc
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from typing import Any
+
+import packaging
+from packaging.markers import Marker
+from packaging.requirements import Requirement
+
+from benchmarks.corpus import (
+    SIZES,
+    full_environment,
+    generate_markers,
+    markerpry_environment,
+)
+from markerpry.__about__ import __version__
+from markerpry.network import MarkerNetwork
+from markerpry.parser import parse, parse_marker, to_marker
+from markerpry.requirements import parse_requirements
+
+CONTAINS_KEYS = ("python_version", "platform_machine", "platform_release")
+
+
+def measure(function: Callable[..., Any], repeat: int, setup: Callable[[], Any] | None = None) -> dict[str, Any]:
+    """
+    Time function, returning the fastest of repeat runs along with every run.
+
+    When setup is given, it's called before each run, outside of the timing, and function is called with its result
+    """
+    times = []
+    for _ in range(repeat):
+        argument = None if setup is None else setup()
+        gc.collect()
+        start = time.perf_counter()
+        function() if setup is None else function(argument)
+        times.append(time.perf_counter() - start)
+    return {"seconds": min(times), "runs": times}
+
+
+def peak_memory(function: Callable[[], Any]) -> int:
+    """Return the peak memory allocated while running function, in bytes, while keeping its result alive"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        result = function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak
+
+
+def run(size: str, repeat: int, count: int | None = None, seed: int = 0) -> dict[str, Any]:
+    """Run every benchmark, and return the results as a JSON serializable dict"""
+    count = SIZES[size] if count is None else count
+    marker_strs = generate_markers(count, seed=seed)
+    markers = [Marker(marker_str) for marker_str in marker_strs]
+    nodes = [parse(marker_str) for marker_str in marker_strs]
+
+    packaging_env = full_environment()
+    full_env = markerpry_environment(packaging_env)
+    partial_env = {key: full_env[key] for key in ("python_version", "sys_platform")}
+    network = MarkerNetwork(nodes)
+    requirements = "\n".join(
+        f"package-{i % 100}[test]>=1.0,<2 ; {marker_str}" for i, marker_str in enumerate(marker_strs)
+    )
+
+    benchmarks: dict[str, Callable[..., Any]] = {
+        "parse": lambda: [parse(marker_str) for marker_str in marker_strs],
+        "parse_marker": lambda: [parse_marker(marker) for marker in markers],
+        "evaluate_full": lambda: [node.evaluate(full_env) for node in nodes],
+        "evaluate_partial": lambda: [node.evaluate(partial_env) for node in nodes],
+        "network_match": lambda: network.match(full_env),
+        "str": lambda copies: [str(node) for node in copies],
+        "str_cached": lambda: [str(node) for node in nodes],
+        "contains": lambda: [key in node for node in nodes for key in CONTAINS_KEYS],
+        "to_marker": lambda: [to_marker(node) for node in nodes],
+        "str_to_marker": lambda: [Marker(str(node)) for node in nodes],
+        "packaging_marker": lambda: [Marker(marker_str) for marker_str in marker_strs],
+        "packaging_evaluate": lambda: [marker.evaluate(packaging_env) for marker in markers],
+        "parse_requirements": lambda: list(parse_requirements(requirements)),
+        "split_and_parse": lambda: [parse(line.split(";", 1)[1]) for line in requirements.splitlines()],
+        "packaging_requirement": lambda: [Requirement(line) for line in requirements.splitlines()],
+    }
+    # Benchmarks with a setup are called with its result
+    setups: dict[str, Callable[[], Any]] = {
+        # str() is cached on each node, so every run renders a fresh copy of the trees
+        "str": lambda: copy.deepcopy(nodes),
+    }
+    results = {
+        name: {**measure(function, repeat, setups.get(name)), "operations": count}
+        for name, function in benchmarks.items()
+    }
+    results["contains"]["operations"] = count * len(CONTAINS_KEYS)
+    for result in results.values():
+        result["ns_per_operation"] = result["seconds"] / max(1, result["operations"]) * 1e9
+
+    return {
+        "metadata": {
+            "size": size,
+            "count": count,
+            "distinct": len(set(marker_strs)),
+            "seed": seed,
+            "repeat": repeat,
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "markerpry": __version__,
+            "packaging": packaging.__version__,
+        },
+        "results": results,
+        "peak_memory_bytes": {
+            "parse": peak_memory(lambda: [parse(marker_str) for marker_str in marker_strs]),
+            "packaging_marker": peak_memory(lambda: [Marker(marker_str) for marker_str in marker_strs]),
+        },
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=list(SIZES), default="small")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    report = run(args.size, args.repeat, seed=args.seed)
+    metadata = report["metadata"]
+    print(f"{metadata['count']} markers ({metadata['distinct']} distinct), best of {metadata['repeat']}")
+    print(f"{'benchmark':<20} {'total (ms)':>12} {'per op (us)':>12}")
+    for name, result in report["results"].items():
+        print(f"{name:<20} {result['seconds'] * 1000:>12.2f} {result['ns_per_operation'] / 1000:>12.2f}")
+    for name, peak in report["peak_memory_bytes"].items():
+        print(f"{'peak memory ' + name:<20} {peak / 1024 / 1024:>12.2f} MiB")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
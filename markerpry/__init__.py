@@ -2,17 +2,80 @@
 #
 # SPDX-License-Identifier: MIT
 
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
 from .node import (
     FALSE,
     TRUE,
     BooleanNode,
     Comparator,
+    CompiledEnvironment,
     Environment,
+    EnvironmentValue,
     ExpressionNode,
     Node,
     OperatorNode,
+    compile_environment,
+    current_environment,
 )
-from .parser import parse, parse_marker
+
+if TYPE_CHECKING:
+    from .bulk import evaluate_many, parse_many
+    from .cache import ParseCache
+    from .combine import and_, not_, or_
+    from .explain import Explanation, explain
+    from .incremental import IncrementalEvaluator
+    from .index import MarkerIndex
+    from .network import MarkerNetwork
+    from .normal_form import NormalFormTooLarge, to_cnf, to_dnf
+    from .parser import parse, parse_marker, to_marker
+    from .partition import Partition, partition
+    from .requirements import ParsedRequirement, parse_requirements, wheel_requirements
+    from .stats import EvaluationStats, collect_stats
+
+# These pull in packaging.markers, multiprocessing and friends, so they're only
+# imported when they're first used. Importing markerpry just to build nodes stays fast
+_LAZY_ATTRIBUTES = {
+    "parse": ".parser",
+    "parse_marker": ".parser",
+    "to_marker": ".parser",
+    "parse_many": ".bulk",
+    "evaluate_many": ".bulk",
+    "ParseCache": ".cache",
+    "and_": ".combine",
+    "or_": ".combine",
+    "not_": ".combine",
+    "explain": ".explain",
+    "Explanation": ".explain",
+    "IncrementalEvaluator": ".incremental",
+    "MarkerIndex": ".index",
+    "MarkerNetwork": ".network",
+    "to_cnf": ".normal_form",
+    "to_dnf": ".normal_form",
+    "NormalFormTooLarge": ".normal_form",
+    "partition": ".partition",
+    "Partition": ".partition",
+    "parse_requirements": ".requirements",
+    "wheel_requirements": ".requirements",
+    "ParsedRequirement": ".requirements",
+    "collect_stats": ".stats",
+    "EvaluationStats": ".stats",
+}
+
+
+def __getattr__(name: str) -> Any:
+    module = _LAZY_ATTRIBUTES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(__all__))
+
 
 __all__ = [
     "Node",
@@ -21,7 +84,33 @@ __all__ = [
     "OperatorNode",
     "parse",
     "parse_marker",
+    "to_marker",
+    "parse_many",
+    "ParseCache",
+    "and_",
+    "or_",
+    "not_",
+    "evaluate_many",
+    "explain",
+    "Explanation",
+    "IncrementalEvaluator",
+    "MarkerIndex",
+    "MarkerNetwork",
+    "to_cnf",
+    "to_dnf",
+    "NormalFormTooLarge",
+    "partition",
+    "Partition",
+    "parse_requirements",
+    "wheel_requirements",
+    "ParsedRequirement",
+    "collect_stats",
+    "EvaluationStats",
     "Environment",
+    "EnvironmentValue",
+    "CompiledEnvironment",
+    "compile_environment",
+    "current_environment",
     "Comparator",
     "TRUE",
     "FALSE",
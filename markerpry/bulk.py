@@ -0,0 +1,114 @@
+import os
+from collections.abc import Iterable, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from markerpry.node import Environment, Node, compile_environment
+from markerpry.parser import parse
+from markerpry.serialize import dumps, loads
+
+# Below this many distinct inputs, starting worker processes costs more than it saves
+SERIAL_THRESHOLD = 2000
+
+# Aim for this many chunks per worker, so that uneven chunks can be balanced out
+CHUNKS_PER_WORKER = 4
+MAX_CHUNKSIZE = 5000
+
+
+def parse_many(markers: Iterable[str], max_workers: int | None = None) -> list[Node]:
+    """
+    Parse many PEP 508 marker strings, using a pool of worker processes.
+
+    Duplicate strings are only parsed once, and share the same Node in the result.
+    Inputs with fewer than SERIAL_THRESHOLD distinct strings are parsed in the current process.
+
+    Args:
+        markers: The marker strings to parse
+        max_workers: The number of worker processes. Defaults to the number of CPUs.
+            Pass 1 to parse everything in the current process.
+
+    Returns:
+        The parsed Nodes, in the same order as markers
+
+    Raises:
+        packaging.markers.InvalidMarker: If any of the marker strings are invalid
+    """
+    markers = list(markers)
+    unique = list(dict.fromkeys(markers))
+    workers = _workers(max_workers, len(unique))
+    if workers == 1:
+        parsed = [parse(marker) for marker in unique]
+    else:
+        parsed = _parallel(_parse_chunk, _chunks(unique, workers), workers)
+    results = dict(zip(unique, parsed))
+    return [results[marker] for marker in markers]
+
+
+def evaluate_many(nodes: Iterable[Node], environment: Environment, max_workers: int | None = None) -> list[Node]:
+    """
+    Evaluate many Nodes against the same environment, using a pool of worker processes.
+
+    Duplicate Nodes are only evaluated once, and share the same result.
+    Inputs with fewer than SERIAL_THRESHOLD distinct nodes are evaluated in the current process.
+
+    Args:
+        nodes: The Nodes to evaluate
+        environment: The environment to evaluate each node against
+        max_workers: The number of worker processes. Defaults to the number of CPUs.
+            Pass 1 to evaluate everything in the current process.
+
+    Returns:
+        The result of node.evaluate(environment) for each node, in the same order as nodes
+    """
+    nodes = list(nodes)
+    unique = list(dict.fromkeys(nodes))
+    workers = _workers(max_workers, len(unique))
+    if workers == 1:
+        compiled = compile_environment(environment)
+        evaluated = [node.evaluate(compiled) for node in unique]
+    else:
+        # Nodes travel in the compact binary format, which is much smaller to pickle than the dataclasses
+        chunks = [dumps(chunk) for chunk in _chunks(unique, workers)]
+        evaluated = _parallel(_evaluate_chunk, chunks, workers, environment)
+    results = dict(zip(unique, evaluated))
+    return [results[node] for node in nodes]
+
+
+def chunksize(items: int, workers: int) -> int:
+    """Pick how many items each worker should process at a time."""
+    return max(1, min(MAX_CHUNKSIZE, -(-items // (workers * CHUNKS_PER_WORKER))))
+
+
+def _workers(max_workers: int | None, items: int) -> int:
+    if items < SERIAL_THRESHOLD:
+        return 1
+    return max_workers or os.cpu_count() or 1
+
+
+def _chunks(items: Sequence[Any], workers: int) -> list[Sequence[Any]]:
+    size = chunksize(len(items), workers)
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def _parallel(function: Any, chunks: Sequence[Any], workers: int, environment: Environment | None = None) -> list[Node]:
+    with ProcessPoolExecutor(max_workers=workers, initializer=_set_environment, initargs=(environment,)) as executor:
+        return [node for result in executor.map(function, chunks) for node in loads(result)]
+
+
+# The environment for evaluate_many, set once per worker process
+_environment: Environment | None = None
+
+
+def _set_environment(environment: Environment | None) -> None:
+    global _environment
+    _environment = None if environment is None else compile_environment(environment)
+
+
+def _parse_chunk(markers: Sequence[str]) -> bytes:
+    return dumps(parse(marker) for marker in markers)
+
+
+def _evaluate_chunk(data: bytes) -> bytes:
+    assert _environment is not None
+    environment = _environment
+    return dumps(node.evaluate(environment) for node in loads(data))
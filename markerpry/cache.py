@@ -0,0 +1,252 @@
+"""
+A persistent on-disk cache of parsed markers.
+
+The cache file is a header followed by append-only records:
+
+    header: magic (4 bytes) | length (uint16) | "<markerpry version> <packaging version> <format version>"
+    record: blake2b-128 digest of the marker string (16 bytes) | length (uint32) | markerpry.serialize buffer
+
+The file is memory mapped and only the record headers are scanned when it's opened. Nodes are decoded
+from the mapped buffer when they're first looked up. A file written by a different version of markerpry
+or packaging is ignored, and replaced on the next flush.
+
+Writers append under an exclusive lock on a separate .lock file, so multiple processes can share one
+cache file. When the file grows past max_size, the oldest records are evicted by rewriting the file
+to a temporary path and replacing it, which leaves any existing memory maps of the old file intact.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections.abc import Iterator
+from contextlib import contextmanager
+from types import TracebackType
+from typing import BinaryIO
+
+import packaging
+
+from markerpry.__about__ import __version__
+from markerpry.node import Node
+from markerpry.serialize import FORMAT_VERSION, loads
+
+MAGIC = b"MPRC"
+DEFAULT_MAX_SIZE = 64 * 1024 * 1024
+
+_RECORD = struct.Struct("<16sI")
+_HEADER_LENGTH = struct.Struct("<H")
+
+
+class ParseCache:
+    """
+    A persistent cache from marker strings to parsed Nodes.
+
+    Example:
+        with ParseCache("~/.cache/markers.bin") as cache:
+            node = cache.parse('python_version >= "3.8"')
+
+    New entries are kept in memory until flush() is called, or the cache is closed.
+    """
+
+    def __init__(self, path: str | os.PathLike[str], max_size: int = DEFAULT_MAX_SIZE):
+        """
+        Args:
+            path: The cache file. It is created on the first flush if it doesn't exist.
+            max_size: The size in bytes that the cache file may grow to before the oldest entries are evicted
+        """
+        self.path = os.path.expanduser(os.fspath(path))
+        self.max_size = max_size
+        key = f"{__version__} {packaging.__version__} {FORMAT_VERSION}".encode("utf-8")
+        self._header = MAGIC + _HEADER_LENGTH.pack(len(key)) + key
+        self._map: mmap.mmap | None = None
+        self._index: dict[bytes, tuple[int, int]] | None = None
+        self._nodes: dict[bytes, Node] = {}
+        self._pending: dict[bytes, bytes] = {}
+
+    def parse(self, marker_str: str) -> Node:
+        """
+        Parse a marker string, using the cached Node if there is one.
+
+        Raises:
+            packaging.markers.InvalidMarker: If the marker string is invalid
+        """
+        node = self.get(marker_str)
+        if node is None:
+            # Only imported on a miss, so a warm cache never loads packaging.markers
+            from markerpry.parser import parse
+
+            node = parse(marker_str)
+            self.put(marker_str, node)
+        return node
+
+    def get(self, marker_str: str) -> Node | None:
+        """Return the cached Node for a marker string, or None if it isn't cached."""
+        digest = _digest(marker_str)
+        node = self._nodes.get(digest)
+        if node is not None:
+            return node
+        if self._index is None:
+            self._load()
+        assert self._index is not None
+        location = self._index.get(digest)
+        if location is None or self._map is None:
+            return None
+        offset, length = location
+        try:
+            (node,) = loads(self._map[offset : offset + length])
+        except ValueError:
+            return None
+        self._nodes[digest] = node
+        return node
+
+    def put(self, marker_str: str, node: Node) -> None:
+        """Add a Node to the cache. It is written to disk on the next flush()."""
+        digest = _digest(marker_str)
+        self._nodes[digest] = node
+        self._pending[digest] = node.to_bytes()
+
+    def flush(self) -> None:
+        """Write any new entries to the cache file."""
+        if not self._pending:
+            return
+        records = b"".join(_RECORD.pack(digest, len(data)) + data for digest, data in self._pending.items())
+        self._pending.clear()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with _locked(f"{self.path}.lock"):
+            with open(self.path, "a+b") as f:
+                end = self._valid_end(f)
+                if end is not None and end + len(records) <= self.max_size:
+                    # Drop anything left over from an interrupted writer, then append
+                    f.truncate(end)
+                    f.write(records)
+                    f.flush()
+                    self._unload()
+                    return
+                existing = b""
+                if end is not None:
+                    f.seek(len(self._header))
+                    existing = f.read(end - len(self._header))
+            self._rewrite(directory, existing + records)
+        self._unload()
+
+    def close(self) -> None:
+        """Flush any new entries, and release the memory map."""
+        self.flush()
+        self._unload()
+        self._nodes.clear()
+
+    def __enter__(self) -> "ParseCache":
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc_value: BaseException | None, traceback: TracebackType | None
+    ) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        """Return the number of entries in the cache file, plus any that haven't been flushed yet."""
+        if self._index is None:
+            self._load()
+        assert self._index is not None
+        return len(self._index.keys() | self._pending.keys())
+
+    def _load(self) -> None:
+        self._index = {}
+        try:
+            with open(self.path, "rb") as f:
+                if os.fstat(f.fileno()).st_size <= len(self._header):
+                    return
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            return
+        if self._map[: len(self._header)] != self._header:
+            return
+        for digest, offset, length in _scan(self._map, len(self._header)):
+            self._index[digest] = (offset, length)
+
+    def _valid_end(self, f: BinaryIO) -> int | None:
+        """Return the offset after the last complete record, or None if the file has a different header"""
+        f.seek(0)
+        if f.read(len(self._header)) != self._header:
+            return None
+        end = len(self._header)
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for _, offset, length in _scan(mapped, end):
+                end = offset + length
+        return end
+
+    def _unload(self) -> None:
+        # Other processes may have written to the file too, so re-read it on the next lookup
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        self._index = None
+
+    def _rewrite(self, directory: str, records: bytes) -> None:
+        # Keep the newest records that fit in half of max_size, so that the next
+        # few flushes can append without rewriting the file again
+        kept: list[bytes] = []
+        seen: set[bytes] = set()
+        budget = self.max_size // 2 - len(self._header)
+        for digest, offset, length in reversed(list(_scan(records, 0))):
+            start = offset - _RECORD.size
+            if digest in seen:
+                continue
+            budget -= _RECORD.size + length
+            if budget < 0:
+                break
+            seen.add(digest)
+            kept.append(records[start : offset + length])
+
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".markerpry-cache-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(self._header)
+                f.write(b"".join(reversed(kept)))
+            os.replace(temp_path, self.path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+
+
+def _digest(marker_str: str) -> bytes:
+    return hashlib.blake2b(marker_str.encode("utf-8"), digest_size=16).digest()
+
+
+def _scan(buffer: bytes | mmap.mmap, offset: int) -> Iterator[tuple[bytes, int, int]]:
+    """Yield (digest, payload offset, payload length) for each complete record in the buffer"""
+    end = len(buffer)
+    while offset + _RECORD.size <= end:
+        digest, length = _RECORD.unpack_from(buffer, offset)
+        offset += _RECORD.size
+        if offset + length > end:
+            # A writer was interrupted part of the way through this record
+            return
+        yield digest, offset, length
+        offset += length
+
+
+@contextmanager
+def _locked(path: str) -> Iterator[None]:
+    with open(path, "a+b") as lock_file:
+        if sys.platform == "win32":  # no cov
+            import msvcrt
+
+            lock_file.seek(0)
+            msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
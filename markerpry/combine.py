@@ -0,0 +1,169 @@
+"""
+Combine markers with and_(), or_() and not_(), simplifying as the trees are built.
+
+Every node these functions return is interned: equal subtrees built through them are the same object,
+so duplicates can be found by identity, and results are memoized by the identity of the inputs.
+The intern and memo tables are bounded, so an evicted entry only costs a missed simplification or a
+recomputation, never a wrong result.
+"""
+
+from typing import Literal
+
+from markerpry.node import (
+    FALSE,
+    TRUE,
+    BooleanNode,
+    Comparator,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+    _bound,
+)
+
+MAX_CACHE_SIZE = 65536
+
+NEGATED_COMPARATORS: dict[Comparator, Comparator] = {
+    "==": "!=",
+    "!=": "==",
+    "<": ">=",
+    ">=": "<",
+    ">": "<=",
+    "<=": ">",
+    "in": "not in",
+    "not in": "in",
+}
+
+_Operator = Literal["and", "or"]
+
+# Structural key -> interned node. Operator keys use the ids of their interned children,
+# which stay alive (and keep their ids) as long as the interned parent does
+_interned: dict[tuple[object, ...], Node] = {}
+# id of a node that was interned -> (the node, its interned equivalent)
+_canonical: dict[int, tuple[Node, Node]] = {}
+# (operator, id of left, id of right) -> (left, right, result)
+_memo: dict[tuple[str, int, int], tuple[Node, Node, Node]] = {}
+# id of an interned OperatorNode -> (the node, the ids of the operands of its chain)
+_operand_sets: dict[int, tuple[Node, frozenset[int]]] = {}
+
+
+def and_(left: Node, right: Node) -> Node:
+    """
+    Return a node equivalent to (left and right), simplified.
+
+    Constants are folded (True and X => X, False and X => False), duplicate operands are dropped, and
+    absorbed operands are removed (X and (X or Y) => X).
+    """
+    return _combine("and", left, right)
+
+
+def or_(left: Node, right: Node) -> Node:
+    """
+    Return a node equivalent to (left or right), simplified.
+
+    Constants are folded (True or X => True, False or X => X), duplicate operands are dropped, and
+    absorbed operands are removed (X or (X and Y) => X).
+    """
+    return _combine("or", left, right)
+
+
+def not_(node: Node) -> Node:
+    """
+    Return the negation of a node, pushed down to the expressions.
+
+    Operators are negated with De Morgan's laws, and each expression gets the opposite comparator,
+    e.g. == becomes != and < becomes >=. This is exact when the environment has a single value for a key.
+    With several values, evaluate() treats a key as matching when any value matches, so an expression
+    and its negation can both be True.
+
+    Raises:
+        ValueError: If the node contains a comparator that has no negation (~= or ===)
+    """
+    if isinstance(node, BooleanNode):
+        return FALSE if node.state else TRUE
+    if isinstance(node, ExpressionNode):
+        comparator = NEGATED_COMPARATORS.get(node.comparator)
+        if comparator is None:
+            raise ValueError(f"Cannot negate the {node.comparator} comparator in {node}")
+        return intern(ExpressionNode(node.lhs, comparator, node.rhs, node.inverted))
+    if isinstance(node, OperatorNode):
+        left = not_(node._left)
+        right = not_(node._right)
+        return or_(left, right) if node.operator == "and" else and_(left, right)
+    raise NotImplementedError(f"Unknown node {type(node)}: {node}")
+
+
+def intern(node: Node) -> Node:
+    """Return the interned node equal to node. Nodes returned by and_, or_ and not_ are already interned."""
+    canonical = _canonical.get(id(node))
+    if canonical is not None:
+        return canonical[1]
+    if isinstance(node, BooleanNode):
+        return TRUE if node.state else FALSE
+    if isinstance(node, ExpressionNode):
+        key: tuple[object, ...] = (node.lhs, node.comparator, node.rhs, node.inverted)
+    elif isinstance(node, OperatorNode):
+        left = intern(node._left)
+        right = intern(node._right)
+        if left is not node._left or right is not node._right:
+            node = OperatorNode(node.operator, left, right)
+        key = (node.operator, id(left), id(right))
+    else:
+        raise NotImplementedError(f"Unknown node {type(node)}: {node}")
+    result = _interned.get(key)
+    if result is None:
+        result = _interned[key] = node
+        _bound(_interned, MAX_CACHE_SIZE)
+    _canonical[id(node)] = (node, result)
+    _bound(_canonical, MAX_CACHE_SIZE)
+    return result
+
+
+def _combine(operator: _Operator, left: Node, right: Node) -> Node:
+    left = intern(left)
+    right = intern(right)
+    key = (operator, id(left), id(right))
+    memoized = _memo.get(key)
+    if memoized is not None:
+        return memoized[2]
+    result = _simplify(operator, left, right)
+    _memo[key] = (left, right, result)
+    _bound(_memo, MAX_CACHE_SIZE)
+    return result
+
+
+def _simplify(operator: _Operator, left: Node, right: Node) -> Node:
+    # For and: True is the identity, False is absorbing. The reverse for or
+    identity = operator == "and"
+    for a, b in ((left, right), (right, left)):
+        if isinstance(a, BooleanNode):
+            return b if a.state == identity else a
+    if left is right:
+        return left
+
+    left_operands = _operands(left, operator)
+    right_operands = _operands(right, operator)
+    # X and (X and Y) => X and Y, since every operand of one side is already in the other
+    if right_operands <= left_operands:
+        return left
+    if left_operands <= right_operands:
+        return right
+    # X and (X or Y) => X, since X implies (X or Y). The same holds for each operand of a chain
+    dual: _Operator = "or" if operator == "and" else "and"
+    if _operands(right, dual) & left_operands:
+        return left
+    if _operands(left, dual) & right_operands:
+        return right
+    return intern(OperatorNode(operator, left, right))
+
+
+def _operands(node: Node, operator: _Operator) -> frozenset[int]:
+    """Return the ids of the interned operands of a chain of operator, e.g. a, b and c for (a and b) and c"""
+    if not isinstance(node, OperatorNode) or node.operator != operator:
+        return frozenset([id(node)])
+    cached = _operand_sets.get(id(node))
+    if cached is not None:
+        return cached[1]
+    operands = _operands(node._left, operator) | _operands(node._right, operator)
+    _operand_sets[id(node)] = (node, operands)
+    _bound(_operand_sets, MAX_CACHE_SIZE)
+    return operands
@@ -0,0 +1,154 @@
+"""
+Explain why evaluate() produced its result.
+
+explain() walks the tree separately from Node.evaluate(), so evaluate() itself pays nothing for tracing.
+The results are computed with the same methods evaluate() uses, so they always agree with it.
+"""
+
+from dataclasses import dataclass, field
+
+from markerpry.node import (
+    BooleanNode,
+    Environment,
+    EnvironmentValue,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+)
+
+
+@dataclass(frozen=True)
+class Decision:
+    """
+    The evaluation of a single ExpressionNode.
+
+    Attributes:
+        node: The expression that was evaluated
+        result: What the expression evaluated to. This is the expression itself if it couldn't be resolved.
+        outcomes: Each environment value for the expression's key, and what comparing against just that value gave
+    """
+
+    node: ExpressionNode
+    result: Node
+    outcomes: tuple[tuple[EnvironmentValue, bool | None], ...]
+
+    @property
+    def value(self) -> EnvironmentValue | None:
+        """The first environment value that gave the same result as the expression, or None if it is unresolved"""
+        if not isinstance(self.result, BooleanNode):
+            return None
+        for value, outcome in self.outcomes:
+            if outcome == self.result.state:
+                return value
+        return None
+
+    def __str__(self) -> str:
+        return f"{self.node} => {self.result} (value: {self.value!s})"
+
+
+@dataclass(frozen=True)
+class Pruned:
+    """
+    A subtree removed while simplifying an OperatorNode.
+
+    Attributes:
+        node: The subtree, as it was before evaluation
+        result: What the subtree evaluated to
+        rule: The simplification rule that removed it, e.g. "True or X"
+    """
+
+    node: Node
+    result: Node
+    rule: str
+
+    def __str__(self) -> str:
+        return f"{self.node} (by {self.rule})"
+
+
+@dataclass
+class Explanation:
+    """
+    Attributes:
+        result: The same node that evaluate() returns
+        deciding: The expressions that the result depends on. For a resolved result, these are enough on their own
+            to produce it. For an unresolved result, these are the expressions that were resolved along the way.
+        atoms: Every expression that was evaluated, in evaluation order
+        pruned: Every subtree removed by the short circuiting rules, in evaluation order
+    """
+
+    result: Node
+    deciding: list[Decision] = field(default_factory=list)
+    atoms: list[Decision] = field(default_factory=list)
+    pruned: list[Pruned] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        lines = [f"result: {self.result}"]
+        lines.extend(f"decided by: {decision}" for decision in self.deciding)
+        lines.extend(f"pruned: {pruned}" for pruned in self.pruned)
+        return "\n".join(lines)
+
+
+def explain(node: Node, environment: Environment) -> Explanation:
+    """
+    Evaluate a node, recording which expressions decided the result and which subtrees were pruned.
+
+    Args:
+        node: The tree to evaluate
+        environment: The same environment that would be passed to evaluate()
+
+    Returns:
+        An Explanation, whose result is the same as node.evaluate(environment)
+    """
+    explanation = Explanation(node)
+    explanation.result, deciding = _explain(node, environment, explanation)
+    explanation.deciding = list(deciding)
+    return explanation
+
+
+def _explain(node: Node, environment: Environment, explanation: Explanation) -> tuple[Node, tuple[Decision, ...]]:
+    if isinstance(node, OperatorNode):
+        left, left_decisions = _explain(node._left, environment, explanation)
+        right, right_decisions = _explain(node._right, environment, explanation)
+        result = node._simplify(left, right)
+        return result, _simplified(node, left, right, result, left_decisions, right_decisions, explanation)
+    if isinstance(node, ExpressionNode):
+        result = node.evaluate(environment)
+        key = node._key()
+        if key not in environment:
+            return result, ()
+        outcomes = []
+        for value in environment[key]:
+            outcome = node.evaluate({key: [value]})
+            outcomes.append((value, outcome.state if isinstance(outcome, BooleanNode) else None))
+        decision = Decision(node, result, tuple(outcomes))
+        explanation.atoms.append(decision)
+        return result, ((decision,) if result.resolved else ())
+    return node.evaluate(environment), ()
+
+
+def _simplified(
+    node: OperatorNode,
+    left: Node,
+    right: Node,
+    result: Node,
+    left_decisions: tuple[Decision, ...],
+    right_decisions: tuple[Decision, ...],
+    explanation: Explanation,
+) -> tuple[Decision, ...]:
+    # A boolean child that decides the operator on its own prunes its sibling. _simplify checks the left
+    # child first, but when only the right child decides the result, that is the more useful explanation
+    if result is node:
+        return left_decisions + right_decisions
+    absorbing = node.operator == "or"
+    if isinstance(left, BooleanNode) and left.state == absorbing:
+        explanation.pruned.append(Pruned(node._right, right, f"{left} {node.operator} X"))
+        return left_decisions
+    if isinstance(right, BooleanNode) and right.state == absorbing:
+        explanation.pruned.append(Pruned(node._left, left, f"X {node.operator} {right}"))
+        return right_decisions
+    # Otherwise a boolean child has no effect on the result, and is dropped
+    if isinstance(left, BooleanNode):
+        explanation.pruned.append(Pruned(node._left, left, f"{left} {node.operator} X"))
+    elif isinstance(right, BooleanNode):
+        explanation.pruned.append(Pruned(node._right, right, f"X {node.operator} {right}"))
+    return left_decisions + right_decisions
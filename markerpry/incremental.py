@@ -0,0 +1,139 @@
+"""
+Re-evaluate a forest of markers as the environment changes one key at a time.
+"""
+
+import heapq
+from collections.abc import Iterable, Mapping
+
+from markerpry.node import (
+    Environment,
+    EnvironmentValue,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+    compile_environment,
+)
+
+
+class IncrementalEvaluator:
+    """
+    Keeps the evaluated result of every tree in a forest up to date with an environment.
+
+    Each distinct subtree is evaluated once, and the atoms are indexed by the environment key they read.
+    After update(), only the atoms reading a changed key are re-evaluated, along with the ancestors whose
+    children actually changed. Every other result is reused as is.
+
+    Example:
+        evaluator = IncrementalEvaluator(nodes, {"sys_platform": ["linux"]})
+        for version in candidates:
+            evaluator.update({"python_version": [version]})
+            results = evaluator.results
+    """
+
+    def __init__(self, nodes: Iterable[Node], environment: Environment | None = None):
+        """
+        Args:
+            nodes: The trees to evaluate
+            environment: The initial environment. It is copied, so later changes must go through update()
+        """
+        self._environment: Environment = dict(environment or {})
+        self._compiled = compile_environment(self._environment)
+        # Subtrees are numbered children first, so parents always have a higher slot than their children
+        self._nodes: list[Node] = []
+        self._children: list[tuple[int, int] | None] = []
+        self._parents: list[list[int]] = []
+        self._atoms: dict[str, list[int]] = {}
+        self._slots: dict[int, int] = {}
+        self._atom_slots: dict[ExpressionNode, int] = {}
+        self._roots = [self._add(node) for node in nodes]
+        self._results: list[Node] = []
+        for slot in range(len(self._nodes)):
+            self._results.append(self._compute(slot))
+
+    @property
+    def environment(self) -> Environment:
+        """A copy of the current environment"""
+        return dict(self._environment)
+
+    @property
+    def results(self) -> list[Node]:
+        """The evaluated result of each tree, in the order they were given"""
+        return [self._results[slot] for slot in self._roots]
+
+    def update(self, changes: Mapping[str, list[EnvironmentValue] | None]) -> list[int]:
+        """
+        Change some keys of the environment, and re-evaluate whatever depends on them.
+
+        Args:
+            changes: The new values for each changed key. None removes the key from the environment.
+
+        Returns:
+            The positions of the trees whose result changed
+        """
+        dirty: list[int] = []
+        for key, values in changes.items():
+            if values is None:
+                if self._environment.pop(key, None) is None:
+                    continue
+            elif self._environment.get(key) == values:
+                continue
+            else:
+                self._environment[key] = list(values)
+            dirty.extend(self._atoms.get(key, ()))
+
+        if dirty:
+            self._compiled = compile_environment(self._environment)
+        heapq.heapify(dirty)
+        changed: set[int] = set()
+        queued = set(dirty)
+        while dirty:
+            slot = heapq.heappop(dirty)
+            result = self._compute(slot)
+            previous = self._results[slot]
+            if result is previous or result == previous:
+                continue
+            self._results[slot] = result
+            changed.add(slot)
+            for parent in self._parents[slot]:
+                if parent not in queued:
+                    queued.add(parent)
+                    heapq.heappush(dirty, parent)
+        return [position for position, slot in enumerate(self._roots) if slot in changed]
+
+    def _add(self, node: Node) -> int:
+        slot = self._slots.get(id(node))
+        if slot is not None:
+            return slot
+        if isinstance(node, ExpressionNode):
+            # Equal atoms from different trees share a slot, so they're only evaluated once
+            slot = self._atom_slots.get(node)
+            if slot is None:
+                slot = self._atom_slots[node] = self._new_slot(node, None)
+                self._atoms.setdefault(node._key(), []).append(slot)
+        elif isinstance(node, OperatorNode):
+            left = self._add(node._left)
+            right = self._add(node._right)
+            slot = self._new_slot(node, (left, right))
+            self._parents[left].append(slot)
+            if right != left:
+                self._parents[right].append(slot)
+        else:
+            slot = self._new_slot(node, None)
+        # Every node stays reachable from self._nodes, so its id can't be reused
+        self._slots[id(node)] = slot
+        return slot
+
+    def _new_slot(self, node: Node, children: tuple[int, int] | None) -> int:
+        self._nodes.append(node)
+        self._children.append(children)
+        self._parents.append([])
+        return len(self._nodes) - 1
+
+    def _compute(self, slot: int) -> Node:
+        node = self._nodes[slot]
+        children = self._children[slot]
+        if children is None:
+            return node.evaluate(self._compiled)
+        assert isinstance(node, OperatorNode)
+        left, right = children
+        return node._simplify(self._results[left], self._results[right])
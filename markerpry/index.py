@@ -0,0 +1,150 @@
+"""
+An indexed store for large forests of markers.
+"""
+
+from collections.abc import Iterable, Iterator
+
+from markerpry.node import (
+    BooleanNode,
+    Environment,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+    compile_environment,
+    normalize_extra,
+)
+
+Atom = tuple[str, str, str]
+
+
+class MarkerIndex:
+    """
+    A list of markers, indexed by the keys and atoms they use.
+
+    Equal ExpressionNodes are interned, so every marker in the index shares a single instance of each
+    distinct atom. Markers are identified by their position, in the order they were added.
+
+    Example:
+        index = MarkerIndex(parse(marker) for marker in lock_file_markers)
+        index.with_key("platform_machine")
+        index.true_for(env)
+    """
+
+    def __init__(self, nodes: Iterable[Node] = ()):
+        self._nodes: list[Node] = []
+        self._atoms: dict[ExpressionNode, ExpressionNode] = {}
+        self._by_key: dict[str, set[int]] = {}
+        self._by_atom: dict[Atom, set[int]] = {}
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: Node) -> int:
+        """
+        Add a marker to the index.
+
+        Returns:
+            The position of the marker
+        """
+        position = len(self._nodes)
+        atoms: set[ExpressionNode] = set()
+        node = self._intern(node, atoms)
+        self._nodes.append(node)
+        for atom in atoms:
+            self._by_key.setdefault(atom._key(), set()).add(position)
+            self._by_atom.setdefault(_atom(atom), set()).add(position)
+        return position
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __getitem__(self, position: int) -> Node:
+        return self._nodes[position]
+
+    def __iter__(self) -> Iterator[Node]:
+        return iter(self._nodes)
+
+    def keys(self) -> set[str]:
+        """Return every environment key used by the markers"""
+        return set(self._by_key)
+
+    def atoms(self) -> list[ExpressionNode]:
+        """Return each distinct ExpressionNode used by the markers"""
+        return list(self._atoms)
+
+    def with_key(self, key: str) -> list[int]:
+        """Return the positions of the markers that reference key"""
+        return sorted(self._by_key.get(key, ()))
+
+    def with_atom(self, key: str, comparator: str, value: str) -> list[int]:
+        """
+        Return the positions of the markers containing a comparison of key against value.
+
+        The comparison is matched regardless of which side of the comparator the key is written on.
+        Extras compared with ==, === or != are normalized, as they are in the markers.
+        """
+        if key == "extra" and comparator in ("==", "===", "!="):
+            value = normalize_extra(value)
+        return sorted(self._by_atom.get((key, comparator, value), ()))
+
+    def evaluate(self, environment: Environment) -> list[Node]:
+        """
+        Evaluate every marker against the environment.
+
+        Each distinct atom is only evaluated once, no matter how many markers use it.
+
+        Returns:
+            The result of evaluate() for each marker, in order
+        """
+        environment = compile_environment(environment)
+        results: dict[int, Node] = {}
+        return [_evaluate(node, environment, results) for node in self._nodes]
+
+    def true_for(self, environment: Environment) -> list[int]:
+        """Return the positions of the markers that evaluate to True"""
+        results = self.evaluate(environment)
+        return [position for position, result in enumerate(results) if isinstance(result, BooleanNode) and result.state]
+
+    def unresolved_without(self, key: str, environment: Environment) -> list[int]:
+        """
+        Return the positions of the markers that are left unresolved when key is missing from the environment.
+
+        Only the markers that reference key are evaluated.
+        """
+        environment = compile_environment({k: v for k, v in environment.items() if k != key})
+        results: dict[int, Node] = {}
+        return [
+            position
+            for position in self.with_key(key)
+            if not _evaluate(self._nodes[position], environment, results).resolved
+        ]
+
+    def _intern(self, node: Node, atoms: set[ExpressionNode]) -> Node:
+        if isinstance(node, ExpressionNode):
+            interned = self._atoms.setdefault(node, node)
+            atoms.add(interned)
+            return interned
+        if isinstance(node, OperatorNode):
+            left = self._intern(node._left, atoms)
+            right = self._intern(node._right, atoms)
+            if left is node._left and right is node._right:
+                return node
+            return OperatorNode(node.operator, left, right)
+        return node
+
+
+def _atom(node: ExpressionNode) -> Atom:
+    return (node._key(), node.comparator, node._value())
+
+
+def _evaluate(node: Node, environment: Environment, results: dict[int, Node]) -> Node:
+    # Atoms are interned, so results are shared between markers by the id of the atom
+    if isinstance(node, OperatorNode):
+        left = _evaluate(node._left, environment, results)
+        right = _evaluate(node._right, environment, results)
+        return node._simplify(left, right)
+    if isinstance(node, ExpressionNode):
+        result = results.get(id(node))
+        if result is None:
+            result = results[id(node)] = node.evaluate(environment)
+        return result
+    return node.evaluate(environment)
@@ -0,0 +1,146 @@
+from dataclasses import dataclass
+
+from packaging.specifiers import InvalidSpecifier, Specifier, SpecifierSet
+from packaging.version import Version
+
+
+@dataclass(frozen=True)
+class Interval:
+    """A contiguous range of versions. A missing bound is unbounded in that direction."""
+
+    lower: Version | None = None
+    upper: Version | None = None
+    lower_inclusive: bool = False
+    upper_inclusive: bool = False
+
+    def is_empty(self) -> bool:
+        if self.lower is None or self.upper is None:
+            return False
+        if self.lower == self.upper:
+            return not (self.lower_inclusive and self.upper_inclusive)
+        return self.lower > self.upper
+
+    def intersect(self, other: "Interval") -> "Interval":
+        lower, lower_inclusive = self.lower, self.lower_inclusive
+        if other.lower is not None and (
+            lower is None or other.lower > lower or (other.lower == lower and not other.lower_inclusive)
+        ):
+            lower, lower_inclusive = other.lower, other.lower_inclusive
+
+        upper, upper_inclusive = self.upper, self.upper_inclusive
+        if other.upper is not None and (
+            upper is None or other.upper < upper or (other.upper == upper and not other.upper_inclusive)
+        ):
+            upper, upper_inclusive = other.upper, other.upper_inclusive
+
+        return Interval(lower, upper, lower_inclusive, upper_inclusive)
+
+    def issubset(self, other: "Interval") -> bool:
+        if self.is_empty():
+            return True
+        if other.lower is not None:
+            if self.lower is None or self.lower < other.lower:
+                return False
+            if self.lower == other.lower and self.lower_inclusive and not other.lower_inclusive:
+                return False
+        if other.upper is not None:
+            if self.upper is None or self.upper > other.upper:
+                return False
+            if self.upper == other.upper and self.upper_inclusive and not other.upper_inclusive:
+                return False
+        return True
+
+
+# A union of intervals
+VersionRange = tuple[Interval, ...]
+
+EVERYTHING: VersionRange = (Interval(),)
+
+
+def intersect(a: VersionRange, b: VersionRange) -> VersionRange:
+    """Return the versions contained in both ranges."""
+    result = (x.intersect(y) for x in a for y in b)
+    return tuple(interval for interval in result if not interval.is_empty())
+
+
+def is_empty(a: VersionRange) -> bool:
+    return all(interval.is_empty() for interval in a)
+
+
+def issubset(a: VersionRange, b: VersionRange) -> bool:
+    """
+    Return whether every version in a is also in b.
+
+    Each interval in a must fit inside a single interval of b, so this can return False
+    for a range that is only covered by several adjacent intervals of b.
+    """
+    return all(any(x.issubset(y) for y in b) for x in a)
+
+
+def specifier_range(specifier: Specifier) -> VersionRange | None:
+    """
+    Convert a specifier into the range of versions it allows.
+
+    The conversion follows the ordering of versions, and ignores the special handling of
+    pre-releases, post-releases and local versions. Returns None for arbitrary equality (===)
+    """
+    operator = specifier.operator
+    version = specifier.version
+    if operator in ("==", "!=") and version.endswith(".*"):
+        prefix = version[:-2]
+        interval = Interval(Version(f"{prefix}.dev0"), _next_prefix(prefix), True, False)
+        if operator == "==":
+            return (interval,)
+        return (
+            Interval(upper=interval.lower, upper_inclusive=False),
+            Interval(lower=interval.upper, lower_inclusive=True),
+        )
+
+    parsed = Version(version)
+    if operator == "==":
+        return (Interval(parsed, parsed, True, True),)
+    elif operator == "!=":
+        return (Interval(upper=parsed), Interval(lower=parsed))
+    elif operator == "<":
+        return (Interval(upper=parsed),)
+    elif operator == "<=":
+        return (Interval(upper=parsed, upper_inclusive=True),)
+    elif operator == ">":
+        return (Interval(lower=parsed),)
+    elif operator == ">=":
+        return (Interval(lower=parsed, lower_inclusive=True),)
+    elif operator == "~=":
+        # ~= 3.8.1 is >= 3.8.1, == 3.8.*. Pre, post and dev parts are dropped, so ~= 3.8.post1 is == 3.*
+        epoch = f"{parsed.epoch}!" if parsed.epoch else ""
+        prefix = epoch + ".".join(str(x) for x in parsed.release[:-1])
+        return (Interval(parsed, _next_prefix(prefix), True, False),)
+    return None
+
+
+def specifier_set_range(specifiers: SpecifierSet) -> VersionRange | None:
+    """Convert a specifier set into the range of versions allowed by all of its specifiers."""
+    result = EVERYTHING
+    for specifier in specifiers:
+        specifier_result = specifier_range(specifier)
+        if specifier_result is None:
+            return None
+        result = intersect(result, specifier_result)
+    return result
+
+
+def comparison_range(comparator: str, value: str) -> VersionRange | None:
+    """Convert a marker comparison such as >= "3.8" into a range, or None if it isn't a valid specifier."""
+    try:
+        specifier = Specifier(f"{comparator}{value}")
+    except InvalidSpecifier:
+        return None
+    return specifier_range(specifier)
+
+
+def _next_prefix(prefix: str) -> Version:
+    """Return the first (dev) release after every version starting with prefix, e.g. 3.8 => 3.9.dev0"""
+    parsed = Version(prefix)
+    release = list(parsed.release)
+    release[-1] += 1
+    epoch = f"{parsed.epoch}!" if parsed.epoch else ""
+    return Version(f"{epoch}{'.'.join(str(x) for x in release)}.dev0")
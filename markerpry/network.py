@@ -0,0 +1,145 @@
+"""
+A discrimination network for matching one environment against many markers.
+
+The trees are merged into a single graph, in the style of a Rete network. Each distinct ExpressionNode
+becomes an alpha node, indexed by the key it reads, and each distinct (operator, left, right) combination
+becomes a join node shared by every tree that contains it.
+
+Matching an environment only evaluates the alpha nodes for the keys in the environment, then propagates
+the resolved values up through the joins they feed. Joins without a resolved input are never visited, so
+the work is bounded by the number of distinct atoms and joins rather than the total size of the trees.
+"""
+
+import heapq
+from collections.abc import Iterable
+
+from markerpry.node import (
+    BooleanNode,
+    Environment,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+    compile_environment,
+)
+
+_ALPHA = 0
+_AND = 1
+_OR = 2
+_CONSTANT = 3
+
+
+class MarkerNetwork:
+    """
+    Matches environments against a fixed set of markers.
+
+    Example:
+        network = MarkerNetwork(parse(marker) for marker in markers)
+        network.match(env)  # the positions of the markers that are True
+    """
+
+    def __init__(self, nodes: Iterable[Node]):
+        # Nodes are numbered children first, so a join always has a higher number than its inputs
+        self._kinds: list[int] = []
+        self._atoms: list[ExpressionNode | None] = []
+        self._inputs: list[tuple[int, int]] = []
+        self._outputs: list[list[int]] = []
+        self._alpha: dict[ExpressionNode, int] = {}
+        self._alpha_by_key: dict[str, list[int]] = {}
+        self._joins: dict[tuple[int, int, int], int] = {}
+        self._constants: dict[int, bool] = {}
+        self._roots = [self._add(node) for node in nodes]
+
+    def __len__(self) -> int:
+        """Return the number of markers in the network"""
+        return len(self._roots)
+
+    @property
+    def size(self) -> int:
+        """The number of distinct alpha, join and constant nodes in the network"""
+        return len(self._kinds)
+
+    def resolve(self, environment: Environment) -> list[bool | None]:
+        """
+        Resolve every marker against the environment.
+
+        Returns:
+            For each marker, True or False if it resolves to that value, or None if it is left unresolved.
+            These match the BooleanNode results of evaluate().
+        """
+        environment = compile_environment(environment)
+        state = dict(self._constants)
+        pending: list[int] = []
+        for key in environment:
+            for slot in self._alpha_by_key.get(key, ()):
+                atom = self._atoms[slot]
+                assert atom is not None
+                result = atom.evaluate(environment)
+                if isinstance(result, BooleanNode):
+                    state[slot] = result.state
+        for slot in state:
+            pending.extend(self._outputs[slot])
+
+        heapq.heapify(pending)
+        seen = set(pending)
+        while pending:
+            slot = heapq.heappop(pending)
+            left, right = self._inputs[slot]
+            value = _join(self._kinds[slot], state.get(left), state.get(right))
+            if value is None:
+                continue
+            state[slot] = value
+            for output in self._outputs[slot]:
+                if output not in seen:
+                    seen.add(output)
+                    heapq.heappush(pending, output)
+        return [state.get(slot) for slot in self._roots]
+
+    def match(self, environment: Environment) -> list[int]:
+        """Return the positions of the markers that are True for the environment"""
+        return [position for position, value in enumerate(self.resolve(environment)) if value is True]
+
+    def _add(self, node: Node) -> int:
+        if isinstance(node, ExpressionNode):
+            slot = self._alpha.get(node)
+            if slot is None:
+                slot = self._alpha[node] = self._new_slot(_ALPHA, node, (-1, -1))
+                self._alpha_by_key.setdefault(node._key(), []).append(slot)
+            return slot
+        if isinstance(node, OperatorNode):
+            kind = _AND if node.operator == "and" else _OR
+            left = self._add(node._left)
+            right = self._add(node._right)
+            slot = self._joins.get((kind, left, right))
+            if slot is None:
+                slot = self._joins[(kind, left, right)] = self._new_slot(kind, None, (left, right))
+                self._outputs[left].append(slot)
+                if right != left:
+                    self._outputs[right].append(slot)
+            return slot
+        if isinstance(node, BooleanNode):
+            slot = self._new_slot(_CONSTANT, None, (-1, -1))
+            self._constants[slot] = node.state
+            return slot
+        raise NotImplementedError(f"Unknown node {type(node)}: {node}")
+
+    def _new_slot(self, kind: int, atom: ExpressionNode | None, inputs: tuple[int, int]) -> int:
+        self._kinds.append(kind)
+        self._atoms.append(atom)
+        self._inputs.append(inputs)
+        self._outputs.append([])
+        return len(self._kinds) - 1
+
+
+def _join(kind: int, left: bool | None, right: bool | None) -> bool | None:
+    # The same short circuiting as OperatorNode._simplify, on resolved values only
+    if kind == _AND:
+        if left is False or right is False:
+            return False
+        if left is True and right is True:
+            return True
+        return None
+    if left is True or right is True:
+        return True
+    if left is False and right is False:
+        return False
+    return None
@@ -1,24 +1,323 @@
+import operator
 import re
+import sys
 from abc import ABC, abstractmethod
-from dataclasses import dataclass
-from typing import Literal
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Literal, NoReturn, TypeVar, Union, cast
 
-from packaging.specifiers import InvalidSpecifier, SpecifierSet
-from packaging.version import Version
-from typing_extensions import assert_never, override
+from packaging.version import InvalidVersion, Version
 
-Environment = dict[str, list[str | Version | re.Pattern[str] | bool]]
+from markerpry.stats import register_cache
+
+# packaging.specifiers is slow to import, and isn't needed until a version comparison
+# is evaluated, so it's imported on first use. typing_extensions is only needed for type checking
+if TYPE_CHECKING:
+    from packaging.specifiers import SpecifierSet
+    from typing_extensions import TypeIs, assert_never, override
+
+    from markerpry.interval import VersionRange
+else:
+    _F = TypeVar("_F")
+
+    def override(method: _F) -> _F:
+        return method
+
+    def assert_never(value: Any) -> NoReturn:
+        raise AssertionError(f"Unhandled value: {value!r}")
+
+
+EnvironmentValue = Union[str, Version, "SpecifierSet", re.Pattern[str], bool]
+Environment = dict[str, list[EnvironmentValue]]
 Comparator = Literal["==", "===", "!=", ">", "<", ">=", "<=", "in", "not in", "~="]
 
+# Each environment key is assigned one of MASK_BITS bits, the first time it's seen. A node's mask is the union
+# of the bits for the keys it reads, so a subtree can be skipped when its mask doesn't intersect the environment's.
+# Keys beyond MASK_BITS share bits, which only means a subtree is visited when it could have been skipped
+MASK_BITS = 64
+_key_bits: dict[str, int] = {}
+
+
+def _key_mask(key: str) -> int:
+    bit = _key_bits.get(key)
+    if bit is None:
+        bit = _key_bits.setdefault(key, 1 << (len(_key_bits) % MASK_BITS))
+    return bit
+
+
+class CompiledEnvironment(dict[str, list[EnvironmentValue]]):
+    """
+    An Environment, along with the mask of the keys it contains.
+
+    Evaluating with a compiled environment avoids compiling it again for each tree, version strings are
+    already parsed, and the patterns for a key are matched together, see _PatternSet. It can't be changed
+    once it's built, since the mask and the extras would no longer match its keys. Build a new one instead,
+    e.g. CompiledEnvironment({**compiled, "extra": ["test"]}).
+    """
+
+    __slots__ = ("mask", "_pattern_sets", "_extras")
+
+    mask: int
+    _pattern_sets: "dict[str, _PatternSet]"
+    # The normalized extras, when every value for the extra key is a str
+    _extras: "frozenset[str] | None"
+
+    def __init__(self, environment: Environment) -> None:
+        """
+        Compile an environment. The environment, and its lists of values, are left unchanged.
+
+        str values for the keys in VERSION_KEYS, e.g. from platform.python_version(), are parsed into a Version,
+        so they resolve version comparisons. Values that aren't valid versions are kept as strings.
+        Extras are normalized with normalize_extra().
+        """
+        values = dict(environment)
+        self._extras = None
+        extras = values.get("extra")
+        if extras is not None:
+            extras = values["extra"] = [normalize_extra(value) if isinstance(value, str) else value for value in extras]
+            if all(isinstance(value, str) for value in extras):
+                self._extras = frozenset(cast(list[str], extras))
+        for key in VERSION_KEYS:
+            key_values = values.get(key)
+            if key_values is not None and any(isinstance(value, str) for value in key_values):
+                values[key] = [_coerce_version(value) if isinstance(value, str) else value for value in key_values]
+        super().__init__(values)
+        mask = 0
+        for key in values:
+            mask |= _key_mask(key)
+        self.mask = mask
+        self._pattern_sets = {}
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> NoReturn:
+        raise TypeError("A CompiledEnvironment can't be changed, build a new one instead")
+
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    update = pop = popitem = setdefault = clear = _read_only
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Key bits are assigned per process, so compile the environment again when it's unpickled
+        return (CompiledEnvironment, (dict(self),))
+
+    def _patterns(self, key: str) -> "_PatternSet":
+        """Return the patterns for key, merged. They're only merged the first time a key is matched"""
+        pattern_set = self._pattern_sets.get(key)
+        if pattern_set is None:
+            patterns = tuple(value for value in self[key] if isinstance(value, re.Pattern))
+            pattern_set = self._pattern_sets[key] = _pattern_set(patterns)
+        return pattern_set
+
+
+def compile_environment(environment: Environment) -> CompiledEnvironment:
+    """
+    Prepare an environment for evaluating many trees. Compiled environments are returned unchanged.
+
+    See CompiledEnvironment for what compiling does.
+    """
+    if isinstance(environment, CompiledEnvironment):
+        return environment
+    return CompiledEnvironment(environment)
+
+
+_current_environment: "CompiledEnvironment | None" = None
+
+
+def current_environment(extras: Iterable[str] | None = None) -> CompiledEnvironment:
+    """
+    Return the environment of the running interpreter, from packaging.markers.default_environment().
+
+    It's only built the first time it's needed, and the same read-only environment is returned after that.
+    Without extras, it has no extra key, so expressions on extras are left unevaluated.
+
+    Args:
+        extras: The extras being installed. A new environment, with them as the extra key, is returned
+    """
+    global _current_environment
+    if _current_environment is None:
+        from packaging.markers import default_environment
+
+        # The values are all strings, but newer versions of packaging type them as a TypedDict
+        environment: Environment = {key: [str(value)] for key, value in default_environment().items()}
+        _current_environment = compile_environment(environment)
+    if extras is None:
+        return _current_environment
+    return CompiledEnvironment({**_current_environment, "extra": list(extras)})
+
+
+# The most normalized extra names that are kept
+EXTRA_CACHE_SIZE = 4096
+# name -> its normalized, interned, form
+_normalized_extras: dict[str, str] = {}
+_EXTRA_SEPARATORS = re.compile(r"[-_.]+")
+
+
+def normalize_extra(name: str) -> str:
+    """
+    Normalize an extra name as PEP 685 requires: lowercase, with runs of -, _ and . replaced by a single -.
+
+    The result is interned, so comparing normalized names is usually an identity check.
+    """
+    normalized = _normalized_extras.get(name)
+    if normalized is None:
+        normalized = _normalized_extras[name] = sys.intern(_EXTRA_SEPARATORS.sub("-", name).lower())
+        _bound(_normalized_extras, EXTRA_CACHE_SIZE)
+    return normalized
+
+
+# Keys whose str values are parsed into a Version when an environment is compiled,
+# so they can be compared with <, >= etc. rather than only as strings
+VERSION_KEYS = ("python_version", "python_full_version", "implementation_version")
+# The most parsed versions that are kept
+VERSION_CACHE_SIZE = 4096
+# str -> its Version, or the str itself if it isn't a valid version
+_versions: "dict[str, Version | str]" = {}
+_version_hits = 0
+
+
+def _coerce_version(value: str) -> "Version | str":
+    global _version_hits
+    version = _versions.get(value)
+    if version is not None:
+        _version_hits += 1
+        return version
+    try:
+        version = Version(value)
+    except InvalidVersion:
+        # Left as a string, so it's still compared as one
+        version = value
+    _versions[value] = version
+    _bound(_versions, VERSION_CACHE_SIZE)
+    return version
+
+
+# The most pattern sets, and (pattern set, value) match results, that are kept
+PATTERN_CACHE_SIZE = 4096
+# patterns -> their _PatternSet, so environments with the same patterns share match results
+_pattern_sets: "dict[tuple[re.Pattern[str], ...], _PatternSet]" = {}
+# (pattern set, value) -> (whether any pattern matches, whether all of them do)
+_pattern_matches: "dict[tuple[_PatternSet, str], tuple[bool, bool]]" = {}
+_pattern_match_hits = 0
+
+
+class _PatternSet:
+    """
+    The patterns an environment has for one key, merged into as few alternations as possible.
+
+    == only needs to know whether any pattern matches, which one match of the alternation answers.
+    != needs to know whether all of them do, so each pattern is only tried on its own when the alternation matches.
+    Both answers are memoized for each value in _pattern_matches.
+    """
+
+    __slots__ = ("patterns", "merged")
+
+    def __init__(self, patterns: tuple[re.Pattern[str], ...]) -> None:
+        self.patterns = patterns
+        self.merged = _merge_patterns(patterns)
+
+    def match(self, value: str) -> tuple[bool, bool]:
+        """Return whether any of the patterns match value, and whether all of them do"""
+        global _pattern_match_hits
+        key = (self, value)
+        result = _pattern_matches.get(key)
+        if result is not None:
+            _pattern_match_hits += 1
+            return result
+        matched_any = any(pattern.match(value) is not None for pattern in self.merged)
+        if len(self.patterns) == 1 or not matched_any:
+            result = (matched_any, matched_any)
+        else:
+            result = (True, all(pattern.match(value) is not None for pattern in self.patterns))
+        _pattern_matches[key] = result
+        _bound(_pattern_matches, PATTERN_CACHE_SIZE)
+        return result
+
+
+def _pattern_set(patterns: tuple[re.Pattern[str], ...]) -> _PatternSet:
+    pattern_set = _pattern_sets.get(patterns)
+    if pattern_set is None:
+        pattern_set = _pattern_sets[patterns] = _PatternSet(patterns)
+        _bound(_pattern_sets, PATTERN_CACHE_SIZE)
+    return pattern_set
+
+
+# A numbered or named backreference, or a conditional on a group, which would refer to a different group
+# once the pattern is merged
+_BACKREFERENCE = re.compile(r"\\[1-9]|\(\?P=|\(\?\(")
+
+
+def _merge_patterns(patterns: tuple[re.Pattern[str], ...]) -> list[re.Pattern[str]]:
+    """Merge patterns with the same flags into one alternation, which matches when any of them would"""
+    by_flags: dict[int, list[re.Pattern[str]]] = {}
+    merged: list[re.Pattern[str]] = []
+    for pattern in patterns:
+        if _BACKREFERENCE.search(pattern.pattern):
+            merged.append(pattern)
+        else:
+            by_flags.setdefault(pattern.flags, []).append(pattern)
+    for flags, group in by_flags.items():
+        if len(group) == 1:
+            merged.append(group[0])
+            continue
+        # In verbose patterns, a comment runs until the end of the line, and would hide the closing parenthesis
+        end = "\n)" if flags & re.VERBOSE else ")"
+        try:
+            merged.append(re.compile("|".join(f"(?:{pattern.pattern}{end}" for pattern in group), flags))
+        except re.error:
+            # e.g. the same group name is used in two patterns
+            merged.extend(group)
+    return merged
+
+
+# The most SpecifierSet environment values whose ranges are kept
+SPECIFIER_RANGE_CACHE_SIZE = 4096
+# id(SpecifierSet) -> the SpecifierSet, and the range of versions it allows, or None if it's empty or can't be
+# converted into one. Hashing a SpecifierSet canonicalizes every version in it, so they're looked up by identity instead.
+# The entry holds a reference to the SpecifierSet, so its id can't be reused while it's cached
+_specifier_ranges: "dict[int, tuple[SpecifierSet, VersionRange | None]]" = {}
+_specifier_range_hits = 0
+
+
+def _specifier_set_range(value: "SpecifierSet") -> "VersionRange | None":
+    global _specifier_range_hits
+    entry = _specifier_ranges.get(id(value))
+    if entry is not None and entry[0] is value:
+        _specifier_range_hits += 1
+        return entry[1]
+    from markerpry.interval import is_empty, specifier_set_range
+
+    result = specifier_set_range(value)
+    if result is not None and is_empty(result):
+        result = None
+    _specifier_ranges[id(value)] = (value, result)
+    _bound(_specifier_ranges, SPECIFIER_RANGE_CACHE_SIZE)
+    return result
+
+
+def _bound(cache: dict[Any, Any], size: int) -> None:
+    # Evict the oldest entry
+    if len(cache) > size:
+        del cache[next(iter(cache))]
+
+
+register_cache("patterns", lambda: _pattern_match_hits)
+register_cache("versions", lambda: _version_hits)
+register_cache("specifier_ranges", lambda: _specifier_range_hits)
+
 
 class Node(ABC):
     """Base class for all nodes in the marker expression tree."""
 
+    # The keys this node reads, see _key_mask(). Nodes that don't set it are never skipped
+    _mask: int = -1
+
     @abstractmethod
     def evaluate(self, environment: Environment) -> "Node":
         """Partially or fully evaluates the node based on the environment"""
         pass
 
+    def evaluate_here(self, extras: Iterable[str] | None = None) -> "Node":
+        """Evaluate the node against the running interpreter, and any extras, see current_environment()"""
+        return self.evaluate(current_environment(extras))
+
     @override
     @abstractmethod
     def __str__(self) -> str:
@@ -42,6 +341,22 @@ class Node(ABC):
         """Return whether this node contains the given key."""
         pass
 
+    def to_bytes(self) -> bytes:
+        """Serialize this node into the compact binary format from markerpry.serialize"""
+        from markerpry.serialize import dumps
+
+        return dumps([self])
+
+    @staticmethod
+    def from_bytes(data: bytes | bytearray | memoryview) -> "Node":
+        """Deserialize a node created by to_bytes()"""
+        from markerpry.serialize import loads
+
+        nodes = loads(data)
+        if len(nodes) != 1:
+            raise ValueError(f"Expected a single serialized node, found {len(nodes)}")
+        return nodes[0]
+
     def __bool__(self) -> bool:
         """
         Prevent accidental boolean coercion of non-boolean nodes.
@@ -55,6 +370,7 @@ class BooleanNode(Node):
     """A node representing a boolean literal value."""
 
     state: bool
+    _mask: int = field(default=0, init=False, repr=False, compare=False)
 
     @override
     def __str__(self) -> str:
@@ -76,6 +392,9 @@ class BooleanNode(Node):
     def resolved(self) -> bool:
         return True
 
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (BooleanNode, (self.state,))
+
     @override
     def __eq__(self, other: object) -> bool:
         if isinstance(other, BooleanNode):
@@ -89,6 +408,52 @@ TRUE = BooleanNode(True)
 FALSE = BooleanNode(False)
 
 
+def _contains(value: str, literal: str) -> bool:
+    return literal in value
+
+
+def _does_not_contain(value: str, literal: str) -> bool:
+    return literal not in value
+
+
+def _is_in(value: str, literal: str) -> bool:
+    return value in literal
+
+
+def _is_not_in(value: str, literal: str) -> bool:
+    return value not in literal
+
+
+def _matches_pattern(pattern: re.Pattern[str], literal: str) -> bool:
+    return pattern.match(literal) is not None
+
+
+def _does_not_match_pattern(pattern: re.Pattern[str], literal: str) -> bool:
+    return pattern.match(literal) is None
+
+
+# How an ExpressionNode compares an environment value with its literal, keyed by (comparator, inverted).
+# For in and not in, inverted means the key is on the left, e.g. platform_machine in "x86_64 arm64".
+# Comparators that are missing leave the expression unevaluated
+_STRING_COMPARISONS: "dict[tuple[str, bool], Callable[[str, str], bool]]" = {
+    ("==", False): operator.eq,
+    ("==", True): operator.eq,
+    ("===", False): operator.eq,
+    ("===", True): operator.eq,
+    ("!=", False): operator.ne,
+    ("!=", True): operator.ne,
+    ("in", False): _contains,
+    ("in", True): _is_in,
+    ("not in", False): _does_not_contain,
+    ("not in", True): _is_not_in,
+}
+_PATTERN_COMPARISONS: "dict[str, Callable[[re.Pattern[str], str], bool]]" = {
+    "==": _matches_pattern,
+    "===": _matches_pattern,
+    "!=": _does_not_match_pattern,
+}
+
+
 @dataclass(frozen=True)
 class ExpressionNode(Node):
     """A node representing a comparison expression (e.g., python_version > '3.7')."""
@@ -97,9 +462,52 @@ class ExpressionNode(Node):
     comparator: Comparator
     rhs: str
     inverted: bool = False
+    _mask: int = field(init=False, repr=False, compare=False)
+    _str: "str | None" = field(default=None, init=False, repr=False, compare=False)
+    # Bound once in __post_init__, so evaluating doesn't need to look at the comparator again
+    _key_name: str = field(init=False, repr=False, compare=False)
+    _literal: str = field(init=False, repr=False, compare=False)
+    _string_comparison: "Callable[[str, str], bool] | None" = field(init=False, repr=False, compare=False)
+    _pattern_comparison: "Callable[[re.Pattern[str], str], bool] | None" = field(init=False, repr=False, compare=False)
+    # Whether this is an ==, === or != comparison of extras, which is a lookup in CompiledEnvironment._extras
+    _extra_comparison: bool = field(init=False, repr=False, compare=False)
+    # Whether the key is extra, whose values are normalized when the environment is compiled
+    _extra_key: bool = field(init=False, repr=False, compare=False)
+    # Whether the key is one of VERSION_KEYS, whose str values are parsed when the environment is compiled
+    _version_key: bool = field(init=False, repr=False, compare=False)
+    # The SpecifierSet for version comparisons, built the first time a Version is compared.
+    # False if the literal isn't a valid version for the comparator
+    _specifier: "SpecifierSet | Literal[False] | None" = field(default=None, init=False, repr=False, compare=False)
+    # The range of versions the comparison holds for, built the first time a SpecifierSet is compared.
+    # False if the comparison can't be converted into a range
+    _range: "VersionRange | Literal[False] | None" = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        if self.comparator in ('in', 'not in'):
+            key, literal = (self.lhs, self.rhs) if self.inverted else (self.rhs, self.lhs)
+        else:
+            key, literal = (self.rhs, self.lhs) if self.inverted else (self.lhs, self.rhs)
+        extra_comparison = key == "extra" and self.comparator in ("==", "===", "!=")
+        if extra_comparison:
+            literal = normalize_extra(literal)
+        object.__setattr__(self, "_key_name", key)
+        object.__setattr__(self, "_literal", literal)
+        object.__setattr__(self, "_extra_comparison", extra_comparison)
+        object.__setattr__(self, "_extra_key", key == "extra")
+        object.__setattr__(self, "_version_key", key in VERSION_KEYS)
+        object.__setattr__(self, "_mask", _key_mask(key))
+        object.__setattr__(self, "_string_comparison", _STRING_COMPARISONS.get((self.comparator, self.inverted)))
+        object.__setattr__(self, "_pattern_comparison", _PATTERN_COMPARISONS.get(self.comparator))
 
     @override
     def __str__(self) -> str:
+        # Nodes are immutable, so the string is only built once
+        if self._str is None:
+            object.__setattr__(self, "_str", self._render())
+        assert self._str is not None
+        return self._str
+
+    def _render(self) -> str:
         rhs_is_value = not self.inverted
         if self.comparator in ('in', 'not in'):
             rhs_is_value = not rhs_is_value
@@ -114,20 +522,38 @@ class ExpressionNode(Node):
 
     @override
     def __contains__(self, key: str) -> bool:
-        return self._key() == key
+        return self._key_name == key
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (ExpressionNode, (self.lhs, self.comparator, self.rhs, self.inverted))
 
     @override
     def evaluate(self, environment: Environment) -> "Node":
-        if not self._key() in environment:
+        key = self._key_name
+        if not key in environment:
             return self
-        values = environment[self._key()]
+        if self._extra_key or self._version_key:
+            # The extras are normalized, and version strings parsed, when the environment is compiled
+            environment = compile_environment(environment)
+            if self._extra_comparison and environment._extras is not None:
+                eval = self._evaluate_extras(environment._extras)
+                return self if eval is None else BooleanNode(eval)
+        values = environment[key]
         result: bool | None = None
+        patterns_matched = False
         for value in values:
             if isinstance(value, str):
                 eval = self._evaluate_string(value)
                 result = result if eval is None else result or eval
             elif isinstance(value, re.Pattern):
-                eval = self._evaluate_pattern(value)
+                if patterns_matched:
+                    # Every pattern for the key was matched together with the first one
+                    continue
+                if isinstance(environment, CompiledEnvironment):
+                    eval = self._evaluate_patterns(environment._patterns(key))
+                    patterns_matched = True
+                else:
+                    eval = self._evaluate_pattern(value)
                 result = result if eval is None else result or eval
             elif isinstance(value, Version):
                 eval = self._evaluate_version(value)
@@ -135,51 +561,88 @@ class ExpressionNode(Node):
             elif isinstance(value, bool):
                 result = value
                 break
+            elif _is_specifier_set(value):
+                eval = self._evaluate_specifier_set(value)
+                result = result if eval is None else result or eval
             else:
                 assert_never(value)
         return self if result is None else BooleanNode(result)
 
     def _evaluate_string(self, value: str) -> "bool | None":
-        if self.comparator == "==" or self.comparator == "===":
-            return value == self._value()
-        elif self.comparator == "!=":
-            return value != self._value()
-        elif self.comparator == "in":
-            return value in self._value() if self.inverted else self._value() in value
-        elif self.comparator == "not in":
-            return value not in self._value() if self.inverted else self._value() not in value
-        else:
-            return None
+        comparison = self._string_comparison
+        return None if comparison is None else comparison(value, self._literal)
 
     def _evaluate_pattern(self, value: re.Pattern[str]) -> "bool | None":
-        if self.comparator == "==" or self.comparator == "===":
-            return value.match(self._value()) is not None
-        elif self.comparator == "!=":
-            return not value.match(self._value())
+        comparison = self._pattern_comparison
+        return None if comparison is None else comparison(value, self._literal)
+
+    def _evaluate_patterns(self, value: _PatternSet) -> "bool | None":
+        if self._pattern_comparison is _matches_pattern:
+            return value.match(self._literal)[0]
+        elif self._pattern_comparison is _does_not_match_pattern:
+            # The results are combined with or, like the values of the key: != holds unless every pattern matches
+            return not value.match(self._literal)[1]
         else:
             return None
 
+    def _evaluate_extras(self, value: frozenset[str]) -> "bool | None":
+        if not value:
+            return None
+        if self.comparator == "!=":
+            # The results are combined with or, like the values of the key: != holds unless the only extra is this one
+            return len(value) > 1 or self._literal not in value
+        return self._literal in value
+
     def _evaluate_version(self, value: Version) -> "bool | None":
-        if self.comparator in ("in", "not in"):
-            # From: https://peps.python.org/pep-0508/#environment-markers
-            # The <marker_op> operators that are not in <version_cmp> perform
-            # the same as they do for strings in Python
-            return self._evaluate_string(str(value))
+        specifier = self._specifier
+        if specifier is None:
+            if self.comparator in ("in", "not in"):
+                # From: https://peps.python.org/pep-0508/#environment-markers
+                # The <marker_op> operators that are not in <version_cmp> perform
+                # the same as they do for strings in Python
+                return self._evaluate_string(str(value))
+            specifier = self._compile_specifier()
+        if specifier is False:
+            return None
+        return specifier.contains(value)
+
+    def _compile_specifier(self) -> "SpecifierSet | Literal[False]":
+        from packaging.specifiers import InvalidSpecifier, SpecifierSet
+
+        specifier: "SpecifierSet | Literal[False]"
         try:
-            specifier = SpecifierSet(f"{self.comparator} {self._value()}")
+            specifier = SpecifierSet(f"{self.comparator} {self._literal}")
         except InvalidSpecifier:
+            specifier = False
+        object.__setattr__(self, "_specifier", specifier)
+        return specifier
+
+    def _evaluate_specifier_set(self, value: "SpecifierSet") -> "bool | None":
+        # The environment holds a range of versions. The comparison is only resolved
+        # when it holds for all of them, or for none of them
+        from markerpry.interval import comparison_range, intersect, is_empty, issubset
+
+        if self.comparator in ("in", "not in"):
             return None
-        return specifier.contains(value)
+        marker_range = self._range
+        if marker_range is None:
+            comparison = comparison_range(self.comparator, self._literal)
+            marker_range = False if comparison is None else comparison
+            object.__setattr__(self, "_range", marker_range)
+        environment_range = _specifier_set_range(value)
+        if environment_range is None or marker_range is False:
+            return None
+        if is_empty(intersect(environment_range, marker_range)):
+            return False
+        if issubset(environment_range, marker_range):
+            return True
+        return None
 
     def _key(self) -> str:
-        if self.comparator in ('in', 'not in'):
-            return self.lhs if self.inverted else self.rhs
-        return self.rhs if self.inverted else self.lhs
+        return self._key_name
 
     def _value(self) -> str:
-        if self.comparator in ('in', 'not in'):
-            return self.rhs if self.inverted else self.lhs
-        return self.lhs if self.inverted else self.rhs
+        return self._literal
 
 
 @dataclass(frozen=True)
@@ -189,6 +652,11 @@ class OperatorNode(Node):
     operator: Literal["and", "or"]
     _left: Node
     _right: Node
+    _mask: int = field(init=False, repr=False, compare=False)
+    _str: "str | None" = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "_mask", self._left._mask | self._right._mask)
 
     @property
     @override
@@ -202,13 +670,51 @@ class OperatorNode(Node):
 
     @override
     def __str__(self) -> str:
-        return f"({self._left} {self.operator} {self._right})"
+        # Nodes are immutable, so the string is only built once
+        if self._str is None:
+            object.__setattr__(self, "_str", self._render())
+        assert self._str is not None
+        return self._str
+
+    def _render(self) -> str:
+        """
+        Render the tree in a single pass, with only the parentheses that are needed to parse it back
+        into the same tree: "and" binds tighter than "or", and chains of the same operator group to the left.
+        """
+        parts: list[str] = []
+        stack: list[Node | str] = [self]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                parts.append(item)
+            elif isinstance(item, OperatorNode) and (item is self or item._str is None):
+                # Pushed in reverse, so they're popped as: left, operator, right
+                if _needs_parentheses(item, item._right, right=True):
+                    stack.extend((")", item._right, "("))
+                else:
+                    stack.append(item._right)
+                stack.append(f" {item.operator} ")
+                if _needs_parentheses(item, item._left, right=False):
+                    stack.extend((")", item._left, "("))
+                else:
+                    stack.append(item._left)
+            else:
+                parts.append(str(item))
+        return "".join(parts)
 
     @override
     def evaluate(self, environment: Environment) -> "Node":
+        if not isinstance(environment, CompiledEnvironment):
+            environment = compile_environment(environment)
+        if not self._mask & environment.mask:
+            # None of the keys in this subtree are in the environment
+            return self
         left = self._left.evaluate(environment)
         right = self._right.evaluate(environment)
+        return self._simplify(left, right)
 
+    def _simplify(self, left: Node, right: Node) -> Node:
+        """Combine already-evaluated children, short circuiting where possible"""
         # If neither child changed, return self
         if left is self._left and right is self._right:
             return self
@@ -230,5 +736,27 @@ class OperatorNode(Node):
 
     @override
     def __contains__(self, key: str) -> bool:
+        # A key without a bit was never read by any node. Looking it up doesn't assign it one
+        bit = _key_bits.get(key)
+        if bit is None or not self._mask & bit:
+            return False
         # OperatorNode contains keys from both children
         return key in self._left or key in self._right
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return (OperatorNode, (self.operator, self._left, self._right))
+
+
+def _needs_parentheses(parent: OperatorNode, child: Node, right: bool) -> bool:
+    # and binds tighter than or, and chains group to the left
+    if not isinstance(child, OperatorNode):
+        return False
+    if child.operator == parent.operator:
+        return right
+    return child.operator == "or"
+
+
+def _is_specifier_set(value: object) -> "TypeIs[SpecifierSet]":
+    # If packaging.specifiers hasn't been imported, value can't be a SpecifierSet
+    specifiers = sys.modules.get("packaging.specifiers")
+    return specifiers is not None and isinstance(value, specifiers.SpecifierSet)
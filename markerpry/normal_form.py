@@ -0,0 +1,250 @@
+"""
+Conversion of marker trees into conjunctive and disjunctive normal form.
+
+Markers have no negation, so every ExpressionNode is a positive literal, and a normal form is a set of
+clauses (for CNF) or terms (for DNF), each of which is a set of atoms. Converting by distributing and over or
+(or vice versa) can grow exponentially, so:
+
+- clauses that are a superset of another clause are dropped as they're produced (subsumption), since
+  (a or b) and a == a, and (a and b) or a == a
+- the conversion stops with NormalFormTooLarge as soon as it would need more than max_clauses clauses
+
+tseitin() produces a CNF whose size is linear in the size of the tree, by adding an auxiliary variable for each
+chain of operators. Its clauses need negated literals, so it returns DIMACS style integer clauses instead of a Node.
+"""
+
+import itertools
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Literal
+
+from markerpry.node import FALSE, TRUE, BooleanNode, ExpressionNode, Node, OperatorNode
+
+DEFAULT_MAX_CLAUSES = 1024
+
+Operator = Literal["and", "or"]
+
+# A clause or term, as the indices of its atoms
+_Clause = frozenset[int]
+
+
+class NormalFormTooLarge(ValueError):
+    """Raised when a normal form would need more clauses than the limit"""
+
+
+def to_dnf(node: Node, max_clauses: int = DEFAULT_MAX_CLAUSES) -> Node:
+    """
+    Convert a tree into disjunctive normal form: an or of ands of expressions.
+
+    Args:
+        node: The tree to convert
+        max_clauses: The largest number of terms allowed, in the result or along the way
+
+    Returns:
+        An equivalent tree in disjunctive normal form, without any subsumed terms
+
+    Raises:
+        NormalFormTooLarge: If more than max_clauses terms are needed
+    """
+    atoms = _Atoms()
+    terms = _convert(node, "or", atoms, max_clauses)
+    return _build(terms, "or", atoms)
+
+
+def to_cnf(node: Node, max_clauses: int = DEFAULT_MAX_CLAUSES) -> Node:
+    """
+    Convert a tree into conjunctive normal form: an and of ors of expressions.
+
+    Args:
+        node: The tree to convert
+        max_clauses: The largest number of clauses allowed, in the result or along the way
+
+    Returns:
+        An equivalent tree in conjunctive normal form, without any subsumed clauses
+
+    Raises:
+        NormalFormTooLarge: If more than max_clauses clauses are needed
+    """
+    atoms = _Atoms()
+    clauses = _convert(node, "and", atoms, max_clauses)
+    return _build(clauses, "and", atoms)
+
+
+@dataclass(frozen=True)
+class TseitinCNF:
+    """
+    A CNF formula in DIMACS style.
+
+    Variables are numbered from 1, and a negative number is the negation of a variable. Variables 1 to
+    len(atoms) stand for the expressions in atoms, in order. The rest are auxiliary variables.
+
+    Attributes:
+        clauses: The clauses, each of which is an or of its literals
+        atoms: The expression for each of the first len(atoms) variables
+        variables: The total number of variables
+    """
+
+    clauses: list[tuple[int, ...]]
+    atoms: list[ExpressionNode]
+    variables: int
+
+
+def tseitin(node: Node) -> TseitinCNF:
+    """
+    Convert a tree into an equisatisfiable CNF formula, with a clause count linear in the size of the tree.
+
+    Each chain of the same operator, e.g. a and b and c, becomes a single auxiliary variable.
+
+    Any assignment to the atoms that makes the tree True extends to exactly one satisfying assignment of the
+    auxiliary variables, and an assignment that makes the tree False can't be extended at all.
+    """
+    atoms = _Atoms()
+    _collect(node, atoms)
+    offset = len(atoms.nodes)
+    clauses: list[tuple[int, ...]] = []
+    gates: dict[int, int] = {}
+
+    def visit(node: Node) -> int:
+        if isinstance(node, ExpressionNode):
+            return atoms.index(node) + 1
+        gate = gates.get(id(node))
+        if gate is not None:
+            return gate
+        if isinstance(node, OperatorNode):
+            inputs = [visit(operand) for operand in _operands(node)]
+            gate = gates[id(node)] = offset + len(gates) + 1
+            if node.operator == "and":
+                clauses.extend((-gate, literal) for literal in inputs)
+                clauses.append((gate, *(-literal for literal in inputs)))
+            else:
+                clauses.append((-gate, *inputs))
+                clauses.extend((gate, -literal) for literal in inputs)
+        elif isinstance(node, BooleanNode):
+            gate = gates[id(node)] = offset + len(gates) + 1
+            clauses.append((gate,) if node.state else (-gate,))
+        else:
+            raise NotImplementedError(f"Unknown node {type(node)}: {node}")
+        return gate
+
+    clauses.append((visit(node),))
+    return TseitinCNF(clauses, atoms.nodes, offset + len(gates))
+
+
+class _Atoms:
+    """Numbers the distinct expressions in the order they're first seen, so the output is deterministic"""
+
+    def __init__(self) -> None:
+        self.nodes: list[ExpressionNode] = []
+        self._indices: dict[ExpressionNode, int] = {}
+
+    def index(self, node: ExpressionNode) -> int:
+        index = self._indices.get(node)
+        if index is None:
+            index = self._indices[node] = len(self.nodes)
+            self.nodes.append(node)
+        return index
+
+
+def _collect(node: Node, atoms: _Atoms) -> None:
+    if isinstance(node, ExpressionNode):
+        atoms.index(node)
+    elif isinstance(node, OperatorNode):
+        for operand in _operands(node):
+            _collect(operand, atoms)
+
+
+def _operands(node: OperatorNode) -> list[Node]:
+    """Return the operands of a chain of the same operator, e.g. [a, b, c] for (a and b) and c"""
+    operands: list[Node] = []
+    stack: list[Node] = [node]
+    while stack:
+        current = stack.pop()
+        if isinstance(current, OperatorNode) and current.operator == node.operator:
+            stack.append(current._right)
+            stack.append(current._left)
+        else:
+            operands.append(current)
+    return operands
+
+
+def _convert(node: Node, outer: Operator, atoms: _Atoms, max_clauses: int) -> list[_Clause]:
+    """Return the clauses of the normal form whose outer operator is outer ("and" for CNF, "or" for DNF)"""
+    memo: dict[int, list[_Clause]] = {}
+
+    def visit(node: Node) -> list[_Clause]:
+        result = memo.get(id(node))
+        if result is not None:
+            return result
+        if isinstance(node, ExpressionNode):
+            result = [frozenset([atoms.index(node)])]
+        elif isinstance(node, BooleanNode):
+            # The identity of the outer operator has no clauses. The other constant has one empty clause
+            result = [] if node.state == (outer == "and") else [frozenset()]
+        elif isinstance(node, OperatorNode):
+            parts = [visit(operand) for operand in _operands(node)]
+            if node.operator == outer:
+                result = _minimize(itertools.chain.from_iterable(parts), max_clauses)
+            else:
+                result = parts[0]
+                for part in parts[1:]:
+                    result = _distribute(result, part, max_clauses)
+        else:
+            raise NotImplementedError(f"Unknown node {type(node)}: {node}")
+        memo[id(node)] = result
+        return result
+
+    return visit(node)
+
+
+def _distribute(left: list[_Clause], right: list[_Clause], max_clauses: int) -> list[_Clause]:
+    # (a or b) and (c or d) == (a and c) or (a and d) or (b and c) or (b and d), and vice versa
+    if not left or not right:
+        # One side is the absorbing constant of the inner operator, e.g. False and X in DNF
+        return []
+    clauses: dict[_Clause, None] = {}
+    for a in left:
+        for b in right:
+            clauses[a | b] = None
+            if len(clauses) > max_clauses * 2:
+                # Keep the clauses produced so far minimal, so that they stay within the limit too
+                clauses = dict.fromkeys(_minimize(clauses, max_clauses))
+    return _minimize(clauses, max_clauses)
+
+
+def _minimize(clauses: Iterable[_Clause], max_clauses: int) -> list[_Clause]:
+    """Remove duplicate and subsumed clauses, raising NormalFormTooLarge if too many remain"""
+    unique = list(dict.fromkeys(clauses))
+    kept: set[_Clause] = set()
+    # Each kept clause is indexed by its smallest atom. A clause that subsumes another is a subset of it,
+    # so its smallest atom is in the other clause
+    by_atom: dict[int, list[_Clause]] = {}
+    for clause in sorted(unique, key=len):
+        if not clause:
+            # The empty clause subsumes everything else
+            return [clause]
+        if any(other <= clause for atom in clause for other in by_atom.get(atom, ())):
+            continue
+        kept.add(clause)
+        by_atom.setdefault(min(clause), []).append(clause)
+        if len(kept) > max_clauses:
+            raise NormalFormTooLarge(f"The normal form needs more than {max_clauses} clauses")
+    # Keep the original order, so the output follows the order of the input tree
+    return [clause for clause in unique if clause in kept]
+
+
+def _build(clauses: list[_Clause], outer: Operator, atoms: _Atoms) -> Node:
+    inner: Operator = "and" if outer == "or" else "or"
+    if not clauses:
+        return FALSE if outer == "or" else TRUE
+    nodes = [_chain([atoms.nodes[i] for i in sorted(clause)], inner) for clause in clauses]
+    return _chain(nodes, outer)
+
+
+def _chain(nodes: list[Node], operator: Operator) -> Node:
+    if not nodes:
+        # An empty term (DNF) is True, and an empty clause (CNF) is False
+        return TRUE if operator == "and" else FALSE
+    result = nodes[0]
+    for node in nodes[1:]:
+        result = OperatorNode(operator, result, node)
+    return result
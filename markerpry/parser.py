@@ -3,9 +3,17 @@ from types import MappingProxyType
 from typing import Any, cast
 
 from packaging._parser import Op, Value, Variable
-from packaging.markers import Marker
-
-from markerpry.node import Comparator, ExpressionNode, Node, OperatorNode
+from packaging.markers import Marker, _normalize_extra_values
+
+from markerpry.node import (
+    BooleanNode,
+    Comparator,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+    _needs_parentheses,
+    normalize_extra,
+)
 
 REVERSE_MAP: Mapping[Comparator, Comparator] = MappingProxyType(
     {
@@ -51,6 +59,67 @@ def parse_marker(marker: Marker) -> Node:
     return _parse_marker(marker._markers)
 
 
+def to_marker(node: Node) -> Marker:
+    """
+    Convert a Node tree into a packaging.markers.Marker, without rendering and re-parsing a string.
+
+    The result is the same as Marker(str(node)): it has the same structure, the same string
+    and compares equal, but the tree is walked once instead of being tokenized and parsed.
+
+    Args:
+        node: The tree to convert
+
+    Returns:
+        A Marker equivalent to the tree
+
+    Raises:
+        ValueError: If the tree contains a BooleanNode, which markers have no way of writing.
+            evaluate() folds constants away, so this only happens when the whole tree is True or False
+    """
+    marker = Marker.__new__(Marker)
+    marker._markers = _normalize_extra_values(_to_markers(node))
+    return marker
+
+
+def _to_markers(node: Node) -> list[Any]:
+    """
+    Build the list that packaging's parser produces for str(node): atoms are tuples,
+    parenthesized groups are nested lists, and chains that str() writes without parentheses are flattened.
+    """
+    result: list[Any] = []
+    # (item, the list it belongs in, whether it's wrapped in a new group). Pushed in reverse, so
+    # items are popped in the order they're written
+    stack: list[tuple[Node | str, list[Any], bool]] = [(node, result, False)]
+    while stack:
+        item, target, grouped = stack.pop()
+        if grouped:
+            group: list[Any] = []
+            target.append(group)
+            target = group
+        if isinstance(item, str):
+            target.append(item)
+        elif isinstance(item, ExpressionNode):
+            target.append(_to_atom(item))
+        elif isinstance(item, OperatorNode):
+            # The same parentheses that str() writes
+            stack.append((item._right, target, _needs_parentheses(item, item._right, right=True)))
+            stack.append((item.operator, target, False))
+            stack.append((item._left, target, _needs_parentheses(item, item._left, right=False)))
+        elif isinstance(item, BooleanNode):
+            raise ValueError(f"{item} can't be converted into a Marker")
+        else:
+            raise NotImplementedError(f"Unknown node {type(item)}: {item}")
+    return result
+
+
+def _to_atom(node: ExpressionNode) -> tuple[Variable | Value, Op, Variable | Value]:
+    # The same as ExpressionNode._render, e.g. "arm" in platform_machine or "3.8" < python_version,
+    # where lhs is the value
+    if (node.comparator in ("in", "not in")) != node.inverted:
+        return (Value(node.lhs), Op(node.comparator), Variable(node.rhs))
+    return (Variable(node.lhs), Op(node.comparator), Value(node.rhs))
+
+
 def _parse_marker(marker: Any) -> Node:
 
     if isinstance(marker, tuple) or isinstance(marker, list):
@@ -95,6 +164,7 @@ def _parse_marker(marker: Any) -> Node:
                     or comparator.value == "not in"
                 )
             ):
+                lhs, rhs = _normalize_extra_value(lhs, rhs)
                 if comparator.value in ('in', 'not in'):
                     return ExpressionNode(
                         lhs=lhs.value,
@@ -117,3 +187,13 @@ def _parse_marker(marker: Any) -> Node:
                 )
 
     raise NotImplementedError(f"Unknown marker {type(marker)}: {marker}")
+
+
+def _normalize_extra_value(lhs: Variable | Value, rhs: Variable | Value) -> tuple[Variable | Value, Variable | Value]:
+    # PEP 685: extra names are compared after normalizing them. Older versions of packaging
+    # only normalize the first expression of a marker, so they're all normalized here
+    if isinstance(lhs, Variable) and lhs.value == "extra" and isinstance(rhs, Value):
+        return lhs, Value(normalize_extra(rhs.value))
+    if isinstance(rhs, Variable) and rhs.value == "extra" and isinstance(lhs, Value):
+        return Value(normalize_extra(lhs.value)), rhs
+    return lhs, rhs
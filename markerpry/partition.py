@@ -0,0 +1,92 @@
+import itertools
+
+from markerpry.node import (
+    BooleanNode,
+    Environment,
+    EnvironmentValue,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+)
+
+Partition = dict[tuple[tuple[str, EnvironmentValue], ...], Node]
+
+_Table = tuple[tuple[str, ...], dict[tuple[EnvironmentValue, ...], Node]]
+
+
+def partition(node: Node, environment: Environment) -> Partition:
+    """
+    Evaluate a Node once for every combination of environment values.
+
+    Where evaluate() ORs together all of the values for a key, partition() keeps them apart.
+    Only the environment keys referenced by the node take part in the combinations, in the
+    order they appear in the environment. Keys with no values are treated as missing.
+
+    Each subtree is visited once. Leaves are evaluated once per value of their key, and
+    operator nodes only combine the results of their children for the keys they reference.
+
+    Args:
+        node: The marker tree to evaluate
+        environment: The environment, where each key may hold several values
+
+    Returns:
+        A mapping from ((key, value), ...) tuples to the evaluated node for that combination
+    """
+    domains = {key: tuple(dict.fromkeys(values)) for key, values in environment.items() if values}
+    order = {key: index for index, key in enumerate(domains)}
+    keys, table = _partition(node, domains, order, {})
+    return {tuple(zip(keys, values)): result for values, result in table.items()}
+
+
+def _partition(
+    node: Node,
+    domains: dict[str, tuple[EnvironmentValue, ...]],
+    order: dict[str, int],
+    memo: dict[int, _Table],
+) -> _Table:
+    cached = memo.get(id(node))
+    if cached is not None:
+        return cached
+
+    result: _Table
+    if isinstance(node, BooleanNode):
+        result = ((), {(): node})
+    elif isinstance(node, ExpressionNode):
+        key = node._key()
+        if key in domains:
+            result = ((key,), {(value,): node.evaluate({key: [value]}) for value in domains[key]})
+        else:
+            result = ((), {(): node})
+    elif isinstance(node, OperatorNode):
+        result = _partition_operator(node, domains, order, memo)
+    else:
+        raise NotImplementedError(f"Unknown node {type(node)}: {node}")
+
+    memo[id(node)] = result
+    return result
+
+
+def _partition_operator(
+    node: OperatorNode,
+    domains: dict[str, tuple[EnvironmentValue, ...]],
+    order: dict[str, int],
+    memo: dict[int, _Table],
+) -> _Table:
+    left_keys, left_table = _partition(node._left, domains, order, memo)
+    right_keys, right_table = _partition(node._right, domains, order, memo)
+    keys = tuple(sorted(set(left_keys) | set(right_keys), key=order.__getitem__))
+    left_indices = [keys.index(key) for key in left_keys]
+    right_indices = [keys.index(key) for key in right_keys]
+
+    # Many combinations share the same pair of child results, so only simplify each pair once
+    simplified: dict[tuple[int, int], Node] = {}
+    table: dict[tuple[EnvironmentValue, ...], Node] = {}
+    for values in itertools.product(*(domains[key] for key in keys)):
+        left = left_table[tuple(values[i] for i in left_indices)]
+        right = right_table[tuple(values[i] for i in right_indices)]
+        pair = (id(left), id(right))
+        result = simplified.get(pair)
+        if result is None:
+            result = simplified[pair] = node._simplify(left, right)
+        table[values] = result
+    return keys, table
@@ -0,0 +1,295 @@
+"""
+Stream requirements, and their markers, out of requirements files and core metadata.
+
+parse_requirements() reads a line at a time, so files and memory mapped buffers are never loaded as a whole.
+Each line is split with a regular expression rather than packaging's tokenizer. Only the marker is parsed,
+and markers are shared through a bounded cache, so the same marker on many lines is parsed once:
+
+    with open("requirements.txt", "rb") as f:
+        for name, extras, specifier, marker in parse_requirements(f):
+            ...
+
+Lines the regular expression doesn't accept are handed to packaging's requirement parser, which either
+parses them or raises InvalidRequirement with a description of the problem. Both ways give the same result:
+extras are normalized and de-duplicated, in the order they're written, and the specifier is kept as written,
+without whitespace. Specifiers are checked with packaging.specifiers.SpecifierSet, once per distinct specifier.
+"""
+
+import io
+import mmap
+import os
+import re
+import zipfile
+from collections.abc import Iterable, Iterator
+from typing import TYPE_CHECKING, NamedTuple
+
+from markerpry.node import TRUE, Node, _bound, normalize_extra
+from markerpry.parser import _parse_marker as _parse_marker_tokens
+from markerpry.parser import parse
+from markerpry.stats import register_cache
+
+if TYPE_CHECKING:
+    from markerpry.cache import ParseCache
+
+# The most distinct marker strings that are kept
+MARKER_CACHE_SIZE = 4096
+# The most distinct valid specifiers that are kept
+SPECIFIER_CACHE_SIZE = 4096
+
+Stream = str | bytes | bytearray | memoryview | mmap.mmap | Iterable[str] | Iterable[bytes]
+
+_markers: dict[str, Node] = {}
+_marker_hits = 0
+# The specifiers that SpecifierSet accepted, in the order they were first seen
+_specifiers: dict[str, None] = {}
+_specifier_hits = 0
+
+_SPECIFIER = r"(?:===|~=|==|!=|<=|>=|<|>)\s*[A-Za-z0-9*][^\s,;()]*"
+_REQUIREMENT = re.compile(
+    rf"""
+    \s*(?P<name>[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?)
+    \s*(?:\[(?P<extras>[^\]]*)\])?
+    \s*(?:
+        @\s*(?P<url>\S+)(?=\s|$)
+        |\(\s*(?P<parenthesized>{_SPECIFIER}(?:\s*,\s*{_SPECIFIER})*)\s*\)
+        |(?P<specifier>{_SPECIFIER}(?:\s*,\s*{_SPECIFIER})*)
+    )?
+    \s*(?:;\s*(?P<marker>.*?))?\s*$
+    """,
+    re.VERBOSE,
+)
+_EXTRA = re.compile(r"[A-Za-z0-9](?:[A-Za-z0-9._-]*[A-Za-z0-9])?")
+# Per requirement options in requirements files, e.g. --hash=sha256:...
+_OPTIONS = re.compile(r"\s+--[A-Za-z][\w-]*=\S*")
+# pip only treats # as a comment at the start of a line, or after whitespace
+_COMMENT = re.compile(r"(?:^|\s)#.*")
+# A memoryview has no find(), but it can be searched with a regular expression
+_NEWLINE = re.compile(rb"\n")
+_METADATA_VERSION = "metadata-version:"
+_REQUIRES_DIST = "requires-dist:"
+
+
+class ParsedRequirement(NamedTuple):
+    """
+    A requirement, with its marker parsed.
+
+    Attributes:
+        name: The project name, as written
+        extras: The requested extras, normalized as PEP 685 requires, in the order they're first written
+        specifier: The version specifier as written, without whitespace, e.g. ">=1.0,<2", or "@ <url>" for
+            a direct reference. Empty if there isn't one
+        marker: The parsed marker, or TRUE if the requirement doesn't have one
+    """
+
+    name: str
+    extras: tuple[str, ...]
+    specifier: str
+    marker: Node
+
+
+def parse_requirements(stream: Stream, cache: "ParseCache | None" = None) -> Iterator[ParsedRequirement]:
+    """
+    Parse the requirements in a requirements file, or the Requires-Dist fields of a METADATA or PKG-INFO file.
+
+    Core metadata is recognized by its leading Metadata-Version field. Only its headers are read, so the
+    description that follows them is never decoded. In requirements files, blank lines, comments, options
+    such as -r and --index-url, and per requirement --hash options are skipped, and lines ending in a
+    backslash are joined with the next one.
+
+    Args:
+        stream: The text to parse. Either a str, a bytes-like buffer such as an mmap, or a file object or other
+            iterable of lines, in text or binary mode. Bytes are decoded as UTF-8.
+        cache: A persistent cache to look markers up in when they aren't in the in-memory cache
+
+    Yields:
+        Each requirement, in order
+
+    Raises:
+        packaging.requirements.InvalidRequirement: If a line isn't a valid requirement
+        packaging.markers.InvalidMarker: If a requirement's marker is invalid
+    """
+    lines = _lines(stream)
+    for line in lines:
+        if line.strip():
+            break
+    else:
+        return
+    if line.lstrip("\ufeff")[: len(_METADATA_VERSION)].lower() == _METADATA_VERSION:
+        requirements = _metadata_requirements(lines)
+    else:
+        requirements = _file_requirements(line, lines)
+    for requirement in requirements:
+        yield _parse_requirement(requirement, cache)
+
+
+def wheel_requirements(
+    wheel: "str | os.PathLike[str] | io.BufferedIOBase | zipfile.ZipFile", cache: "ParseCache | None" = None
+) -> Iterator[ParsedRequirement]:
+    """
+    Parse the Requires-Dist fields of a wheel's METADATA, reading it straight out of the zip file.
+
+    Args:
+        wheel: The path of the wheel, an open binary file, or a ZipFile
+        cache: A persistent cache to look markers up in when they aren't in the in-memory cache
+
+    Yields:
+        Each requirement, in order
+
+    Raises:
+        ValueError: If the wheel doesn't contain exactly one .dist-info/METADATA file
+    """
+    if isinstance(wheel, zipfile.ZipFile):
+        yield from _wheel_requirements(wheel, cache)
+        return
+    with zipfile.ZipFile(wheel) as archive:
+        yield from _wheel_requirements(archive, cache)
+
+
+def _wheel_requirements(archive: zipfile.ZipFile, cache: "ParseCache | None") -> Iterator[ParsedRequirement]:
+    members = [name for name in archive.namelist() if name.count("/") == 1 and name.endswith(".dist-info/METADATA")]
+    if len(members) != 1:
+        raise ValueError(f"Expected a single .dist-info/METADATA file in the wheel, found {len(members)}")
+    with archive.open(members[0]) as metadata:
+        yield from parse_requirements(metadata, cache)
+
+
+def _lines(stream: Stream) -> Iterator[str]:
+    if isinstance(stream, str):
+        lines: Iterable[str | bytes | bytearray | memoryview] = io.StringIO(stream)
+    elif isinstance(stream, (bytes, bytearray, mmap.mmap)):
+        lines = _buffer_lines(stream)
+    elif isinstance(stream, memoryview):
+        lines = _buffer_lines(stream.cast("B"))
+    else:
+        lines = stream
+    for line in lines:
+        yield line if isinstance(line, str) else str(line, "utf-8")
+
+
+def _buffer_lines(buffer: bytes | bytearray | mmap.mmap | memoryview) -> Iterator[bytes | bytearray | memoryview]:
+    # Only one line is copied out of the buffer at a time. Slicing a memoryview doesn't copy at all
+    start = 0
+    end = len(buffer)
+    while start < end:
+        match = _NEWLINE.search(buffer, start)
+        newline = end if match is None else match.start()
+        yield buffer[start:newline]
+        start = newline + 1
+
+
+def _metadata_requirements(lines: Iterator[str]) -> Iterator[str]:
+    requirement: str | None = None
+    for line in lines:
+        if line[:1] in (" ", "\t") and line.strip():
+            # A folded header continues the previous one
+            if requirement is not None:
+                requirement += " " + line.strip()
+            continue
+        if requirement is not None:
+            yield requirement
+            requirement = None
+        if not line.strip():
+            # The headers end at the first blank line
+            return
+        if line[: len(_REQUIRES_DIST)].lower() == _REQUIRES_DIST:
+            requirement = line[len(_REQUIRES_DIST) :].strip()
+    if requirement is not None:
+        yield requirement
+
+
+def _file_requirements(first: str, lines: Iterator[str]) -> Iterator[str]:
+    pending = ""
+    for line in _chain(first.lstrip("\ufeff"), lines):
+        line = line.rstrip("\r\n")
+        if line.endswith("\\"):
+            pending += line[:-1]
+            continue
+        line = _COMMENT.sub("", pending + line).strip()
+        pending = ""
+        if not line or line.startswith("-"):
+            continue
+        yield _OPTIONS.sub("", line)
+    if pending.strip():
+        yield _COMMENT.sub("", pending).strip()
+
+
+def _chain(first: str, lines: Iterator[str]) -> Iterator[str]:
+    yield first
+    yield from lines
+
+
+def _parse_requirement(text: str, cache: "ParseCache | None") -> ParsedRequirement:
+    match = _REQUIREMENT.fullmatch(text)
+    extras_text = match and match["extras"]
+    if match is None or (extras_text and not _valid_extras(extras_text)):
+        return _parse_with_packaging(text)
+    if match["url"] is not None:
+        specifier = f"@ {match['url']}"
+    else:
+        specifier = _specifier(match["parenthesized"] or match["specifier"] or "")
+    extras = _extras(extras_text.split(",")) if extras_text else ()
+    marker_str = match["marker"]
+    marker = TRUE if marker_str is None else _parse_marker(marker_str, cache)
+    return ParsedRequirement(match["name"], extras, specifier, marker)
+
+
+def _extras(extras: Iterable[str]) -> tuple[str, ...]:
+    # Normalized, and without duplicates, in the order they're first written
+    return tuple(dict.fromkeys(normalize_extra(extra.strip()) for extra in extras))
+
+
+def _specifier(text: str) -> str:
+    global _specifier_hits
+    specifier = ",".join(part for part in re.sub(r"\s+", "", text).split(",") if part)
+    if not specifier:
+        return specifier
+    if specifier in _specifiers:
+        _specifier_hits += 1
+        return specifier
+    from packaging.specifiers import InvalidSpecifier, SpecifierSet
+
+    try:
+        SpecifierSet(specifier)
+    except InvalidSpecifier as e:
+        from packaging.requirements import InvalidRequirement
+
+        raise InvalidRequirement(str(e)) from e
+    _specifiers[specifier] = None
+    _bound(_specifiers, SPECIFIER_CACHE_SIZE)
+    return specifier
+
+
+def _valid_extras(extras: str) -> bool:
+    return all(_EXTRA.fullmatch(extra.strip()) for extra in extras.split(","))
+
+
+def _parse_with_packaging(text: str) -> ParsedRequirement:
+    # packaging.requirements.Requirement keeps the extras in a set, so its parser is used directly,
+    # which keeps them in the order they're written
+    from packaging._parser import parse_requirement
+    from packaging._tokenizer import ParserSyntaxError
+    from packaging.requirements import InvalidRequirement
+
+    try:
+        requirement = parse_requirement(text)
+    except ParserSyntaxError as e:
+        raise InvalidRequirement(str(e)) from e
+    specifier = f"@ {requirement.url}" if requirement.url else _specifier(requirement.specifier)
+    marker = TRUE if requirement.marker is None else _parse_marker_tokens(requirement.marker)
+    return ParsedRequirement(requirement.name, _extras(requirement.extras), specifier, marker)
+
+
+def _parse_marker(marker_str: str, cache: "ParseCache | None") -> Node:
+    global _marker_hits
+    node = _markers.get(marker_str)
+    if node is not None:
+        _marker_hits += 1
+        return node
+    node = parse(marker_str) if cache is None else cache.parse(marker_str)
+    _markers[marker_str] = node
+    _bound(_markers, MARKER_CACHE_SIZE)
+    return node
+
+
+register_cache("requirement_markers", lambda: _marker_hits)
+register_cache("requirement_specifiers", lambda: _specifier_hits)
@@ -0,0 +1,207 @@
+"""
+A compact binary format for Node trees.
+
+The buffer stores each distinct string once, and each distinct subtree once, so markers that share
+atoms (or whole subtrees) share storage. The nodes are stored in columns of fixed width integers,
+which can be read back without any per-byte parsing:
+
+    magic (4 bytes) | format version (1 byte)
+    string table: char lengths (array) | utf-8 blob of the concatenated strings
+    node table: tags (array) | a (array) | b (array) | c (array)
+    roots (array)
+
+Each array is a little endian count (uint32), an item width (1 byte: 1, 2 or 4), then the items.
+Children always come before their parents, so the node table can be decoded in a single pass.
+"""
+
+import struct
+import sys
+from array import array
+from collections.abc import Iterable, Sequence
+from typing import get_args
+
+from markerpry.node import (
+    FALSE,
+    TRUE,
+    BooleanNode,
+    Comparator,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+)
+
+MAGIC = b"MPRY"
+FORMAT_VERSION = 1
+
+COMPARATORS: tuple[Comparator, ...] = get_args(Comparator)
+
+_FALSE = 0
+_TRUE = 1
+_EXPRESSION = 2
+_INVERTED_EXPRESSION = 3
+_AND = 4
+_OR = 5
+
+# Map item widths to array typecodes. Later entries win, so each width gets the smallest matching type
+_TYPECODES = {array(code).itemsize: code for code in "QLIHB"}
+_COUNT = struct.Struct("<IB")
+
+
+def dumps(nodes: Iterable[Node]) -> bytes:
+    """
+    Serialize a sequence of nodes into a single buffer.
+
+    Args:
+        nodes: The root nodes to serialize
+
+    Returns:
+        The binary representation of the nodes, which can be read back with loads()
+    """
+    writer = _Writer()
+    roots = [writer.add(node) for node in nodes]
+    chunks = [MAGIC, bytes([FORMAT_VERSION])]
+    chunks.append(_pack([len(s) for s in writer.strings]))
+    blob = "".join(writer.strings).encode("utf-8")
+    chunks.append(struct.pack("<I", len(blob)))
+    chunks.append(blob)
+    for column in (writer.tags, writer.a, writer.b, writer.c, roots):
+        chunks.append(_pack(column))
+    return b"".join(chunks)
+
+
+def loads(data: bytes | bytearray | memoryview) -> list[Node]:
+    """
+    Deserialize nodes from a buffer created by dumps().
+
+    Args:
+        data: The buffer to read. Any bytes-like object (including a memory map) works.
+
+    Returns:
+        The root nodes, in the order they were serialized
+
+    Raises:
+        ValueError: If the buffer was not created by dumps(), or is a different format version
+    """
+    view = memoryview(data)
+    if len(view) < 5 or bytes(view[:4]) != MAGIC:
+        raise ValueError("Not a serialized markerpry buffer")
+    if view[4] != FORMAT_VERSION:
+        raise ValueError(f"Unsupported serialization format version {view[4]}")
+    try:
+        return _loads(view)
+    except (struct.error, IndexError) as e:
+        raise ValueError("Corrupt serialized markerpry buffer") from e
+
+
+def _loads(view: memoryview) -> list[Node]:
+    offset = 5
+    lengths, offset = _unpack(view, offset)
+    (blob_length,) = struct.unpack_from("<I", view, offset)
+    offset += 4
+    blob = str(view[offset : offset + blob_length], "utf-8")
+    offset += blob_length
+    tags, offset = _unpack(view, offset)
+    a, offset = _unpack(view, offset)
+    b, offset = _unpack(view, offset)
+    c, offset = _unpack(view, offset)
+    roots, offset = _unpack(view, offset)
+
+    strings: list[str] = []
+    position = 0
+    for length in lengths:
+        strings.append(blob[position : position + length])
+        position += length
+
+    nodes: list[Node] = []
+    append = nodes.append
+    for tag, x, y, z in zip(tags, a, b, c):
+        if tag == _EXPRESSION:
+            append(ExpressionNode(strings[x], COMPARATORS[y], strings[z]))
+        elif tag == _AND:
+            append(OperatorNode("and", nodes[x], nodes[y]))
+        elif tag == _OR:
+            append(OperatorNode("or", nodes[x], nodes[y]))
+        elif tag == _INVERTED_EXPRESSION:
+            append(ExpressionNode(strings[x], COMPARATORS[y], strings[z], True))
+        elif tag == _TRUE:
+            append(TRUE)
+        elif tag == _FALSE:
+            append(FALSE)
+        else:
+            raise ValueError(f"Unknown node tag {tag}")
+    return [nodes[root] for root in roots]
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.strings: list[str] = []
+        self.tags: list[int] = []
+        self.a: list[int] = []
+        self.b: list[int] = []
+        self.c: list[int] = []
+        self._string_index: dict[str, int] = {}
+        # Subtrees are deduplicated by their content. Since children are added first,
+        # the content of a node is its tag plus the indices of its children
+        self._node_index: dict[tuple[int, int, int, int], int] = {}
+        self._seen: dict[int, tuple[Node, int]] = {}
+
+    def add(self, node: Node) -> int:
+        seen = self._seen.get(id(node))
+        if seen is not None:
+            return seen[1]
+
+        if isinstance(node, BooleanNode):
+            record = (_TRUE if node.state else _FALSE, 0, 0, 0)
+        elif isinstance(node, ExpressionNode):
+            record = (
+                _INVERTED_EXPRESSION if node.inverted else _EXPRESSION,
+                self._string(node.lhs),
+                COMPARATORS.index(node.comparator),
+                self._string(node.rhs),
+            )
+        elif isinstance(node, OperatorNode):
+            left = self.add(node._left)
+            right = self.add(node._right)
+            record = (_AND if node.operator == "and" else _OR, left, right, 0)
+        else:
+            raise NotImplementedError(f"Unknown node {type(node)}: {node}")
+
+        index = self._node_index.get(record)
+        if index is None:
+            index = self._node_index[record] = len(self.tags)
+            self.tags.append(record[0])
+            self.a.append(record[1])
+            self.b.append(record[2])
+            self.c.append(record[3])
+        # Keep a reference to the node, so that its id can't be reused while writing
+        self._seen[id(node)] = (node, index)
+        return index
+
+    def _string(self, value: str) -> int:
+        index = self._string_index.get(value)
+        if index is None:
+            index = self._string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+def _pack(values: Sequence[int]) -> bytes:
+    largest = max(values, default=0)
+    width = 1 if largest < 1 << 8 else 2 if largest < 1 << 16 else 4
+    items = array(_TYPECODES[width], values)
+    if sys.byteorder == "big":  # no cov
+        items.byteswap()
+    return _COUNT.pack(len(values), width) + items.tobytes()
+
+
+def _unpack(view: memoryview, offset: int) -> "tuple[array[int], int]":
+    count, width = _COUNT.unpack_from(view, offset)
+    offset += _COUNT.size
+    end = offset + count * width
+    if width not in (1, 2, 4) or end > len(view):
+        raise ValueError("Corrupt serialized markerpry buffer")
+    items = array(_TYPECODES[width])
+    items.frombytes(view[offset:end])
+    if sys.byteorder == "big":  # no cov
+        items.byteswap()
+    return items, end
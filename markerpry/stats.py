@@ -0,0 +1,158 @@
+"""
+Opt-in statistics about what evaluate() spends its time on.
+
+Collection works by temporarily replacing the evaluation methods of the node classes with instrumented
+wrappers, so there is no overhead at all outside of a collect_stats() block:
+
+    with collect_stats() as stats:
+        tree.evaluate(env)
+    stats.as_dict()
+
+The counters are process wide, and only one collection can be active at a time.
+"""
+
+import time
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+_active: "EvaluationStats | None" = None
+_caches: dict[str, Callable[[], int]] = {}
+
+
+@dataclass
+class EvaluationStats:
+    """
+    Counters collected while evaluating nodes.
+
+    Attributes:
+        evaluations: ExpressionNode and OperatorNode evaluations, keyed by node type
+        comparators: Comparisons made against a single environment value, keyed by comparator
+        value_types: Comparisons made against a single environment value, keyed by the type of the value.
+            The patterns for a key in a compiled environment are matched together, and counted as a PatternSet.
+            Extras in a compiled environment are looked up in a set, and counted as an ExtraSet
+        short_circuits: Operator nodes that were resolved, or replaced by one child, because a child was a boolean
+        residual_nodes: New OperatorNodes allocated because both children remained unresolved
+        cache_hits: Hits in each registered cache while collecting, keyed by cache name
+        timings_ns: Total time spent in each instrumented method, in nanoseconds. Time spent in nested
+            calls is included in the caller's total too.
+    """
+
+    evaluations: Counter[str] = field(default_factory=Counter)
+    comparators: Counter[str] = field(default_factory=Counter)
+    value_types: Counter[str] = field(default_factory=Counter)
+    short_circuits: int = 0
+    residual_nodes: int = 0
+    cache_hits: Counter[str] = field(default_factory=Counter)
+    timings_ns: Counter[str] = field(default_factory=Counter)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics as plain, JSON serializable, types"""
+        return {
+            "evaluations": dict(self.evaluations),
+            "comparators": dict(self.comparators),
+            "value_types": dict(self.value_types),
+            "short_circuits": self.short_circuits,
+            "residual_nodes": self.residual_nodes,
+            "cache_hits": dict(self.cache_hits),
+            "timings_ns": dict(self.timings_ns),
+        }
+
+
+def register_cache(name: str, hits: Callable[[], int]) -> None:
+    """
+    Report the hits of a cache in EvaluationStats.cache_hits.
+
+    Args:
+        name: The key to report the hits under
+        hits: Returns the total number of hits so far. The difference over a collect_stats() block is reported.
+    """
+    _caches[name] = hits
+
+
+@contextmanager
+def collect_stats() -> Iterator[EvaluationStats]:
+    """
+    Collect statistics about every evaluation in this process until the block exits.
+
+    Raises:
+        RuntimeError: If statistics are already being collected
+    """
+    global _active
+    if _active is not None:
+        raise RuntimeError("Evaluation statistics are already being collected")
+    stats = _active = EvaluationStats()
+    originals = _install(stats)
+    cache_hits = {name: hits() for name, hits in _caches.items()}
+    try:
+        yield stats
+    finally:
+        for (cls, name), method in originals.items():
+            setattr(cls, name, method)
+        for name, hits in _caches.items():
+            stats.cache_hits[name] = hits() - cache_hits.get(name, 0)
+        _active = None
+
+
+def _install(stats: EvaluationStats) -> dict[tuple[type, str], Any]:
+    from markerpry.node import BooleanNode, ExpressionNode, OperatorNode
+
+    originals: dict[tuple[type, str], Any] = {}
+
+    def replace(cls: type, name: str, wrapper: Callable[[Any], Any]) -> None:
+        method = cls.__dict__[name]
+        originals[(cls, name)] = method
+        setattr(cls, name, wrapper(method))
+
+    def timed(name: str, evaluate: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(node: Any, environment: Any) -> Any:
+            stats.evaluations[name] += 1
+            start = time.perf_counter_ns()
+            try:
+                return evaluate(node, environment)
+            finally:
+                stats.timings_ns[f"{name}.evaluate"] += time.perf_counter_ns() - start
+
+        return wrapper
+
+    def comparison(value_type: str) -> Callable[[Any], Any]:
+        def instrument(method: Callable[..., Any]) -> Callable[..., Any]:
+            timing = f"ExpressionNode.{method.__name__}"
+
+            def wrapper(node: Any, value: Any) -> Any:
+                stats.comparators[node.comparator] += 1
+                stats.value_types[value_type] += 1
+                start = time.perf_counter_ns()
+                try:
+                    return method(node, value)
+                finally:
+                    stats.timings_ns[timing] += time.perf_counter_ns() - start
+
+            return wrapper
+
+        return instrument
+
+    def simplify(method: Callable[..., Any]) -> Callable[..., Any]:
+        def wrapper(node: Any, left: Any, right: Any) -> Any:
+            result = method(node, left, right)
+            if result is not node:
+                if isinstance(left, BooleanNode) or isinstance(right, BooleanNode):
+                    stats.short_circuits += 1
+                elif isinstance(result, OperatorNode):
+                    stats.residual_nodes += 1
+            return result
+
+        return wrapper
+
+    replace(ExpressionNode, "evaluate", lambda method: timed("ExpressionNode", method))
+    replace(OperatorNode, "evaluate", lambda method: timed("OperatorNode", method))
+    replace(ExpressionNode, "_evaluate_string", comparison("str"))
+    replace(ExpressionNode, "_evaluate_pattern", comparison("Pattern"))
+    replace(ExpressionNode, "_evaluate_patterns", comparison("PatternSet"))
+    replace(ExpressionNode, "_evaluate_extras", comparison("ExtraSet"))
+    replace(ExpressionNode, "_evaluate_version", comparison("Version"))
+    replace(ExpressionNode, "_evaluate_specifier_set", comparison("SpecifierSet"))
+    replace(OperatorNode, "_simplify", simplify)
+    return originals
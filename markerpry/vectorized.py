@@ -0,0 +1,172 @@
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any, cast
+
+from packaging.version import Version
+
+from markerpry.node import (
+    BooleanNode,
+    EnvironmentValue,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+)
+
+try:
+    import numpy
+
+    HAS_NUMPY = True
+except ImportError:  # no cov
+    HAS_NUMPY = False
+
+# A numpy array of bools, or a list of bools when numpy is not installed
+Mask = Any
+
+
+class Column:
+    """
+    A dictionary-encoded column of environment values, one value per row.
+
+    Each distinct value is stored once in categories, and codes holds the index of the value
+    for each row, or -1 when the row has no value. Version columns are sorted, so their codes
+    are ordinals that follow the ordering of the versions.
+    """
+
+    def __init__(self, values: Sequence[EnvironmentValue | None]):
+        distinct: list[EnvironmentValue] = list(dict.fromkeys(value for value in values if value is not None))
+        if all(isinstance(value, Version) for value in distinct):
+            distinct = list(sorted(cast(list[Version], distinct)))
+        self.categories: tuple[EnvironmentValue, ...] = tuple(distinct)
+        index = {value: i for i, value in enumerate(distinct)}
+        codes = [-1 if value is None else index[value] for value in values]
+        self.codes: Any = numpy.asarray(codes, dtype=numpy.int32) if HAS_NUMPY else codes
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+
+class ColumnarEnvironment:
+    """
+    An environment for evaluating markers against many rows at once.
+
+    Unlike Environment, each key holds exactly one value per row. None marks a row where the
+    value is unknown, which leaves expressions using that key unresolved for that row.
+    """
+
+    def __init__(self, columns: Mapping[str, Sequence[EnvironmentValue | None]]):
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"All columns must have the same length, got {sorted(lengths)}")
+        self.rows = lengths.pop() if lengths else 0
+        self.columns = {key: Column(values) for key, values in columns.items()}
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Mapping[str, EnvironmentValue]]) -> "ColumnarEnvironment":
+        """Build a ColumnarEnvironment from one mapping per row. Keys missing from a row are unknown."""
+        rows = list(rows)
+        keys = dict.fromkeys(key for row in rows for key in row)
+        return cls({key: [row.get(key) for row in rows] for key in keys})
+
+
+@dataclass(frozen=True)
+class MaskResult:
+    """
+    The result of evaluating a node against every row of a ColumnarEnvironment.
+
+    value is true where the marker evaluated to True. unresolved is true where the marker
+    could not be fully evaluated. Rows where both are false evaluated to False.
+    These are numpy boolean arrays, or lists of bools when numpy is not installed.
+    """
+
+    value: Mask
+    unresolved: Mask
+
+
+def evaluate_columnar(node: Node, environment: ColumnarEnvironment) -> MaskResult:
+    """
+    Evaluate a Node against every row of a ColumnarEnvironment.
+
+    Each ExpressionNode is evaluated once per distinct value of its key, and the results are
+    spread to the rows with a vectorized lookup. OperatorNodes combine the masks of their children
+    elementwise, using the same short circuit rules as Node.evaluate.
+
+    Works without numpy, at pure Python speed.
+    """
+    return _evaluate(node, environment, {})
+
+
+def _evaluate(node: Node, environment: ColumnarEnvironment, memo: dict[ExpressionNode, MaskResult]) -> MaskResult:
+    if isinstance(node, BooleanNode):
+        return MaskResult(_full(environment.rows, node.state), _full(environment.rows, False))
+    elif isinstance(node, ExpressionNode):
+        result = memo.get(node)
+        if result is None:
+            result = memo[node] = _evaluate_expression(node, environment)
+        return result
+    elif isinstance(node, OperatorNode):
+        left = _evaluate(node._left, environment, memo)
+        right = _evaluate(node._right, environment, memo)
+        if node.operator == "and":
+            return _and(left, right)
+        return _or(left, right)
+    raise NotImplementedError(f"Unknown node {type(node)}: {node}")
+
+
+def _evaluate_expression(node: ExpressionNode, environment: ColumnarEnvironment) -> MaskResult:
+    key = node._key()
+    column = environment.columns.get(key)
+    if column is None:
+        return MaskResult(_full(environment.rows, False), _full(environment.rows, True))
+
+    value_table: list[bool] = []
+    unresolved_table: list[bool] = []
+    for category in column.categories:
+        result = node.evaluate({key: [category]})
+        value_table.append(isinstance(result, BooleanNode) and result.state)
+        unresolved_table.append(not isinstance(result, BooleanNode))
+    # Rows without a value have a code of -1, which picks this last entry
+    value_table.append(False)
+    unresolved_table.append(True)
+    return MaskResult(_take(value_table, column.codes), _take(unresolved_table, column.codes))
+
+
+def _and(left: MaskResult, right: MaskResult) -> MaskResult:
+    if HAS_NUMPY:
+        left_false = ~(left.value | left.unresolved)
+        right_false = ~(right.value | right.unresolved)
+        return MaskResult(
+            left.value & right.value,
+            (left.unresolved | right.unresolved) & ~left_false & ~right_false,
+        )
+    return MaskResult(
+        [lv and rv for lv, rv in zip(left.value, right.value)],
+        [
+            (lu or ru) and (lv or lu) and (rv or ru)
+            for lv, lu, rv, ru in zip(left.value, left.unresolved, right.value, right.unresolved)
+        ],
+    )
+
+
+def _or(left: MaskResult, right: MaskResult) -> MaskResult:
+    if HAS_NUMPY:
+        value = left.value | right.value
+        return MaskResult(value, (left.unresolved | right.unresolved) & ~value)
+    return MaskResult(
+        [lv or rv for lv, rv in zip(left.value, right.value)],
+        [
+            (lu or ru) and not (lv or rv)
+            for lv, lu, rv, ru in zip(left.value, left.unresolved, right.value, right.unresolved)
+        ],
+    )
+
+
+def _full(rows: int, state: bool) -> Mask:
+    if HAS_NUMPY:
+        return numpy.full(rows, state, dtype=numpy.bool_)
+    return [state] * rows
+
+
+def _take(table: list[bool], codes: Any) -> Mask:
+    if HAS_NUMPY:
+        return numpy.asarray(table, dtype=numpy.bool_)[codes]
+    return [table[code] for code in codes]
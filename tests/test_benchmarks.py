@@ -0,0 +1,40 @@
+import json
+
+from packaging.markers import Marker
+
+from benchmarks.corpus import full_environment, generate_markers, markerpry_environment
+from benchmarks.suite import run
+from markerpry.node import BooleanNode
+from markerpry.parser import parse
+
+
+def test_corpus_is_deterministic():
+    assert generate_markers(50, seed=1) == generate_markers(50, seed=1)
+    assert generate_markers(50, seed=1) != generate_markers(50, seed=2)
+
+
+def test_corpus_matches_packaging():
+    """The corpus should be valid, and fully evaluate to the same result as packaging"""
+    packaging_env = full_environment()
+    env = markerpry_environment(packaging_env)
+    for marker_str in generate_markers(200, max_atoms=4):
+        result = parse(marker_str).evaluate(env)
+        assert isinstance(result, BooleanNode)
+        assert result.state == Marker(marker_str).evaluate(packaging_env), marker_str
+
+
+def test_suite_runs():
+    report = run("small", repeat=1, count=20)
+    assert report["metadata"]["count"] == 20
+    assert set(report["results"]) >= {
+        "parse",
+        "parse_marker",
+        "evaluate_full",
+        "evaluate_partial",
+        "str",
+        "str_cached",
+        "contains",
+    }
+    assert all(result["seconds"] >= 0 for result in report["results"].values())
+    assert report["peak_memory_bytes"]["parse"] > 0
+    json.dumps(report)
@@ -0,0 +1,59 @@
+import pytest
+from packaging.markers import InvalidMarker
+from packaging.version import Version
+
+import markerpry.bulk
+from markerpry.bulk import chunksize, evaluate_many, parse_many
+from markerpry.node import Environment
+from markerpry.parser import parse
+
+markers = [
+    'python_version >= "3.8"',
+    'os_name == "nt" and python_version < "3.10"',
+    '"linux" in sys_platform or platform_machine != "x86_64"',
+    'python_version >= "3.8"',
+    '(os_name == "posix" or os_name == "nt") and implementation_name == "cpython"',
+]
+
+
+@pytest.fixture(params=[1, 2], ids=["serial", "parallel"])
+def max_workers(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> int:
+    monkeypatch.setattr(markerpry.bulk, "SERIAL_THRESHOLD", 0)
+    return request.param
+
+
+def test_parse_many(max_workers: int):
+    result = parse_many(markers, max_workers=max_workers)
+    assert result == [parse(marker) for marker in markers]
+    # Duplicates share the same node
+    assert result[0] is result[3]
+
+
+def test_evaluate_many(max_workers: int):
+    env: Environment = {"python_version": [Version("3.9")], "os_name": ["posix"]}
+    nodes = [parse(marker) for marker in markers]
+    result = evaluate_many(nodes, env, max_workers=max_workers)
+    assert result == [node.evaluate(env) for node in nodes]
+
+
+def test_parse_many_invalid(max_workers: int):
+    with pytest.raises(InvalidMarker):
+        parse_many(['python_version >= "3.8"', "not a marker"], max_workers=max_workers)
+
+
+def test_parse_many_empty():
+    assert parse_many([]) == []
+    assert evaluate_many([], {}) == []
+
+
+@pytest.mark.parametrize(
+    "items,workers,expected",
+    [
+        (1, 8, 1),
+        (100, 1, 25),
+        (1000, 4, 63),
+        (10_000_000, 2, markerpry.bulk.MAX_CHUNKSIZE),
+    ],
+)
+def test_chunksize(items: int, workers: int, expected: int):
+    assert chunksize(items, workers) == expected
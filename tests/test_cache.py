@@ -0,0 +1,123 @@
+import multiprocessing
+import os
+from pathlib import Path
+
+import pytest
+
+import markerpry.cache
+import markerpry.parser
+from markerpry.cache import ParseCache
+from markerpry.parser import parse
+
+markers = [
+    'python_version >= "3.8"',
+    'os_name == "nt" and python_version < "3.10"',
+    '"linux" in sys_platform or platform_machine != "x86_64"',
+]
+
+
+def _no_parse(marker_str: str):
+    raise AssertionError(f"{marker_str} should have been cached")
+
+
+def test_warm_cache_skips_parsing(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    path = tmp_path / "cache.bin"
+    with ParseCache(path) as cache:
+        assert [cache.parse(marker) for marker in markers] == [parse(marker) for marker in markers]
+
+    monkeypatch.setattr(markerpry.parser, "parse", _no_parse)
+    with ParseCache(path) as cache:
+        assert len(cache) == len(markers)
+        assert [cache.parse(marker) for marker in markers] == [parse(marker) for marker in markers]
+
+
+def test_get_and_put(tmp_path: Path):
+    cache = ParseCache(tmp_path / "cache.bin")
+    assert cache.get(markers[0]) is None
+    assert len(cache) == 0
+    cache.put(markers[0], parse(markers[0]))
+    assert cache.get(markers[0]) == parse(markers[0])
+    assert len(cache) == 1
+    cache.close()
+    assert ParseCache(tmp_path / "cache.bin").get(markers[0]) == parse(markers[0])
+
+
+def test_flush_appends(tmp_path: Path):
+    path = tmp_path / "cache.bin"
+    cache = ParseCache(path)
+    cache.parse(markers[0])
+    cache.flush()
+    size = path.stat().st_size
+    cache.parse(markers[1])
+    cache.flush()
+    assert path.stat().st_size > size
+    assert len(ParseCache(path)) == 2
+
+
+def test_version_mismatch_is_ignored(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    path = tmp_path / "cache.bin"
+    with ParseCache(path) as cache:
+        cache.parse(markers[0])
+
+    monkeypatch.setattr(markerpry.cache, "__version__", "999")
+    cache = ParseCache(path)
+    assert cache.get(markers[0]) is None
+    cache.parse(markers[1])
+    cache.close()
+    assert len(ParseCache(path)) == 1
+
+
+def test_eviction(tmp_path: Path):
+    path = tmp_path / "cache.bin"
+    generated = [f'python_full_version == "3.{i}.0"' for i in range(200)]
+    with ParseCache(path, max_size=4096) as cache:
+        for marker in generated:
+            cache.parse(marker)
+            cache.flush()
+    assert path.stat().st_size <= 4096
+
+    cache = ParseCache(path, max_size=4096)
+    # The newest entries are kept, and the oldest ones are evicted
+    assert cache.get(generated[-1]) == parse(generated[-1])
+    assert cache.get(generated[0]) is None
+
+
+def test_interrupted_write(tmp_path: Path):
+    path = tmp_path / "cache.bin"
+    with ParseCache(path) as cache:
+        cache.parse(markers[0])
+    with open(path, "ab") as f:
+        f.write(b"\x01" * 16 + b"\xff\x00\x00\x00MPRY")
+
+    cache = ParseCache(path)
+    assert len(cache) == 1
+    cache.parse(markers[1])
+    cache.close()
+
+    cache = ParseCache(path)
+    assert cache.get(markers[0]) == parse(markers[0])
+    assert cache.get(markers[1]) == parse(markers[1])
+
+
+def _write_markers(path: str, start: int) -> None:
+    with ParseCache(path) as cache:
+        for i in range(start, start + 50):
+            cache.parse(f'python_full_version == "3.{i}"')
+            if i % 10 == 0:
+                cache.flush()
+
+
+def test_concurrent_writers(tmp_path: Path):
+    path = str(tmp_path / "cache.bin")
+    processes = [multiprocessing.Process(target=_write_markers, args=(path, start)) for start in (0, 50, 100)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    cache = ParseCache(path)
+    assert len(cache) == 150
+    for i in range(150):
+        assert cache.get(f'python_full_version == "3.{i}"') == parse(f'python_full_version == "3.{i}"')
+    assert not [name for name in os.listdir(tmp_path) if name.startswith(".markerpry-cache-")]
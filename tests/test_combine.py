@@ -0,0 +1,120 @@
+import itertools
+import random
+
+import pytest
+from packaging.version import Version
+
+from benchmarks.corpus import generate_marker
+from markerpry.combine import and_, intern, not_, or_
+from markerpry.node import (
+    FALSE,
+    TRUE,
+    BooleanNode,
+    Environment,
+    EnvironmentValue,
+    Node,
+    OperatorNode,
+)
+from markerpry.parser import parse
+
+A = parse('os_name == "nt"')
+B = parse('extra == "test"')
+C = parse('python_version >= "3.8"')
+
+combine_testdata = [
+    ("and_true", and_(TRUE, A), A),
+    ("and_false", and_(A, FALSE), FALSE),
+    ("or_true", or_(A, TRUE), TRUE),
+    ("or_false", or_(FALSE, A), A),
+    ("and_duplicate", and_(A, A), A),
+    ("or_duplicate", or_(A, parse('os_name == "nt"')), A),
+    ("and_chain_duplicate", and_(and_(A, B), A), and_(A, B)),
+    ("and_chain_subset", and_(and_(A, B), and_(B, A)), and_(A, B)),
+    ("and_absorption", and_(A, or_(A, B)), A),
+    ("or_absorption", or_(and_(B, A), A), A),
+    ("chain_absorption", and_(and_(A, C), or_(B, C)), and_(A, C)),
+    ("no_simplification", or_(A, B), parse('os_name == "nt" or extra == "test"')),
+]
+
+
+@pytest.mark.parametrize("name,result,expected", combine_testdata, ids=[x[0] for x in combine_testdata])
+def test_combine(name: str, result: Node, expected: Node):
+    assert result == expected
+
+
+negate_testdata = [
+    ("equal", 'os_name == "nt"', 'os_name != "nt"'),
+    ("not_equal", 'os_name != "nt"', 'os_name == "nt"'),
+    ("less", 'python_version < "3.8"', 'python_version >= "3.8"'),
+    ("greater", 'python_version > "3.8"', 'python_version <= "3.8"'),
+    ("in", '"arm" in platform_machine', '"arm" not in platform_machine'),
+    ("inverted_in", 'sys_platform in "linux darwin"', 'sys_platform not in "linux darwin"'),
+    ("and", 'os_name == "nt" and extra == "test"', 'os_name != "nt" or extra != "test"'),
+    (
+        "nested",
+        'os_name == "nt" or (extra == "test" and python_version < "3.8")',
+        'os_name != "nt" and (extra != "test" or python_version >= "3.8")',
+    ),
+]
+
+
+@pytest.mark.parametrize("name,marker,expected", negate_testdata, ids=[x[0] for x in negate_testdata])
+def test_not(name: str, marker: str, expected: str):
+    assert str(not_(parse(marker))) == expected
+
+
+def test_not_constants():
+    assert not_(TRUE) is FALSE
+    assert not_(FALSE) is TRUE
+
+
+@pytest.mark.parametrize("marker", ['python_version ~= "3.8"', 'python_version === "3.8"'])
+def test_not_unsupported(marker: str):
+    with pytest.raises(ValueError):
+        not_(parse(marker))
+
+
+def test_interned():
+    first = and_(parse('os_name == "nt"'), or_(parse('extra == "a"'), parse('extra == "b"')))
+    second = and_(parse('os_name == "nt"'), or_(parse('extra == "a"'), parse('extra == "b"')))
+    assert first is second
+    assert intern(parse('os_name == "nt" and (extra == "a" or extra == "b")')) is first
+
+
+def single_valued_environments():
+    values: dict[str, list[EnvironmentValue]] = {
+        "os_name": ["nt", "posix"],
+        "extra": ["test", "docs"],
+        "python_version": [Version("3.7"), Version("3.12")],
+        "sys_platform": ["linux", "win32"],
+    }
+    for combination in itertools.product(*values.values()):
+        env: Environment = {key: [value] for key, value in zip(values, combination)}
+        yield env
+
+
+def test_equivalent_to_operator_nodes():
+    rng = random.Random(0)
+    # Constants are covered above. OperatorNodes of constants aren't simplified by evaluate(), so they're left out
+    atoms = [A, B, C, parse('sys_platform == "linux"'), parse('os_name != "nt"')]
+    for _ in range(200):
+        node: Node = rng.choice(atoms)
+        naive: Node = node
+        for _ in range(4):
+            other = rng.choice(atoms)
+            operator = rng.choice(["and", "or"])
+            node = and_(node, other) if operator == "and" else or_(node, other)
+            naive = OperatorNode("and" if operator == "and" else "or", naive, other)
+        for env in single_valued_environments():
+            assert node.evaluate(env) == naive.evaluate(env), (str(node), str(naive))
+
+
+def test_negation_on_generated_markers():
+    rng = random.Random(1)
+    for _ in range(50):
+        node = parse(generate_marker(rng, rng.randint(1, 4)).replace("~=", "=="))
+        negated = not_(node)
+        for env in single_valued_environments():
+            result = node.evaluate(env)
+            if isinstance(result, BooleanNode):
+                assert negated.evaluate(env) == BooleanNode(not result.state)
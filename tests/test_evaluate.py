@@ -1,10 +1,27 @@
+import pickle
+import platform
 import re
+import sys
+from collections.abc import Callable
 
 import pytest
 from packaging.markers import Marker
+from packaging.specifiers import SpecifierSet
 from packaging.version import Version
 
-from markerpry.node import BooleanNode, Environment, ExpressionNode, Node, OperatorNode
+from markerpry.node import (
+    MASK_BITS,
+    BooleanNode,
+    CompiledEnvironment,
+    Environment,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+    _key_bits,
+    compile_environment,
+    current_environment,
+    normalize_extra,
+)
 from markerpry.parser import parse
 
 # Basic string comparison tests
@@ -199,6 +216,119 @@ def test_multiple_values_evaluate(name: str, expr: ExpressionNode, env: Environm
     assert result == expected
 
 
+# Version range tests
+specifier_set_testdata = [
+    (
+        "range_entirely_inside",
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.8"),
+        {"python_version": [SpecifierSet(">=3.9,<3.13")]},
+        BooleanNode(True),
+    ),
+    (
+        "range_entirely_outside",
+        ExpressionNode(lhs="python_version", comparator="<", rhs="3.8"),
+        {"python_version": [SpecifierSet(">=3.9,<3.13")]},
+        BooleanNode(False),
+    ),
+    (
+        "range_partially_inside",
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.10"),
+        {"python_version": [SpecifierSet(">=3.8,<3.13")]},
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.10"),
+    ),
+    (
+        "range_exclusive_bound",
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.10"),
+        {"python_version": [SpecifierSet("<3.10")]},
+        BooleanNode(False),
+    ),
+    (
+        "range_equality_point",
+        ExpressionNode(lhs="python_version", comparator="==", rhs="3.10"),
+        {"python_version": [SpecifierSet("==3.10")]},
+        BooleanNode(True),
+    ),
+    (
+        "range_not_equal_inside",
+        ExpressionNode(lhs="python_version", comparator="!=", rhs="2.7"),
+        {"python_version": [SpecifierSet(">=3.8")]},
+        BooleanNode(True),
+    ),
+    (
+        "range_wildcard",
+        ExpressionNode(lhs="python_full_version", comparator="<", rhs="3.10"),
+        {"python_full_version": [SpecifierSet("==3.9.*")]},
+        BooleanNode(True),
+    ),
+    (
+        "range_compatible_release",
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="4"),
+        {"python_version": [SpecifierSet("~=3.8")]},
+        BooleanNode(False),
+    ),
+    (
+        "range_wildcard_comparison",
+        ExpressionNode(lhs="python_full_version", comparator="==", rhs="3.9.*"),
+        {"python_full_version": [SpecifierSet(">=3.9.1,<3.9.5")]},
+        BooleanNode(True),
+    ),
+    (
+        "range_in_operator",
+        ExpressionNode(lhs="3.9", comparator="in", rhs="python_version"),
+        {"python_version": [SpecifierSet(">=3.8")]},
+        ExpressionNode(lhs="3.9", comparator="in", rhs="python_version"),
+    ),
+    (
+        "range_invalid_version",
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="not-a-version"),
+        {"python_version": [SpecifierSet(">=3.8")]},
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="not-a-version"),
+    ),
+    (
+        "range_arbitrary_equality",
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.8"),
+        {"python_version": [SpecifierSet("===3.9")]},
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.8"),
+    ),
+    (
+        "range_empty",
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.8"),
+        {"python_version": [SpecifierSet(">3.9,<3.8")]},
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.8"),
+    ),
+    (
+        "range_mixed_with_version",
+        ExpressionNode(lhs="python_version", comparator=">=", rhs="3.10"),
+        {"python_version": [SpecifierSet(">=3.8,<3.13"), Version("3.12")]},
+        BooleanNode(True),
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "name,expr,env,expected",
+    specifier_set_testdata,
+    ids=[x[0] for x in specifier_set_testdata],
+)
+def test_specifier_set_evaluate(name: str, expr: ExpressionNode, env: Environment, expected: Node):
+    result = expr.evaluate(env)
+    assert result == expected
+    # The second evaluation uses the cached ranges
+    assert expr.evaluate(env) == expected
+
+
+def test_specifier_set_ranges_cached():
+    from markerpry.stats import collect_stats
+
+    expr = ExpressionNode("python_version", ">=", "3.8")
+    env: Environment = {"python_version": [SpecifierSet(">=3.9,<3.13")]}
+    expr.evaluate(env)
+    with collect_stats() as stats:
+        for _ in range(3):
+            assert expr.evaluate(env) == BooleanNode(True)
+    assert stats.cache_hits["specifier_ranges"] == 3
+
+
 # Missing environment tests
 missing_env_testdata = [
     (
@@ -299,6 +429,8 @@ regex_testdata = [
 def test_regex_evaluate(name: str, expr: ExpressionNode, env: Environment, expected: Node):
     result = expr.evaluate(env)
     assert result == expected
+    # A compiled environment matches the patterns for a key together, with the same results
+    assert expr.evaluate(compile_environment(env)) == expected
 
 
 # Boolean literal tests
@@ -833,3 +965,257 @@ def test_packaging_comparison(name: str, marker_str: str, env: Environment, expe
     packaging_env = {k: str(v[0]) for k, v in env.items()}
     packaging_result = packaging_marker.evaluate(packaging_env)
     assert packaging_result == expected
+
+
+# Subtrees whose keys aren't in the environment are skipped using key masks
+def test_irrelevant_subtrees_skipped():
+    from markerpry.stats import collect_stats
+
+    expr = parse('(os_name == "nt" and sys_platform == "win32") or extra == "test"')
+    with collect_stats() as stats:
+        result = expr.evaluate({"extra": ["docs"]})
+    assert result == expr.left
+    assert stats.evaluations == {"OperatorNode": 2, "ExpressionNode": 1}
+
+    with collect_stats() as stats:
+        assert expr.evaluate({"python_version": [Version("3.8")]}) is expr
+    assert stats.evaluations == {"OperatorNode": 1}
+
+
+def test_compile_environment():
+    env: Environment = {"os_name": ["nt"], "sys_platform": ["win32"]}
+    compiled = compile_environment(env)
+    assert compiled == env
+    assert compile_environment(compiled) is compiled
+    expr = parse('os_name == "nt" and sys_platform == "win32"')
+    assert expr.evaluate(compiled) == BooleanNode(True)
+
+
+def test_compiled_environment_constructor():
+    env: Environment = {"os_name": ["nt"], "python_version": ["3.10"]}
+    compiled = CompiledEnvironment(env)
+    assert compiled["python_version"] == [Version("3.10")]
+    assert env["python_version"] == ["3.10"]
+    expr = parse('os_name == "nt" and python_version >= "3.8"')
+    assert expr.evaluate(compiled) == BooleanNode(True)
+
+
+compiled_mutation_testdata = [
+    ("setitem", lambda env: env.__setitem__("extra", ["test"])),
+    ("delitem", lambda env: env.__delitem__("os_name")),
+    ("update", lambda env: env.update({"extra": ["test"]})),
+    ("ior", lambda env: env.__ior__({"extra": ["test"]})),
+    ("pop", lambda env: env.pop("os_name")),
+    ("popitem", lambda env: env.popitem()),
+    ("setdefault", lambda env: env.setdefault("extra", ["test"])),
+    ("clear", lambda env: env.clear()),
+]
+
+
+@pytest.mark.parametrize("name,mutate", compiled_mutation_testdata, ids=[x[0] for x in compiled_mutation_testdata])
+def test_compiled_environment_read_only(name: str, mutate: Callable[[CompiledEnvironment], object]):
+    compiled = compile_environment({"os_name": ["nt"]})
+    with pytest.raises(TypeError):
+        mutate(compiled)
+    assert compiled == {"os_name": ["nt"]}
+
+
+def test_compiled_environment_pickle():
+    compiled = compile_environment({"os_name": ["nt"]})
+    unpickled = pickle.loads(pickle.dumps(compiled))
+    assert isinstance(unpickled, CompiledEnvironment)
+    assert unpickled == compiled
+    assert unpickled.mask == compiled.mask
+
+
+def test_many_keys():
+    # Keys beyond MASK_BITS share bits, which must not change any results
+    keys = [f"key_{i}" for i in range(MASK_BITS * 2 + 1)]
+    expr: Node = ExpressionNode(keys[0], "==", "a")
+    for key in keys[1:]:
+        expr = OperatorNode("and", expr, ExpressionNode(key, "==", "a"))
+    env: Environment = {key: ["a"] for key in keys}
+    assert expr.evaluate(env) == BooleanNode(True)
+    env = {keys[-1]: ["b"]}
+    assert expr.evaluate(env) == BooleanNode(False)
+    assert all(key in expr for key in keys)
+    assert "other_key" not in expr
+
+
+def test_contains_unknown_key():
+    # Checking for a key that no node reads must not assign it a bit
+    expr = OperatorNode("and", ExpressionNode("os_name", "==", "nt"), ExpressionNode("sys_platform", "==", "win32"))
+    assert "never_seen_key" not in expr
+    assert "never_seen_key" not in _key_bits
+
+
+merged_pattern_testdata = [
+    ("any_matches", [re.compile("arm.*"), re.compile("x86.*")], "x86_64", True, True),
+    ("none_match", [re.compile("arm.*"), re.compile("x86.*")], "ppc64le", False, True),
+    ("all_match", [re.compile("x86.*"), re.compile(".*64")], "x86_64", True, False),
+    ("mixed_flags", [re.compile("ARM.*", re.IGNORECASE), re.compile("x86.*")], "arm64", True, True),
+    ("backreference", [re.compile(r"(a)x"), re.compile(r"(b)\1")], "bb", True, True),
+    ("conditional_reference", [re.compile("(x)"), re.compile("(a)?(?(1)b|c)")], "ab", True, True),
+    ("duplicate_group_names", [re.compile("(?P<arch>arm)"), re.compile("(?P<arch>x86)")], "x86", True, True),
+    ("verbose", [re.compile("arm # a comment", re.VERBOSE), re.compile("x86", re.VERBOSE)], "x86", True, True),
+]
+
+
+@pytest.mark.parametrize(
+    "name,patterns,value,equal,not_equal",
+    merged_pattern_testdata,
+    ids=[x[0] for x in merged_pattern_testdata],
+)
+def test_merged_patterns(name: str, patterns: list[re.Pattern[str]], value: str, equal: bool, not_equal: bool):
+    env: Environment = {"platform_machine": list(patterns)}
+    for environment in (env, compile_environment(env)):
+        assert ExpressionNode("platform_machine", "==", value).evaluate(environment) == BooleanNode(equal)
+        assert ExpressionNode("platform_machine", "!=", value).evaluate(environment) == BooleanNode(not_equal)
+
+
+def test_pattern_cache_hits():
+    from markerpry.stats import collect_stats
+
+    env = compile_environment({"platform_machine": [re.compile("arm.*"), re.compile("aarch64")]})
+    exprs = [parse(f'platform_machine == "arm{i % 2}" or os_name == "nt"') for i in range(10)]
+    with collect_stats() as stats:
+        for expr in exprs:
+            expr.evaluate(env)
+    assert stats.value_types == {"PatternSet": 10}
+    assert stats.cache_hits["patterns"] >= 8
+
+
+version_string_testdata = [
+    ("python_version", 'python_version >= "3.8"', {"python_version": ["3.10"]}, BooleanNode(True)),
+    ("python_full_version", 'python_full_version < "3.12"', {"python_full_version": ["3.11.4"]}, BooleanNode(True)),
+    (
+        "implementation_version",
+        'implementation_version > "3.9"',
+        {"implementation_version": ["3.8.1"]},
+        BooleanNode(False),
+    ),
+    ("equal_as_version", 'python_version == "3.10.0"', {"python_version": ["3.10"]}, BooleanNode(True)),
+    ("mixed_values", 'python_version >= "3.8"', {"python_version": ["3.7", Version("3.9")]}, BooleanNode(True)),
+    ("invalid_version", 'python_version == "3.x"', {"python_version": ["3.x"]}, BooleanNode(True)),
+]
+
+
+@pytest.mark.parametrize(
+    "name,marker,env,expected", version_string_testdata, ids=[x[0] for x in version_string_testdata]
+)
+def test_version_strings_coerced(name: str, marker: str, env: Environment, expected: Node):
+    # A plain dict is compiled by the expression itself
+    for environment in (env, compile_environment(env)):
+        assert parse(marker).evaluate(environment) == expected
+
+
+def test_version_strings_coerced_in_tree():
+    expr = ExpressionNode("python_version", ">=", "3.8")
+    tree = OperatorNode("and", expr, ExpressionNode("os_name", "==", "posix"))
+    env: Environment = {"python_version": ["3.9"], "os_name": ["posix"]}
+    assert expr.evaluate(env) == BooleanNode(True)
+    assert tree.evaluate(env) == BooleanNode(True)
+    assert env["python_version"] == ["3.9"]
+
+
+def test_version_coercion_copies():
+    env: Environment = {"python_version": ["3.10"], "os_name": ["posix"]}
+    compiled = compile_environment(env)
+    assert compiled["python_version"] == [Version("3.10")]
+    assert compiled["os_name"] == ["posix"]
+    # The caller's environment is left alone
+    assert env["python_version"] == ["3.10"]
+
+
+def test_version_cache_hits():
+    from markerpry.stats import collect_stats
+
+    compile_environment({"python_full_version": ["3.11.7"]})
+    with collect_stats() as stats:
+        for _ in range(3):
+            compile_environment({"python_full_version": ["3.11.7"]})
+    assert stats.cache_hits["versions"] == 3
+
+
+def test_current_environment():
+    environment = current_environment()
+    assert current_environment() is environment
+    assert isinstance(environment, CompiledEnvironment)
+    assert environment["python_full_version"] == [Version(platform.python_version())]
+    assert environment["sys_platform"] == [sys.platform]
+    assert "extra" not in environment
+
+
+def test_current_environment_not_shared():
+    environment = current_environment()
+    with pytest.raises(TypeError):
+        environment["extra"] = ["test"]
+    with_extras = current_environment(extras=["Test"])
+    assert with_extras["extra"] == ["test"]
+    assert with_extras["sys_platform"] == [sys.platform]
+    expr = parse('extra == "test" or extra == "docs"')
+    assert expr.evaluate(with_extras) == BooleanNode(True)
+    assert expr.left is not None and expr.left.evaluate(with_extras) == BooleanNode(True)
+    # Later callers still get the environment without extras
+    assert current_environment() is environment
+    assert "extra" not in current_environment()
+    assert expr.evaluate_here() == expr
+
+
+def test_evaluate_here():
+    version = f"{sys.version_info.major}.{sys.version_info.minor}"
+    assert parse(f'python_version == "{version}" and sys_platform == "{sys.platform}"').evaluate_here() == BooleanNode(
+        True
+    )
+    assert parse(f'python_version < "{version}"').evaluate_here() == BooleanNode(False)
+    expr = parse(f'python_version >= "{version}" and extra == "test"')
+    assert expr.evaluate_here() == expr.right
+    assert expr.evaluate_here(extras=["test"]) == BooleanNode(True)
+    assert expr.evaluate_here(extras=["docs"]) == BooleanNode(False)
+
+
+extra_testdata = [
+    ("normalized_environment", ExpressionNode("extra", "==", "foo-bar"), {"extra": ["Foo_Bar"]}, BooleanNode(True)),
+    ("normalized_node", ExpressionNode("extra", "==", "Foo.Bar"), {"extra": ["foo-bar"]}, BooleanNode(True)),
+    ("many_extras", ExpressionNode("extra", "==", "test"), {"extra": ["docs", "Test", "dev"]}, BooleanNode(True)),
+    ("not_requested", ExpressionNode("extra", "==", "test"), {"extra": ["docs", "dev"]}, BooleanNode(False)),
+    ("not_equal_only_extra", ExpressionNode("extra", "!=", "test"), {"extra": ["TEST"]}, BooleanNode(False)),
+    ("not_equal_other_extra", ExpressionNode("extra", "!=", "test"), {"extra": ["test", "docs"]}, BooleanNode(True)),
+    ("no_extras", ExpressionNode("extra", "==", "test"), {"extra": []}, ExpressionNode("extra", "==", "test")),
+    ("with_boolean", ExpressionNode("extra", "==", "test"), {"extra": ["Test", False]}, BooleanNode(False)),
+    ("with_pattern", ExpressionNode("extra", "==", "test"), {"extra": ["Test", re.compile("x")]}, BooleanNode(True)),
+    ("in", parse('"Foo" in extra'), {"extra": ["Foo"]}, BooleanNode(True)),
+    ("in_not_requested", parse('"Foo" in extra'), {"extra": ["docs"]}, BooleanNode(False)),
+    ("not_in", parse('"Foo" not in extra'), {"extra": ["Foo"]}, BooleanNode(False)),
+    ("not_in_not_requested", parse('"Foo" not in extra'), {"extra": ["docs"]}, BooleanNode(True)),
+]
+
+
+@pytest.mark.parametrize("name,expr,env,expected", extra_testdata, ids=[x[0] for x in extra_testdata])
+def test_extras(name: str, expr: ExpressionNode, env: Environment, expected: Node):
+    assert expr.evaluate(env) == expected
+    assert expr.evaluate(compile_environment(env)) == expected
+    # Trees compile the environment themselves
+    other = parse('os_name == "nt"')
+    tree = OperatorNode("or", expr, other)
+    if isinstance(expected, BooleanNode):
+        assert tree.evaluate(env) == (expected if expected.state else other)
+    else:
+        assert tree.evaluate(env) == tree
+
+
+def test_extras_set_lookup():
+    from markerpry.stats import collect_stats
+
+    env = compile_environment({"extra": [f"Extra_{i}" for i in range(20)]})
+    assert env["extra"][3] == "extra-3"
+    exprs = [parse(f'extra == "extra.{i}" and os_name == "nt"') for i in range(30)]
+    with collect_stats() as stats:
+        results = [expr.evaluate(env) for expr in exprs]
+    assert stats.value_types == {"ExtraSet": 30}
+    assert results == [parse('os_name == "nt"')] * 20 + [BooleanNode(False)] * 10
+
+
+def test_normalize_extra():
+    assert normalize_extra("Foo__Bar.baz-") == "foo-bar-baz-"
+    assert normalize_extra("Foo_Bar") is normalize_extra("foo-bar")
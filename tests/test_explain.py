@@ -0,0 +1,96 @@
+import pytest
+from packaging.version import Version
+
+from markerpry.explain import explain
+from markerpry.node import FALSE, TRUE, Environment
+from markerpry.parser import parse
+
+ENV: Environment = {
+    "python_version": [Version("3.9")],
+    "os_name": ["posix"],
+    "sys_platform": ["linux", "darwin"],
+}
+
+explain_testdata = [
+    ("true_atom", 'python_version >= "3.8"'),
+    ("false_atom", 'os_name == "nt"'),
+    ("missing_key", 'extra == "test"'),
+    ("or_short_circuit", 'os_name == "posix" or python_version < "3.8"'),
+    ("and_short_circuit", 'python_version < "3.8" and os_name == "posix"'),
+    ("residual", '(os_name == "posix" and extra == "test") or (os_name == "nt" and extra == "docs")'),
+    ("nested", '(python_version >= "3.8" or extra == "a") and (sys_platform == "darwin" or os_name == "nt")'),
+]
+
+
+@pytest.mark.parametrize("name,marker", explain_testdata, ids=[x[0] for x in explain_testdata])
+def test_explain_matches_evaluate(name: str, marker: str):
+    tree = parse(marker)
+    assert explain(tree, ENV).result == tree.evaluate(ENV)
+
+
+def test_deciding_atom():
+    explanation = explain(parse('python_version < "3.8" or sys_platform == "darwin"'), ENV)
+    assert explanation.result == TRUE
+    (decision,) = explanation.deciding
+    assert str(decision.node) == 'sys_platform == "darwin"'
+    assert decision.value == "darwin"
+    assert decision.outcomes == (("linux", False), ("darwin", True))
+    assert [str(atom.node) for atom in explanation.atoms] == ['python_version < "3.8"', 'sys_platform == "darwin"']
+
+
+def test_version_strings():
+    # Version strings are compared as versions, as they are by evaluate()
+    env: Environment = {"python_version": ["3.9"], "os_name": ["posix"]}
+    tree = parse('python_version >= "3.8" and os_name == "posix"')
+    explanation = explain(tree, env)
+    assert explanation.result == tree.evaluate(env) == TRUE
+    assert explanation.atoms[0].outcomes == (("3.9", True),)
+
+
+def test_short_circuit_pruned():
+    explanation = explain(parse('os_name == "nt" and (python_version >= "3.8" or extra == "test")'), ENV)
+    assert explanation.result == FALSE
+    assert [str(decision.node) for decision in explanation.deciding] == ['os_name == "nt"']
+    assert explanation.deciding[0].value == "posix"
+    # The inner or is simplified first, then the whole or is pruned
+    assert [(str(pruned.node), pruned.rule) for pruned in explanation.pruned] == [
+        ('extra == "test"', "True or X"),
+        ('python_version >= "3.8" or extra == "test"', "False and X"),
+    ]
+    assert explanation.pruned[1].result == TRUE
+
+
+def test_neutral_child_pruned():
+    explanation = explain(parse('extra == "test" and python_version >= "3.8"'), ENV)
+    assert str(explanation.result) == 'extra == "test"'
+    assert [(str(pruned.node), pruned.rule) for pruned in explanation.pruned] == [
+        ('python_version >= "3.8"', "X and True"),
+    ]
+    assert [str(decision.node) for decision in explanation.deciding] == ['python_version >= "3.8"']
+
+
+def test_all_children_decide():
+    explanation = explain(parse('python_version >= "3.8" and os_name == "posix"'), ENV)
+    assert explanation.result == TRUE
+    assert [str(decision.node) for decision in explanation.deciding] == [
+        'python_version >= "3.8"',
+        'os_name == "posix"',
+    ]
+
+
+def test_unresolved_atom():
+    explanation = explain(parse('python_version ~= "x"'), {"python_version": ["3.9"]})
+    (atom,) = explanation.atoms
+    assert atom.value is None
+    assert explanation.deciding == []
+
+
+def test_str():
+    explanation = explain(parse('os_name == "nt" or python_version >= "3.8"'), ENV)
+    assert str(explanation) == "\n".join(
+        [
+            "result: True",
+            'decided by: python_version >= "3.8" => True (value: 3.9)',
+            'pruned: os_name == "nt" (by X or True)',
+        ]
+    )
@@ -0,0 +1,30 @@
+import pytest
+
+from benchmarks.fuzz import Report, check, regressions, run
+
+
+def test_fuzz_agrees_with_packaging():
+    report = run(seed=1234, count=300)
+    assert report.cases == 300
+    assert report.failures == []
+
+
+def test_fuzz_reports_failures():
+    report = Report()
+    # markerpry intentionally leaves string ordering comparisons unresolved, which packaging rejects
+    check('os_name < "posix"', {"os_name": "nt"}, report)
+    assert [failure["check"] for failure in report.failures] == ["packaging"]
+
+
+@pytest.mark.parametrize(
+    "relative,expected",
+    [
+        ({"parse": 1.0, "evaluate": 1.0}, []),
+        ({"parse": 1.2, "evaluate": 0.5}, []),
+        ({"parse": 1.0, "evaluate": 1.5}, ["evaluate"]),
+    ],
+)
+def test_regressions(relative: dict[str, float], expected: list[str]):
+    baseline = {"relative": {"parse": 1.0, "evaluate": 1.0}}
+    messages = regressions({"relative": relative}, baseline, threshold=1.25)
+    assert [message.split()[0] for message in messages] == expected
@@ -0,0 +1,80 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from markerpry.cache import ParseCache
+
+LAZY_MODULES = [
+    "packaging.markers",
+    "packaging._parser",
+    "packaging.specifiers",
+    "typing_extensions",
+    "concurrent.futures",
+    "markerpry.parser",
+]
+
+
+def _import_times(code: str) -> dict[str, int]:
+    """Run code in a fresh interpreter, and return the cumulative import time in microseconds of each module"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, module = line.split("|")
+        times[module.strip()] = int(cumulative)
+    return times
+
+
+def test_import_is_lazy():
+    times = _import_times("import markerpry")
+    assert "markerpry.node" in times
+    for module in LAZY_MODULES:
+        assert module not in times
+
+
+def test_building_nodes_is_lazy():
+    times = _import_times(
+        "import markerpry\n"
+        "node = markerpry.OperatorNode('and', markerpry.ExpressionNode('os_name', '==', 'nt'), markerpry.TRUE)\n"
+        "assert str(node.evaluate({'os_name': ['nt']})) == 'True'\n"
+    )
+    for module in LAZY_MODULES:
+        assert module not in times
+
+
+def test_cache_import_is_lazy(tmp_path: Path):
+    path = tmp_path / "cache.bin"
+    with ParseCache(path) as cache:
+        cache.parse('os_name == "nt"')
+    times = _import_times(
+        "from markerpry.cache import ParseCache\n"
+        f"with ParseCache({str(path)!r}) as cache:\n"
+        "    assert str(cache.parse('os_name == \"nt\"')) == 'os_name == \"nt\"'\n"
+    )
+    assert "markerpry.cache" in times
+    for module in LAZY_MODULES:
+        assert module not in times
+
+
+def test_parse_imports_on_first_use():
+    times = _import_times("import markerpry\nmarkerpry.parse('os_name == \"nt\"')")
+    assert "packaging.markers" in times
+    assert "packaging._parser" in times
+
+
+def test_lazy_attributes():
+    import markerpry
+
+    for name in markerpry.__all__:
+        assert getattr(markerpry, name) is not None
+        assert name in dir(markerpry)
+    with pytest.raises(AttributeError):
+        markerpry.does_not_exist  # type: ignore[attr-defined]
@@ -0,0 +1,100 @@
+import itertools
+import random
+
+from packaging.version import Version
+
+from markerpry.incremental import IncrementalEvaluator
+from markerpry.node import FALSE, TRUE, Environment, EnvironmentValue
+from markerpry.parser import parse
+from markerpry.stats import collect_stats
+
+MARKERS = [
+    'python_version >= "3.10" and sys_platform == "linux"',
+    'python_version < "3.10" or os_name == "nt"',
+    'sys_platform == "win32" and (extra == "test" or extra == "docs")',
+    'os_name == "posix"',
+    'python_version >= "3.10" and sys_platform == "linux"',
+]
+
+VALUES: dict[str, list[EnvironmentValue]] = {
+    "python_version": [Version("3.8"), Version("3.10"), Version("3.12")],
+    "sys_platform": ["linux", "win32"],
+    "os_name": ["posix", "nt"],
+    "extra": ["test", "docs", "other"],
+}
+
+
+def test_initial_results():
+    nodes = [parse(marker) for marker in MARKERS]
+    env: Environment = {"python_version": [Version("3.12")], "sys_platform": ["linux"]}
+    evaluator = IncrementalEvaluator(nodes, env)
+    assert evaluator.results == [node.evaluate(env) for node in nodes]
+
+
+def test_only_dependent_atoms_recomputed():
+    nodes = [parse(marker) for marker in MARKERS]
+    evaluator = IncrementalEvaluator(nodes, {"sys_platform": ["linux"], "os_name": ["posix"]})
+    with collect_stats() as stats:
+        changed = evaluator.update({"python_version": [Version("3.12")]})
+    # python_version >= "3.10" is shared by two trees, so only two distinct atoms read python_version
+    assert stats.evaluations["ExpressionNode"] == 2
+    assert changed == [0, 1, 4]
+    assert evaluator.results[0] == TRUE
+    assert evaluator.results[1] == FALSE
+
+    with collect_stats() as stats:
+        assert evaluator.update({"python_version": [Version("3.11")]}) == []
+    assert stats.evaluations["ExpressionNode"] == 2
+
+
+def test_unchanged_values_skipped():
+    evaluator = IncrementalEvaluator([parse(MARKERS[0])], {"sys_platform": ["linux"]})
+    with collect_stats() as stats:
+        assert evaluator.update({"sys_platform": ["linux"], "os_name": ["nt"]}) == []
+    assert stats.evaluations == {}
+
+
+def test_remove_key():
+    node = parse(MARKERS[1])
+    evaluator = IncrementalEvaluator([node], {"python_version": [Version("3.8")]})
+    assert evaluator.results == [TRUE]
+    assert evaluator.update({"python_version": None}) == [0]
+    assert evaluator.results == [node]
+    assert evaluator.update({"python_version": None}) == []
+    assert "python_version" not in evaluator.environment
+
+
+def test_matches_full_evaluation():
+    rng = random.Random(0)
+    nodes = [parse(marker) for marker in MARKERS]
+    evaluator = IncrementalEvaluator(nodes)
+    env: Environment = {}
+    for _ in range(200):
+        key = rng.choice(list(VALUES))
+        values = None if rng.random() < 0.2 else rng.sample(VALUES[key], rng.randint(1, 2))
+        previous = evaluator.results
+        changed = evaluator.update({key: values})
+        if values is None:
+            env.pop(key, None)
+        else:
+            env[key] = values
+        expected = [node.evaluate(env) for node in nodes]
+        assert evaluator.results == expected
+        assert changed == [i for i, (a, b) in enumerate(zip(previous, expected)) if a != b]
+
+
+def test_shared_subtrees():
+    atom = parse('extra == "test"')
+    tree = parse('os_name == "nt" or extra == "test"')
+    evaluator = IncrementalEvaluator([atom, tree, tree])
+    assert evaluator.update({"extra": ["test"]}) == [0, 1, 2]
+    assert evaluator.results == [TRUE, TRUE, TRUE]
+
+
+def test_all_combinations():
+    nodes = [parse(marker) for marker in MARKERS]
+    evaluator = IncrementalEvaluator(nodes)
+    for python_version, sys_platform in itertools.product(VALUES["python_version"], VALUES["sys_platform"]):
+        evaluator.update({"python_version": [python_version], "sys_platform": [sys_platform]})
+        env: Environment = {"python_version": [python_version], "sys_platform": [sys_platform]}
+        assert evaluator.results == [node.evaluate(env) for node in nodes]
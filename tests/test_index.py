@@ -0,0 +1,99 @@
+import pytest
+from packaging.version import Version
+
+from markerpry.index import MarkerIndex
+from markerpry.node import Environment, ExpressionNode
+from markerpry.parser import parse
+from markerpry.stats import collect_stats
+
+MARKERS = [
+    'python_version >= "3.10" and platform_machine == "x86_64"',
+    'extra == "test" or python_version < "3.10"',
+    'platform_machine == "x86_64" or extra == "docs"',
+    'os_name == "nt"',
+    '"3.10" <= python_version',
+    '"linux" in sys_platform',
+    'sys_platform in "linux darwin"',
+]
+
+ENV: Environment = {
+    "python_version": [Version("3.12")],
+    "platform_machine": ["x86_64"],
+    "os_name": ["posix"],
+    "sys_platform": ["linux"],
+}
+
+
+@pytest.fixture
+def index() -> MarkerIndex:
+    return MarkerIndex(parse(marker) for marker in MARKERS)
+
+
+with_key_testdata = [
+    ("python_version", [0, 1, 4]),
+    ("platform_machine", [0, 2]),
+    ("extra", [1, 2]),
+    ("sys_platform", [5, 6]),
+    ("implementation_name", []),
+]
+
+
+@pytest.mark.parametrize("key,expected", with_key_testdata, ids=[x[0] for x in with_key_testdata])
+def test_with_key(index: MarkerIndex, key: str, expected: list[int]):
+    assert index.with_key(key) == expected
+    assert expected == [position for position, node in enumerate(index) if key in node]
+
+
+with_atom_testdata = [
+    ("python_version_ge", ("python_version", ">=", "3.10"), [0, 4]),
+    ("platform_machine", ("platform_machine", "==", "x86_64"), [0, 2]),
+    ("extra", ("extra", "==", "test"), [1]),
+    ("extra_normalized", ("extra", "==", "Test"), [1]),
+    ("in", ("sys_platform", "in", "linux"), [5]),
+    ("missing", ("extra", "!=", "test"), []),
+]
+
+
+@pytest.mark.parametrize("name,atom,expected", with_atom_testdata, ids=[x[0] for x in with_atom_testdata])
+def test_with_atom(index: MarkerIndex, name: str, atom: tuple[str, str, str], expected: list[int]):
+    assert index.with_atom(*atom) == expected
+
+
+def test_atoms_interned(index: MarkerIndex):
+    assert len(index.atoms()) == 8
+    first = index[0].left
+    assert first is index[4]
+    assert index[0].right is index[2].left
+
+
+def test_unchanged_tree_kept():
+    node = parse(MARKERS[0])
+    index = MarkerIndex([node])
+    assert index[0] is node
+    assert index.add(parse(MARKERS[0])) == 1
+    assert index[1] is not node
+    assert index[1] == node
+
+
+def test_evaluate(index: MarkerIndex):
+    expected = [node.evaluate(ENV) for node in index]
+    with collect_stats() as stats:
+        assert index.evaluate(ENV) == expected
+    # Each of the 8 distinct atoms is evaluated once
+    assert stats.evaluations["ExpressionNode"] == 8
+
+
+def test_true_for(index: MarkerIndex):
+    assert index.true_for(ENV) == [0, 2, 4, 5, 6]
+
+
+def test_unresolved_without(index: MarkerIndex):
+    assert index.unresolved_without("extra", ENV) == [1]
+    assert index.unresolved_without("extra", {**ENV, "extra": ["test"]}) == [1]
+    assert index.unresolved_without("python_version", ENV) == [0, 1, 4]
+    assert index.unresolved_without("python_version", {**ENV, "extra": ["test"]}) == [0, 4]
+
+
+def test_len_and_keys(index: MarkerIndex):
+    assert len(index) == len(MARKERS)
+    assert index.keys() == {"python_version", "platform_machine", "extra", "os_name", "sys_platform"}
@@ -0,0 +1,90 @@
+import pytest
+from packaging.specifiers import Specifier, SpecifierSet
+from packaging.version import Version
+
+from markerpry.interval import (
+    EVERYTHING,
+    Interval,
+    comparison_range,
+    intersect,
+    is_empty,
+    issubset,
+    specifier_range,
+    specifier_set_range,
+)
+
+specifier_testdata = [
+    ("==3.8", ["3.8", "3.8.0"], ["3.7", "3.8.1"]),
+    ("!=3.8", ["3.7", "3.8.1"], ["3.8"]),
+    ("<3.8", ["3.7", "2.0"], ["3.8", "3.9"]),
+    ("<=3.8", ["3.8", "3.7"], ["3.8.1"]),
+    (">3.8", ["3.8.1", "4.0"], ["3.8", "3.7"]),
+    (">=3.8", ["3.8", "4.0"], ["3.7.9"]),
+    ("~=3.8", ["3.8", "3.12"], ["3.7", "4.0"]),
+    ("~=3.8.1", ["3.8.1", "3.8.9"], ["3.8.0", "3.9"]),
+    ("~=3.8.post1", ["3.8.post1", "3.9", "3.12"], ["3.8", "4.0"]),
+    ("~=3.8.dev1", ["3.8", "3.9"], ["3.7", "4.0"]),
+    ("~=3.8rc1", ["3.8", "3.9"], ["3.7", "4.0"]),
+    ("~=1!3.8.1.post2", ["1!3.8.2"], ["1!3.9", "3.8.2"]),
+    ("==3.8.*", ["3.8", "3.8.12"], ["3.7", "3.9"]),
+    ("!=3.8.*", ["3.7", "3.9"], ["3.8", "3.8.12"]),
+]
+
+
+def _contains(intervals: tuple[Interval, ...], version: str) -> bool:
+    point = Version(version)
+    return not is_empty(intersect(intervals, (Interval(point, point, True, True),)))
+
+
+@pytest.mark.parametrize("specifier,inside,outside", specifier_testdata, ids=[x[0] for x in specifier_testdata])
+def test_specifier_range(specifier: str, inside: list[str], outside: list[str]):
+    result = specifier_range(Specifier(specifier))
+    assert result is not None
+    for version in inside:
+        assert _contains(result, version), version
+        assert Specifier(specifier).contains(version)
+    for version in outside:
+        assert not _contains(result, version), version
+        assert not Specifier(specifier).contains(version)
+
+
+def test_arbitrary_equality_range():
+    assert specifier_range(Specifier("===3.8")) is None
+    assert specifier_set_range(SpecifierSet(">=3.7,===3.8")) is None
+
+
+def test_specifier_set_range():
+    result = specifier_set_range(SpecifierSet(">=3.8,<3.13,!=3.10"))
+    assert result is not None
+    assert _contains(result, "3.9")
+    assert not _contains(result, "3.10")
+    assert not _contains(result, "3.13")
+    assert specifier_set_range(SpecifierSet()) == EVERYTHING
+
+
+def test_issubset():
+    inner = specifier_set_range(SpecifierSet(">=3.9,<3.12"))
+    outer = specifier_set_range(SpecifierSet(">=3.8"))
+    assert inner is not None and outer is not None
+    assert issubset(inner, outer)
+    assert not issubset(outer, inner)
+    assert issubset(inner, EVERYTHING)
+    assert not issubset(EVERYTHING, inner)
+
+
+def test_interval_bounds():
+    closed = Interval(Version("1"), Version("2"), True, True)
+    half_open = Interval(Version("1"), Version("2"), True, False)
+    assert half_open.issubset(closed)
+    assert not closed.issubset(half_open)
+    assert Interval(Version("2"), Version("2"), True, False).is_empty()
+    assert Interval(Version("3"), Version("2"), True, True).is_empty()
+    assert not Interval(upper=Version("2")).is_empty()
+
+
+def test_compatible_release_with_suffix():
+    # ~= 3.8.post1 is >= 3.8.post1, == 3.*, so it holds for every 3.9 version
+    environment = specifier_set_range(SpecifierSet(">=3.9,<3.10"))
+    marker = comparison_range("~=", "3.8.post1")
+    assert environment is not None and marker is not None
+    assert issubset(environment, marker)
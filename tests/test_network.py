@@ -0,0 +1,60 @@
+import random
+
+from packaging.version import Version
+
+from benchmarks.corpus import full_environment, generate_markers, markerpry_environment
+from markerpry.network import MarkerNetwork
+from markerpry.node import FALSE, TRUE, BooleanNode, Environment, Node
+from markerpry.parser import parse
+from markerpry.stats import collect_stats
+
+MARKERS = [
+    'python_version >= "3.10" and sys_platform == "linux"',
+    'python_version >= "3.10" and sys_platform == "linux"',
+    '(python_version >= "3.10" and sys_platform == "linux") or extra == "test"',
+    'os_name == "nt" or extra == "test"',
+    'extra == "test"',
+]
+
+
+def expected_state(result: Node) -> bool | None:
+    return result.state if isinstance(result, BooleanNode) else None
+
+
+def test_shared_nodes():
+    network = MarkerNetwork(parse(marker) for marker in MARKERS)
+    assert len(network) == 5
+    # 4 distinct atoms, the shared and, and two ors
+    assert network.size == 7
+
+
+def test_match():
+    nodes = [parse(marker) for marker in MARKERS]
+    network = MarkerNetwork(nodes)
+    env: Environment = {"python_version": [Version("3.12")], "sys_platform": ["linux"]}
+    assert network.match(env) == [0, 1, 2]
+    assert network.resolve(env) == [True, True, True, None, None]
+    assert network.match({"extra": ["test"]}) == [2, 3, 4]
+    assert network.resolve({"os_name": ["posix"], "extra": ["docs"]}) == [None, None, None, False, False]
+
+
+def test_only_relevant_atoms_evaluated():
+    network = MarkerNetwork(parse(marker) for marker in MARKERS)
+    with collect_stats() as stats:
+        network.match({"extra": ["test"], "implementation_name": ["cpython"]})
+    assert stats.evaluations == {"ExpressionNode": 1}
+
+
+def test_constants():
+    network = MarkerNetwork([TRUE, FALSE, parse('os_name == "nt" and extra == "test"')])
+    assert network.resolve({}) == [True, False, None]
+
+
+def test_matches_evaluate():
+    nodes = [parse(marker) for marker in generate_markers(300)]
+    network = MarkerNetwork(nodes)
+    full_env = markerpry_environment(full_environment())
+    rng = random.Random(0)
+    for _ in range(20):
+        env = {key: values for key, values in full_env.items() if rng.random() < 0.5}
+        assert network.resolve(env) == [expected_state(node.evaluate(env)) for node in nodes]
@@ -307,3 +307,32 @@ expression_contains_testdata = [
 def test_expression_contains(name: str, expr: ExpressionNode, key: str, expected: bool):
     """Test that __contains__ works correctly for all expression types."""
     assert (key in expr) == expected
+
+
+def test_expression_node_fields_unchanged():
+    """The evaluators bound at construction don't change the public fields, equality or the repr."""
+    expr = ExpressionNode("linux", "in", "sys_platform")
+    assert (expr.lhs, expr.comparator, expr.rhs, expr.inverted) == ("linux", "in", "sys_platform", False)
+    assert expr == ExpressionNode(lhs="linux", comparator="in", rhs="sys_platform")
+    assert repr(expr) == "ExpressionNode(lhs='linux', comparator='in', rhs='sys_platform', inverted=False)"
+    assert expr._key() == "sys_platform"
+    assert expr._value() == "linux"
+
+
+def test_expression_node_specifier_cached():
+    from packaging.version import Version
+
+    expr = ExpressionNode("python_version", ">=", "3.8")
+    other = ExpressionNode("python_version", ">=", "3.8")
+    assert expr.evaluate({"python_version": [Version("3.9")]}) == TRUE
+    specifier = expr._specifier
+    assert specifier
+    assert expr.evaluate({"python_version": [Version("3.7")]}) == FALSE
+    assert expr._specifier is specifier
+    # The cached specifier isn't part of equality or the hash
+    assert expr == other
+    assert hash(expr) == hash(other)
+
+    invalid = ExpressionNode("python_version", ">=", "not a version")
+    assert invalid.evaluate({"python_version": [Version("3.9")]}) == invalid
+    assert invalid._specifier is False
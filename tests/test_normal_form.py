@@ -0,0 +1,163 @@
+import itertools
+import random
+
+import pytest
+
+from benchmarks.corpus import generate_marker
+from markerpry.node import FALSE, TRUE, BooleanNode, ExpressionNode, Node, OperatorNode
+from markerpry.normal_form import (
+    NormalFormTooLarge,
+    Operator,
+    to_cnf,
+    to_dnf,
+    tseitin,
+)
+from markerpry.parser import parse
+
+
+def atoms(node: Node) -> list[ExpressionNode]:
+    if isinstance(node, ExpressionNode):
+        return [node]
+    if isinstance(node, OperatorNode):
+        return list(dict.fromkeys(atoms(node._left) + atoms(node._right)))
+    return []
+
+
+def value(node: Node, assignment: dict[ExpressionNode, bool]) -> bool:
+    """Evaluate a tree with a truth value for each atom, rather than an environment"""
+    if isinstance(node, ExpressionNode):
+        return assignment[node]
+    if isinstance(node, BooleanNode):
+        return node.state
+    assert isinstance(node, OperatorNode)
+    if node.operator == "and":
+        return value(node._left, assignment) and value(node._right, assignment)
+    return value(node._left, assignment) or value(node._right, assignment)
+
+
+def assignments(node: Node):
+    nodes = atoms(node)
+    for values in itertools.product([False, True], repeat=len(nodes)):
+        yield dict(zip(nodes, values))
+
+
+def clauses(node: Node, operator: str) -> list[Node]:
+    if isinstance(node, OperatorNode) and node.operator == operator:
+        return clauses(node._left, operator) + clauses(node._right, operator)
+    return [node]
+
+
+def is_normal_form(node: Node, outer: str) -> bool:
+    inner = "and" if outer == "or" else "or"
+    for clause in clauses(node, outer):
+        for literal in clauses(clause, inner):
+            if not isinstance(literal, (ExpressionNode, BooleanNode)):
+                return False
+    return True
+
+
+def pairs(count: int, operator: Operator) -> Node:
+    """(a1 or b1) and (a2 or b2) and ..., which has 2 ** count DNF terms (or the dual for CNF)"""
+    inner = "or" if operator == "and" else "and"
+    result: Node | None = None
+    for i in range(count):
+        pair = parse(f'extra == "a{i}" {inner} extra == "b{i}"')
+        result = pair if result is None else OperatorNode(operator, result, pair)
+    assert result is not None
+    return result
+
+
+normal_form_testdata = [
+    ("atom", 'os_name == "nt"', 'os_name == "nt"', 'os_name == "nt"'),
+    (
+        "and_of_ors",
+        '(os_name == "nt" or extra == "a") and extra == "b"',
+        '(os_name == "nt" or extra == "a") and extra == "b"',
+        'os_name == "nt" and extra == "b" or extra == "a" and extra == "b"',
+    ),
+    (
+        "absorption",
+        'os_name == "nt" and (os_name == "nt" or extra == "a")',
+        'os_name == "nt"',
+        'os_name == "nt"',
+    ),
+    (
+        "duplicates",
+        '(extra == "a" or extra == "b") and (extra == "b" or extra == "a")',
+        'extra == "a" or extra == "b"',
+        'extra == "a" or extra == "b"',
+    ),
+]
+
+
+@pytest.mark.parametrize("name,marker,cnf,dnf", normal_form_testdata, ids=[x[0] for x in normal_form_testdata])
+def test_normal_form(name: str, marker: str, cnf: str, dnf: str):
+    node = parse(marker)
+    assert str(to_cnf(node)) == cnf
+    assert str(to_dnf(node)) == dnf
+
+
+constant_testdata = [
+    ("true", TRUE, TRUE, TRUE),
+    ("false", FALSE, FALSE, FALSE),
+    ("and_false", OperatorNode("and", parse('extra == "a"'), FALSE), FALSE, FALSE),
+    ("or_true", OperatorNode("or", parse('extra == "a"'), TRUE), TRUE, TRUE),
+    ("and_true", OperatorNode("and", parse('extra == "a"'), TRUE), parse('extra == "a"'), parse('extra == "a"')),
+]
+
+
+@pytest.mark.parametrize("name,node,cnf,dnf", constant_testdata, ids=[x[0] for x in constant_testdata])
+def test_constants(name: str, node: Node, cnf: Node, dnf: Node):
+    assert to_cnf(node) == cnf
+    assert to_dnf(node) == dnf
+
+
+def test_equivalent_on_random_markers():
+    rng = random.Random(0)
+    for _ in range(100):
+        node = parse(generate_marker(rng, rng.randint(1, 6)))
+        cnf = to_cnf(node)
+        dnf = to_dnf(node)
+        assert is_normal_form(cnf, "and")
+        assert is_normal_form(dnf, "or")
+        for assignment in assignments(node):
+            expected = value(node, assignment)
+            assert value(cnf, assignment) == expected
+            assert value(dnf, assignment) == expected
+
+
+def test_size_limit():
+    node = pairs(8, "and")
+    assert len(clauses(to_cnf(node), "and")) == 8
+    assert len(clauses(to_dnf(node), "or")) == 256
+    with pytest.raises(NormalFormTooLarge):
+        to_dnf(node, max_clauses=255)
+    with pytest.raises(ValueError):
+        to_cnf(pairs(8, "or"), max_clauses=100)
+
+
+def test_tseitin_equisatisfiable():
+    rng = random.Random(1)
+    for _ in range(50):
+        node = parse(generate_marker(rng, rng.randint(1, 5)))
+        cnf = tseitin(node)
+        assert cnf.atoms == atoms(node)
+        for assignment in assignments(node):
+            truth = {i + 1: assignment[atom] for i, atom in enumerate(cnf.atoms)}
+            auxiliary = range(len(cnf.atoms) + 1, cnf.variables + 1)
+            satisfiable = False
+            for values in itertools.product([False, True], repeat=len(auxiliary)):
+                truth.update(zip(auxiliary, values))
+                if all(any(truth[abs(literal)] == (literal > 0) for literal in clause) for clause in cnf.clauses):
+                    satisfiable = True
+                    break
+            assert satisfiable == value(node, assignment)
+
+
+def test_tseitin_linear():
+    node = pairs(200, "and")
+    cnf = tseitin(node)
+    # 400 atoms, one variable for the chain of ands, and one for each or
+    assert cnf.variables == 400 + 1 + 200
+    # The and has a clause per input plus one, each or has 3 clauses, and the root has 1
+    assert len(cnf.clauses) == 201 + 200 * 3 + 1
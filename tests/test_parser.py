@@ -495,3 +495,23 @@ def test_operand_ordering(name: str, marker_str: str, expected: Node | None):
     result_str = str(result)
     result_tree = parse(result_str)
     assert result_tree == result
+
+
+extra_normalization_testdata = [
+    ("equal", 'extra == "Foo_Bar"', ExpressionNode("extra", "==", "foo-bar")),
+    ("not_equal", 'extra != "Foo.Bar"', ExpressionNode("extra", "!=", "foo-bar")),
+    ("reversed", '"Foo__Bar" == extra', ExpressionNode("extra", "==", "foo-bar")),
+    ("not_an_extra", 'os_name == "Foo_Bar"', ExpressionNode("os_name", "==", "Foo_Bar")),
+    (
+        "later_expression",
+        'os_name == "nt" and extra == "Foo_Bar"',
+        OperatorNode("and", ExpressionNode("os_name", "==", "nt"), ExpressionNode("extra", "==", "foo-bar")),
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "name,marker,expected", extra_normalization_testdata, ids=[x[0] for x in extra_normalization_testdata]
+)
+def test_extras_normalized(name: str, marker: str, expected: Node):
+    assert parse(marker) == expected
@@ -0,0 +1,122 @@
+import itertools
+import re
+
+import pytest
+from packaging.version import Version
+
+from markerpry.node import (
+    FALSE,
+    TRUE,
+    Environment,
+    EnvironmentValue,
+    ExpressionNode,
+    Node,
+    OperatorNode,
+)
+from markerpry.parser import parse
+from markerpry.partition import partition
+
+PYTHON_VERSIONS: list[EnvironmentValue] = [
+    Version("3.8"),
+    Version("3.9"),
+    Version("3.10"),
+    Version("3.11"),
+    Version("3.12"),
+]
+
+partition_testdata = [
+    (
+        "single_key",
+        'python_version >= "3.10"',
+        {"python_version": PYTHON_VERSIONS},
+    ),
+    (
+        "two_keys",
+        'python_version < "3.10" and sys_platform == "win32"',
+        {"python_version": PYTHON_VERSIONS, "sys_platform": ["linux", "win32", "darwin"]},
+    ),
+    (
+        "partial_residual",
+        'python_version >= "3.10" or os_name == "nt"',
+        {"python_version": PYTHON_VERSIONS},
+    ),
+    (
+        "shared_key_in_both_children",
+        '(python_version < "3.9" or python_version >= "3.11") and sys_platform != "darwin"',
+        {"python_version": PYTHON_VERSIONS, "sys_platform": ["linux", "darwin"]},
+    ),
+    (
+        "regex_values",
+        'implementation_name == "cpython" and python_version >= "3.9"',
+        {"implementation_name": [re.compile("cpy.*"), re.compile("pypy")], "python_version": PYTHON_VERSIONS},
+    ),
+    (
+        "unreferenced_keys_ignored",
+        'os_name == "posix"',
+        {"os_name": ["posix", "nt"], "python_version": PYTHON_VERSIONS},
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "name,marker_str,env",
+    partition_testdata,
+    ids=[x[0] for x in partition_testdata],
+)
+def test_partition_matches_evaluate(name: str, marker_str: str, env: Environment):
+    """Each combination should match evaluating with just those values."""
+    tree = parse(marker_str)
+    result = partition(tree, env)
+
+    keys = [key for key in env if key in tree]
+    combinations = list(itertools.product(*(env[key] for key in keys)))
+    assert len(result) == len(combinations)
+    for values in combinations:
+        combination = tuple(zip(keys, values))
+        expected = tree.evaluate({key: [value] for key, value in combination})
+        assert result[combination] == expected
+
+
+def test_partition_by_python_version():
+    tree = parse('python_version >= "3.10"')
+    result = partition(tree, {"python_version": PYTHON_VERSIONS})
+    assert [version for ((_, version),), node in result.items() if node == TRUE] == PYTHON_VERSIONS[2:]
+
+
+def test_partition_version_strings():
+    # Version strings are compared as versions, as they are by evaluate()
+    tree = parse('python_version >= "3.10"')
+    result = partition(tree, {"python_version": ["3.9", "3.10"]})
+    assert result == {(("python_version", "3.9"),): FALSE, (("python_version", "3.10"),): TRUE}
+
+
+def test_partition_residual():
+    tree = parse('python_version >= "3.10" and os_name == "nt"')
+    residual = ExpressionNode("os_name", "==", "nt")
+    result = partition(tree, {"python_version": [Version("3.9"), Version("3.12")]})
+    assert result == {
+        (("python_version", Version("3.9")),): FALSE,
+        (("python_version", Version("3.12")),): residual,
+    }
+
+
+def test_partition_no_keys():
+    tree = parse('os_name == "nt"')
+    assert partition(tree, {}) == {(): tree}
+    assert partition(tree, {"os_name": []}) == {(): tree}
+    assert partition(TRUE, {"os_name": ["nt"]}) == {(): TRUE}
+
+
+def test_partition_duplicate_values():
+    tree = parse('os_name == "nt"')
+    assert partition(tree, {"os_name": ["nt", "nt"]}) == {(("os_name", "nt"),): TRUE}
+
+
+def test_partition_unchanged_subtree_is_shared():
+    """Subtrees that don't reference the partitioned keys are returned as-is."""
+    untouched: Node = OperatorNode(
+        "or", ExpressionNode("os_name", "==", "nt"), ExpressionNode("os_name", "==", "posix")
+    )
+    tree = OperatorNode("and", ExpressionNode("python_version", ">=", "3.10"), untouched)
+    result = partition(tree, {"python_version": PYTHON_VERSIONS})
+    assert result[(("python_version", Version("3.12")),)] is untouched
@@ -0,0 +1,196 @@
+import io
+import mmap
+import random
+import zipfile
+from pathlib import Path
+
+import pytest
+from packaging.requirements import InvalidRequirement, Requirement
+
+from benchmarks.corpus import generate_marker
+from markerpry.cache import ParseCache
+from markerpry.node import TRUE, ExpressionNode, Node, normalize_extra
+from markerpry.parser import parse, parse_marker
+from markerpry.requirements import (
+    ParsedRequirement,
+    parse_requirements,
+    wheel_requirements,
+)
+from markerpry.stats import collect_stats
+
+REQUIREMENTS = """\
+# A comment
+-r other.txt
+--index-url https://example.com/simple
+
+requests[socks, Security_Extra]>=2.0,<3 ; python_version >= "3.8"  # trailing comment
+idna (>=2.5)
+foo @ https://example.com/foo-1.0-py3-none-any.whl ; sys_platform == "win32"
+bar==1.0 \\
+    ; os_name == "nt" --hash=sha256:0123
+baz
+"""
+
+EXPECTED = [
+    ParsedRequirement("requests", ("socks", "security-extra"), ">=2.0,<3", parse('python_version >= "3.8"')),
+    ParsedRequirement("idna", (), ">=2.5", TRUE),
+    ParsedRequirement("foo", (), "@ https://example.com/foo-1.0-py3-none-any.whl", parse('sys_platform == "win32"')),
+    ParsedRequirement("bar", (), "==1.0", parse('os_name == "nt"')),
+    ParsedRequirement("baz", (), "", TRUE),
+]
+
+METADATA = """\
+Metadata-Version: 2.1
+Name: example
+Version: 1.0
+Requires-Dist: requests>=2.0
+Requires-Dist: pytest; extra == "Test_Suite"
+Requires-Dist: colorama
+  ; sys_platform == "win32"
+Description-Content-Type: text/markdown
+
+Requires-Dist: not-a-header
+"""
+
+
+def test_requirements_file():
+    assert list(parse_requirements(REQUIREMENTS)) == EXPECTED
+
+
+stream_testdata = [
+    ("str", lambda text: text),
+    ("bytes", lambda text: text.encode("utf-8")),
+    ("bytearray", lambda text: bytearray(text.encode("utf-8"))),
+    ("memoryview", lambda text: memoryview(text.encode("utf-8"))),
+    ("text_file", lambda text: io.StringIO(text)),
+    ("binary_file", lambda text: io.BytesIO(text.encode("utf-8"))),
+    ("crlf", lambda text: text.replace("\n", "\r\n").encode("utf-8")),
+    ("lines", lambda text: text.splitlines()),
+]
+
+
+@pytest.mark.parametrize("name,stream", stream_testdata, ids=[x[0] for x in stream_testdata])
+def test_streams(name: str, stream):
+    assert list(parse_requirements(stream(REQUIREMENTS))) == EXPECTED
+
+
+def test_mmap(tmp_path: Path):
+    path = tmp_path / "requirements.txt"
+    path.write_text(REQUIREMENTS)
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        assert list(parse_requirements(mapped)) == EXPECTED
+
+
+def test_metadata():
+    assert list(parse_requirements(METADATA)) == [
+        ParsedRequirement("requests", (), ">=2.0", TRUE),
+        ParsedRequirement("pytest", (), "", ExpressionNode("extra", "==", "test-suite")),
+        ParsedRequirement("colorama", (), "", parse('sys_platform == "win32"')),
+    ]
+
+
+def test_wheel(tmp_path: Path):
+    path = tmp_path / "example-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as wheel:
+        wheel.writestr("example/__init__.py", "")
+        wheel.writestr("example-1.0.dist-info/METADATA", METADATA + "A long description\n" * 10000)
+    expected = list(parse_requirements(METADATA))
+    assert list(wheel_requirements(path)) == expected
+    with open(path, "rb") as f:
+        assert list(wheel_requirements(f)) == expected
+    with zipfile.ZipFile(path) as wheel:
+        assert list(wheel_requirements(wheel)) == expected
+
+
+def test_wheel_without_metadata(tmp_path: Path):
+    path = tmp_path / "broken-1.0-py3-none-any.whl"
+    with zipfile.ZipFile(path, "w") as wheel:
+        wheel.writestr("broken/__init__.py", "")
+    with pytest.raises(ValueError):
+        list(wheel_requirements(path))
+
+
+def test_markers_shared():
+    text = "\n".join(f'package{i} >= 1.{i} ; python_version >= "3.8" and os_name == "posix"' for i in range(20))
+    with collect_stats() as stats:
+        requirements = list(parse_requirements(text))
+    assert all(requirement.marker is requirements[0].marker for requirement in requirements)
+    assert stats.cache_hits["requirement_markers"] >= 19
+
+
+def test_parse_cache(tmp_path: Path):
+    marker = 'platform_machine == "cached-marker-only"'
+    with ParseCache(tmp_path / "cache.bin") as cache:
+        (requirement,) = parse_requirements(f"example ; {marker}", cache=cache)
+        assert cache.get(marker) == requirement.marker
+
+
+invalid_testdata = [
+    "./local/path",
+    "example >= ",
+    "example[not valid!]",
+    "example ==1.0 extra",
+    "example>=abc",
+    "example~=1",
+    "example>=1.0.*",
+    "example[a,]>=abc,",
+]
+
+
+@pytest.mark.parametrize("line", invalid_testdata)
+def test_invalid(line: str):
+    with pytest.raises(InvalidRequirement):
+        list(parse_requirements(line))
+
+
+# Each pair is accepted by the regular expression, and only by packaging's parser, respectively
+same_result_testdata = [
+    ("extras", "example[b, A, b, a]>=1.0", "example[b, A, b, a]>=1.0,"),
+    ("specifier_order", "example (<2, >=1.0 , !=1.5)", "example (<2, >=1.0 , !=1.5,)"),
+    ("marker", 'example[a] ; os_name == "nt"', 'example[a,a] ( ) ; os_name == "nt"'),
+]
+
+
+@pytest.mark.parametrize("name,line,fallback", same_result_testdata, ids=[x[0] for x in same_result_testdata])
+def test_same_result_without_regex(name: str, line: str, fallback: str):
+    (requirement,) = parse_requirements(line)
+    (expected,) = parse_requirements(fallback)
+    assert requirement == expected
+
+
+def test_extras_and_specifier_as_written():
+    (requirement,) = parse_requirements("example[b, Foo_Bar, foo-bar, a] (<2, >=1.0 , !=1.5)")
+    assert requirement.extras == ("b", "foo-bar", "a")
+    assert requirement.specifier == "<2,>=1.0,!=1.5"
+
+
+def test_memoryview_slice():
+    text = ("#" + REQUIREMENTS).encode("utf-8")
+    assert list(parse_requirements(memoryview(text)[1:])) == EXPECTED
+
+
+def expected_from_packaging(line: str) -> tuple[str, set[str], str, Node]:
+    requirement = Requirement(line)
+    marker = TRUE if requirement.marker is None else parse_marker(requirement.marker)
+    return (
+        requirement.name,
+        {normalize_extra(extra) for extra in requirement.extras},
+        str(requirement.specifier),
+        marker,
+    )
+
+
+def test_matches_packaging():
+    rng = random.Random(0)
+    lines = []
+    for i in range(300):
+        extras_str = rng.choice(["", "[a]", "[a, b_c]"])
+        specifier_str = rng.choice(["", ">=1.0", "==1.*,!=1.2", "(~=2.1)", "<3,>=2 "])
+        marker_str = rng.choice(["", f"; {generate_marker(rng, rng.randint(1, 4))}"])
+        lines.append(f"package-{i}{extras_str}{specifier_str}{marker_str}")
+    for line, requirement in zip(lines, parse_requirements("\n".join(lines))):
+        name, extras, specifier, marker = expected_from_packaging(line)
+        assert requirement.name == name
+        assert set(requirement.extras) == extras
+        assert Requirement(f"x{requirement.specifier}").specifier == Requirement(f"x{specifier}").specifier
+        assert requirement.marker == marker
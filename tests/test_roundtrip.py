@@ -1,8 +1,9 @@
 import pytest
 from packaging.markers import Marker
 
-from markerpry.node import BooleanNode
-from markerpry.parser import parse
+from benchmarks.corpus import generate_markers
+from markerpry.node import BooleanNode, ExpressionNode, Node, OperatorNode
+from markerpry.parser import parse, parse_marker, to_marker
 
 
 # Basic node string representation tests
@@ -35,23 +36,47 @@ def test_expression_to_str(marker_str: str):
 )
 def test_operator_to_str(marker_str: str):
     expr = parse(marker_str)
-    assert str(expr) == f"({marker_str})"
+    assert str(expr) == marker_str
 
 
-# Complex nested expression tests
-@pytest.mark.parametrize(
-    "marker_str",
-    [
+# Complex nested expression tests. Only the parentheses needed to parse back into the same tree are kept:
+# "and" binds tighter than "or", and chains of the same operator group to the left
+complex_to_str_testdata = [
+    (
+        "right_nested_and",
+        'python_version >= "3.8" and (os_name == "posix" and platform_machine == "x86_64")',
         'python_version >= "3.8" and (os_name == "posix" and platform_machine == "x86_64")',
+    ),
+    (
+        "left_nested_and",
         '(python_version >= "3.8" and os_name == "posix") and platform_machine == "x86_64"',
+        'python_version >= "3.8" and os_name == "posix" and platform_machine == "x86_64"',
+    ),
+    (
+        "left_nested_or",
         '(os_name == "posix" or os_name == "nt") or os_name == "darwin"',
+        'os_name == "posix" or os_name == "nt" or os_name == "darwin"',
+    ),
+    (
+        "and_in_or",
         '(python_version >= "3.8" and os_name == "posix") or (python_version < "3.8" and os_name == "nt")',
+        'python_version >= "3.8" and os_name == "posix" or python_version < "3.8" and os_name == "nt"',
+    ),
+    (
+        "or_in_and",
         '(os_name == "posix" or os_name == "nt") and (python_version >= "3.8" and (platform_machine == "x86_64" or platform_machine == "arm64"))',
-    ],
+        '(os_name == "posix" or os_name == "nt") and (python_version >= "3.8" and (platform_machine == "x86_64" or platform_machine == "arm64"))',
+    ),
+]
+
+
+@pytest.mark.parametrize(
+    "name,marker_str,expected", complex_to_str_testdata, ids=[x[0] for x in complex_to_str_testdata]
 )
-def test_complex_to_str(marker_str: str):
+def test_complex_to_str(name: str, marker_str: str, expected: str):
     expr = parse(marker_str)
-    assert str(expr) == f"({marker_str})"
+    assert str(expr) == expected
+    assert parse(expected) == expr
 
 
 def test_deeply_nested_to_str():
@@ -61,8 +86,13 @@ def test_deeply_nested_to_str():
         '(sys_platform == "linux" and (implementation_name == "cpython" or '
         'platform_machine == "x86_64"))'
     )
+    expected = (
+        'python_version >= "3.8" and os_name == "posix" or '
+        'sys_platform == "linux" and (implementation_name == "cpython" or '
+        'platform_machine == "x86_64")'
+    )
     expr = parse(marker_str)
-    assert str(expr) == f"({marker_str})"
+    assert str(expr) == expected
 
 
 def test_multiple_and_to_str():
@@ -71,24 +101,38 @@ def test_multiple_and_to_str():
         'python_version >= "3.8" and os_name == "posix" and '
         'platform_machine == "x86_64" and implementation_name == "cpython"'
     )
-    expected = '(((python_version >= "3.8" and os_name == "posix") and platform_machine == "x86_64") and implementation_name == "cpython")'
     expr = parse(marker_str)
-    assert str(expr) == expected
+    assert str(expr) == marker_str
 
 
 def test_multiple_or_to_str():
     # Test with multiple OR operators
     marker_str = 'os_name == "posix" or os_name == "nt" or ' 'os_name == "darwin" or os_name == "aix"'
-    expected = '(((os_name == "posix" or os_name == "nt") or os_name == "darwin") or os_name == "aix")'
     expr = parse(marker_str)
-    assert str(expr) == expected
+    assert str(expr) == marker_str
 
 
 def test_mixed_precedence_to_str():
     marker_str = '(os_name == "posix" or python_version >= "3.8") and ' 'os_name == "nt"'
-    expected = '((os_name == "posix" or python_version >= "3.8") and ' 'os_name == "nt")'
     expr = parse(marker_str)
-    assert str(expr) == expected
+    assert str(expr) == marker_str
+
+
+def test_str_cached():
+    expr = parse('os_name == "posix" and (python_version >= "3.8" or os_name == "nt")')
+    assert str(expr) is str(expr)
+    assert expr.right is not None
+    # Cached subtrees are reused when rendering their parents
+    right = str(expr.right)
+    assert str(OperatorNode("and", expr.right, expr.right)) == f"({right}) and ({right})"
+
+
+def test_long_chain_to_str():
+    # Rendering doesn't recurse, so very long chains don't hit the recursion limit
+    expr: Node = ExpressionNode("extra", "==", "0")
+    for i in range(1, 5000):
+        expr = OperatorNode("or", expr, ExpressionNode("extra", "==", str(i)))
+    assert str(expr) == " or ".join(f'extra == "{i}"' for i in range(5000))
 
 
 @pytest.mark.parametrize(
@@ -151,3 +195,54 @@ def test_in_operator_roundtrip(name: str, marker_str: str, expected_key: str):
     assert str(node) == marker_str
     # Test dependency key is preserved
     assert expected_key in node
+
+
+def test_to_marker_matches_string_roundtrip():
+    for marker_str in generate_markers(300, max_atoms=6):
+        node = parse(marker_str)
+        marker = to_marker(node)
+        expected = Marker(str(node))
+        assert repr(marker._markers) == repr(expected._markers), marker_str
+        assert marker == expected
+        assert parse_marker(marker) == node
+
+
+to_marker_testdata = [
+    ("reversed", '"3.8" < python_version', 'python_version > "3.8"'),
+    ("in", '"arm" in platform_machine', '"arm" in platform_machine'),
+    ("inverted_not_in", 'platform_machine not in "x86 arm"', 'platform_machine not in "x86 arm"'),
+    ("extra", 'extra == "Foo_Bar"', 'extra == "foo-bar"'),
+    (
+        "precedence",
+        'os_name == "nt" and (extra == "a" or extra == "b")',
+        'os_name == "nt" and (extra == "a" or extra == "b")',
+    ),
+]
+
+
+@pytest.mark.parametrize("name,marker_str,expected", to_marker_testdata, ids=[x[0] for x in to_marker_testdata])
+def test_to_marker(name: str, marker_str: str, expected: str):
+    assert str(to_marker(parse(marker_str))) == expected
+
+
+def test_to_marker_inverted():
+    node = ExpressionNode("3.8", "<", "python_version", inverted=True)
+    marker = to_marker(node)
+    assert str(marker) == '"3.8" < python_version'
+    assert marker == Marker(str(node))
+    assert marker.evaluate({"python_version": "3.9"})
+    assert not marker.evaluate({"python_version": "3.7"})
+
+
+def test_to_marker_boolean():
+    with pytest.raises(ValueError):
+        to_marker(BooleanNode(True))
+    with pytest.raises(ValueError):
+        to_marker(OperatorNode("and", parse('os_name == "nt"'), BooleanNode(False)))
+
+
+def test_to_marker_long_chain():
+    node: Node = ExpressionNode("extra", "==", "0")
+    for i in range(1, 5000):
+        node = OperatorNode("and", node, ExpressionNode("extra", "==", str(i)))
+    assert len(to_marker(node)._markers) == 2 * 5000 - 1
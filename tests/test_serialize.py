@@ -0,0 +1,71 @@
+import pickle
+
+import pytest
+
+from markerpry.node import FALSE, TRUE, ExpressionNode, Node, OperatorNode
+from markerpry.parser import parse
+from markerpry.serialize import dumps, loads
+
+roundtrip_testdata = [
+    ("boolean_true", TRUE),
+    ("boolean_false", FALSE),
+    ("expression", ExpressionNode("python_version", ">=", "3.8")),
+    ("inverted_expression", ExpressionNode("sys_platform", "in", "linux", inverted=True)),
+    ("unicode", ExpressionNode("platform_release", "==", "café \U0001f40d")),
+    ("operator", parse('python_version >= "3.8" and (os_name == "nt" or "linux" in sys_platform)')),
+    ("mixed", OperatorNode("or", TRUE, ExpressionNode("extra", "==", "test"))),
+]
+
+
+@pytest.mark.parametrize("name,node", roundtrip_testdata, ids=[x[0] for x in roundtrip_testdata])
+def test_to_bytes_roundtrip(name: str, node: Node):
+    assert Node.from_bytes(node.to_bytes()) == node
+
+
+@pytest.mark.parametrize("name,node", roundtrip_testdata, ids=[x[0] for x in roundtrip_testdata])
+def test_pickle_roundtrip(name: str, node: Node):
+    assert pickle.loads(pickle.dumps(node)) == node
+
+
+def test_dumps_many():
+    nodes = [parse('os_name == "nt"'), parse('python_version < "3"'), parse('os_name == "nt"')]
+    assert loads(dumps(nodes)) == nodes
+    assert loads(dumps([])) == []
+
+
+def test_shared_subtrees():
+    shared = parse('os_name == "nt" and python_version < "3.10"')
+    nodes = [OperatorNode("or", shared, parse('extra == "a"')), OperatorNode("and", parse('extra == "a"'), shared)]
+    data = dumps(nodes)
+    # Equal subtrees are only stored once
+    assert len(data) < len(dumps(nodes[:1])) + len(dumps(nodes[1:]))
+    result = loads(data)
+    assert result == nodes
+    assert result[0].left is result[1].right
+    assert result[0].right is result[1].left
+
+
+def test_loads_memoryview():
+    node = parse('python_version >= "3.8"')
+    assert loads(memoryview(bytearray(node.to_bytes()))) == [node]
+
+
+def test_large_tables():
+    """Tables with more than 255 or 65535 entries need wider integers."""
+    nodes = [ExpressionNode("python_full_version", "==", str(i)) for i in range(70_000)]
+    assert loads(dumps(nodes)) == nodes
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", b"MPRY", b"nope!", b"MPRY\x63", parse('os_name == "nt"').to_bytes()[:-3]],
+    ids=["empty", "short", "magic", "version", "truncated"],
+)
+def test_loads_invalid(data: bytes):
+    with pytest.raises(ValueError):
+        loads(data)
+
+
+def test_from_bytes_requires_single_node():
+    with pytest.raises(ValueError):
+        Node.from_bytes(dumps([TRUE, FALSE]))
@@ -0,0 +1,94 @@
+import json
+import re
+
+import pytest
+from packaging.specifiers import SpecifierSet
+from packaging.version import Version
+
+from markerpry import stats as stats_module
+from markerpry.node import Environment, ExpressionNode, OperatorNode
+from markerpry.parser import parse
+from markerpry.stats import collect_stats, register_cache
+
+
+def test_counts_comparisons():
+    tree = parse('python_version >= "3.8" and (os_name == "posix" or platform_machine != "x86_64")')
+    env: Environment = {
+        "python_version": [Version("3.9"), SpecifierSet(">=3.10")],
+        "os_name": ["nt"],
+        "platform_machine": [re.compile("arm.*")],
+    }
+    with collect_stats() as stats:
+        assert tree.evaluate(env)
+    assert stats.comparators == {">=": 2, "==": 1, "!=": 1}
+    # The tree compiles the environment, so the patterns for a key are matched together
+    assert stats.value_types == {"Version": 1, "SpecifierSet": 1, "str": 1, "PatternSet": 1}
+    assert stats.evaluations == {"ExpressionNode": 3, "OperatorNode": 2}
+    assert set(stats.timings_ns) == {
+        "ExpressionNode.evaluate",
+        "OperatorNode.evaluate",
+        "ExpressionNode._evaluate_version",
+        "ExpressionNode._evaluate_specifier_set",
+        "ExpressionNode._evaluate_string",
+        "ExpressionNode._evaluate_patterns",
+    }
+
+
+def test_short_circuits_and_residuals():
+    tree = parse('(os_name == "nt" and python_version >= "3.8") or (sys_platform == "linux" and extra == "test")')
+    with collect_stats() as stats:
+        result = tree.evaluate({"os_name": ["posix"]})
+    assert str(result) == 'sys_platform == "linux" and extra == "test"'
+    # The first and is short circuited to False, then the or is replaced by its right child
+    assert stats.short_circuits == 2
+    assert stats.residual_nodes == 0
+
+    with collect_stats() as stats:
+        tree.evaluate({"sys_platform": ["linux"]})
+    # The second and is replaced by extra == "test", so the or needs a new node
+    assert stats.short_circuits == 1
+    assert stats.residual_nodes == 1
+
+
+def test_unchanged_subtrees_are_not_counted():
+    tree = parse('os_name == "nt" and python_version >= "3.8"')
+    with collect_stats() as stats:
+        assert tree.evaluate({}) is tree
+    assert stats.short_circuits == 0
+    assert stats.residual_nodes == 0
+    assert stats.comparators == {}
+
+
+def test_methods_restored():
+    originals = (ExpressionNode.evaluate, OperatorNode.evaluate, OperatorNode._simplify)
+    with collect_stats():
+        assert ExpressionNode.evaluate is not originals[0]
+    assert (ExpressionNode.evaluate, OperatorNode.evaluate, OperatorNode._simplify) == originals
+
+
+def test_nested_collection():
+    with collect_stats():
+        with pytest.raises(RuntimeError):
+            with collect_stats():
+                pass
+    with collect_stats():
+        pass
+
+
+def test_cache_hits(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(stats_module, "_caches", {})
+    hits = 0
+    register_cache("test", lambda: hits)
+    hits = 5
+    with collect_stats() as stats:
+        hits = 8
+    assert stats.cache_hits["test"] == 3
+
+
+def test_as_dict():
+    with collect_stats() as stats:
+        parse('os_name == "nt"').evaluate({"os_name": ["nt"]})
+    result = stats.as_dict()
+    assert json.loads(json.dumps(result)) == result
+    assert result["comparators"] == {"==": 1}
+    assert result["evaluations"] == {"ExpressionNode": 1}
@@ -0,0 +1,76 @@
+import pytest
+from packaging.version import Version
+
+import markerpry.vectorized
+from markerpry.node import BooleanNode, EnvironmentValue, Node
+from markerpry.parser import parse
+from markerpry.vectorized import ColumnarEnvironment, evaluate_columnar
+
+ROWS: list[dict[str, EnvironmentValue]] = [
+    {"python_version": Version("3.8"), "sys_platform": "linux", "platform_machine": "x86_64"},
+    {"python_version": Version("3.12"), "sys_platform": "linux", "platform_machine": "aarch64"},
+    {"python_version": Version("3.10"), "sys_platform": "win32", "platform_machine": "AMD64"},
+    {"python_version": Version("3.11"), "sys_platform": "darwin"},
+    {"sys_platform": "linux", "platform_machine": "x86_64"},
+    {},
+]
+
+markers = [
+    ("version", 'python_version >= "3.10"'),
+    ("and", 'python_version >= "3.10" and sys_platform == "linux"'),
+    ("or", 'python_version < "3.9" or platform_machine == "aarch64"'),
+    ("in", '"arm" in platform_machine or sys_platform != "win32"'),
+    ("unknown_key", 'python_version >= "3.10" and os_name == "posix"'),
+    ("unknown_key_or", 'os_name == "posix" or sys_platform == "darwin"'),
+    ("nested", '(sys_platform == "linux" and platform_machine == "x86_64") or python_version > "3.11"'),
+]
+
+
+def _expected(tree: Node, row: dict[str, EnvironmentValue]) -> tuple[bool, bool]:
+    result = tree.evaluate({key: [value] for key, value in row.items()})
+    if isinstance(result, BooleanNode):
+        return result.state, False
+    return False, True
+
+
+@pytest.fixture(params=[True, False], ids=["numpy", "pure_python"])
+def use_numpy(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> bool:
+    if request.param:
+        pytest.importorskip("numpy")
+    monkeypatch.setattr(markerpry.vectorized, "HAS_NUMPY", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize("name,marker_str", markers, ids=[x[0] for x in markers])
+def test_evaluate_columnar_matches_evaluate(name: str, marker_str: str, use_numpy: bool):
+    tree = parse(marker_str)
+    result = evaluate_columnar(tree, ColumnarEnvironment.from_rows(ROWS))
+    assert list(zip(map(bool, result.value), map(bool, result.unresolved))) == [_expected(tree, row) for row in ROWS]
+
+
+def test_boolean_node(use_numpy: bool):
+    environment = ColumnarEnvironment.from_rows(ROWS)
+    result = evaluate_columnar(BooleanNode(True), environment)
+    assert list(result.value) == [True] * len(ROWS)
+    assert not any(result.unresolved)
+
+
+def test_version_codes_are_ordinals(use_numpy: bool):
+    environment = ColumnarEnvironment({"python_version": [Version("3.12"), None, Version("3.8"), Version("3.10")]})
+    column = environment.columns["python_version"]
+    assert column.categories == (Version("3.8"), Version("3.10"), Version("3.12"))
+    assert list(column.codes) == [2, -1, 0, 1]
+    assert len(column) == 4
+
+
+def test_numpy_masks():
+    numpy = pytest.importorskip("numpy")
+    environment = ColumnarEnvironment({"python_version": [Version("3.8"), Version("3.12")]})
+    result = evaluate_columnar(parse('python_version >= "3.10"'), environment)
+    assert result.value.dtype == numpy.bool_
+    assert result.value.tolist() == [False, True]
+
+
+def test_mismatched_columns():
+    with pytest.raises(ValueError):
+        ColumnarEnvironment({"os_name": ["posix"], "sys_platform": ["linux", "win32"]})